@@ -0,0 +1,69 @@
+"""
+Indexed vs LIKE search over the book catalog.
+
+Times the book list's search query, a title or author name substring match,
+both ways against the configured database: with ``icontains`` (a
+``LIKE '%term%'`` scan) and with the trigram-indexed ``indexed_contains``
+lookup (see api/search.py). Reports the median time, the row count (which
+must agree) and the query plan of each.
+"""
+import random
+import time
+from statistics import median
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Author, Book
+
+DEFAULT_TERMS = ['love', 'the', 'war and', 'Author 42', 'zzqx']
+
+_WORDS = (
+    'love war peace night day river stone garden city house winter summer king '
+    'queen shadow light dark road sea storm silence memory fire glass time'
+).split()
+
+
+def seed_books(count, authors=1000, batch_size=5000):
+    """Add ``count`` synthetic books spread over ``authors`` new authors"""
+    rng = random.Random(0)
+    author_ids = [
+        author.pk for author in
+        Author.objects.bulk_create([Author(name=f'Author {i}') for i in range(authors)])
+    ]
+    for start in range(0, count, batch_size):
+        Book.objects.bulk_create([
+            Book(
+                title=' '.join(rng.choice(_WORDS) for _ in range(rng.randint(2, 6))).capitalize(),
+                publication_year=rng.randint(1800, 2024),
+                author_id=rng.choice(author_ids),
+            )
+            for _ in range(start, min(start + batch_size, count))
+        ])
+
+
+def _search(lookup, term):
+    return Book.objects.filter(
+        Q(**{f'title__{lookup}': term}) | Q(**{f'author__name__{lookup}': term})
+    )
+
+
+def run_search_benchmark(terms=None, repeat=5):
+    """Time each term's search ``repeat`` times with and without the index"""
+    results = []
+    for term in terms or DEFAULT_TERMS:
+        row = {'term': term}
+        for label, lookup in (('like', 'icontains'), ('indexed', 'indexed_contains')):
+            queryset = _search(lookup, term)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                count = queryset.count()
+                timings.append(time.perf_counter() - started)
+            row[label] = {'ms': median(timings) * 1000, 'rows': count, 'plan': queryset.explain()}
+        results.append(row)
+    return {
+        'database': connection.vendor,
+        'books': Book.objects.count(),
+        'results': results,
+    }
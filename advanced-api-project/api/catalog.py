@@ -0,0 +1,225 @@
+"""
+Streaming CSV / NDJSON export and import of the Book and Author catalog.
+
+Exports read rows with QuerySet.iterator() and emit text in chunks, so the
+whole catalog is never held in memory; they back both the export_catalog
+command and the StreamingHttpResponse of CatalogView.
+
+Imports parse their input line by line and insert in batches with
+bulk_create. Books name their author ('author_name'); names are resolved
+to ids through a dictionary kept for the whole import, looking up only the
+names not seen before once per batch, and authors that don't exist yet are
+created. Invalid rows are skipped and reported with their line number.
+
+Both formats use the same columns::
+
+    books:   id, title, publication_year, author, author_name
+    authors: id, name
+
+Imported rows always get new ids; the 'id' and 'author' columns of an
+export are ignored on import.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.db import transaction
+
+from .models import Author, Book
+from .serializers import publication_year_error
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+COLUMNS = {
+    'books': ['id', 'title', 'publication_year', 'author', 'author_name'],
+    'authors': ['id', 'name'],
+}
+
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 5000
+# Bound on the size of a name__in lookup, below SQLite's parameter limit
+LOOKUP_CHUNK_SIZE = 900
+MAX_REPORTED_ERRORS = 100
+
+# Stands in for a line of NDJSON that doesn't parse
+INVALID_JSON = object()
+
+
+def _export_rows(resource, chunk_size):
+    if resource == 'books':
+        queryset = Book.objects.order_by('pk').values_list(
+            'id', 'title', 'publication_year', 'author_id', 'author__name'
+        )
+    else:
+        queryset = Author.objects.order_by('pk').values_list('id', 'name')
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def export_catalog(resource, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield ``resource`` ('books' or 'authors') as text chunks of ``fmt``"""
+    columns = COLUMNS[resource]
+    buffer = io.StringIO()
+
+    def drain():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+            buffer.write('\n')
+
+    for count, row in enumerate(_export_rows(resource, chunk_size), 1):
+        write(row)
+        if count % chunk_size == 0:
+            yield drain()
+    chunk = drain()
+    if chunk:
+        yield chunk
+
+
+def read_records(lines, fmt):
+    """(line number, record) for each record of CSV or NDJSON text ``lines``"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, INVALID_JSON
+
+
+class AuthorResolver:
+    """
+    Author name -> id for the length of an import. Names not seen yet are
+    looked up together, once per batch; the oldest author with a name wins,
+    and names with no author are created in bulk.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.created = 0
+
+    def resolve(self, names):
+        missing = list(set(names) - self.ids.keys())
+        for start in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+            found = Author.objects.filter(name__in=missing[start:start + LOOKUP_CHUNK_SIZE])
+            for pk, name in found.order_by('-pk').values_list('pk', 'name'):
+                self.ids[name] = pk
+        new = [Author(name=name) for name in missing if name not in self.ids]
+        if new:
+            Author.objects.bulk_create(new)
+            self.ids.update((author.name, author.pk) for author in new)
+            self.created += len(new)
+        return self.ids
+
+
+def _text(record, key, max_length):
+    value = record.get(key)
+    value = '' if value is None else str(value).strip()
+    if not value:
+        return None, 'This field is required.'
+    if len(value) > max_length:
+        return None, f'Ensure this field has no more than {max_length} characters.'
+    return value, None
+
+
+def clean_book(record, current_year=None):
+    """(title, publication_year, author_name) from an import record, and its errors"""
+    title, title_error = _text(record, 'title', Book._meta.get_field('title').max_length)
+    author_name, author_error = _text(record, 'author_name', Author._meta.get_field('name').max_length)
+    errors = {}
+    if title_error:
+        errors['title'] = title_error
+    if author_error:
+        errors['author_name'] = author_error
+    year = record.get('publication_year')
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        errors['publication_year'] = 'A valid integer is required.'
+    else:
+        year_error = publication_year_error(year, current_year)
+        if year_error:
+            errors['publication_year'] = year_error
+    return (title, year, author_name), errors
+
+
+def clean_author(record, current_year=None):
+    name, error = _text(record, 'name', Author._meta.get_field('name').max_length)
+    return (name,), {'name': error} if error else {}
+
+
+def _insert_books(rows, resolver):
+    ids = resolver.resolve(author_name for _, _, author_name in rows)
+    Book.objects.bulk_create(
+        [Book(title=title, publication_year=year, author_id=ids[name]) for title, year, name in rows]
+    )
+
+
+def _insert_authors(rows, resolver):
+    Author.objects.bulk_create([Author(name=name) for name, in rows])
+
+
+IMPORTERS = {
+    'books': (clean_book, _insert_books),
+    'authors': (clean_author, _insert_authors),
+}
+
+
+def import_catalog(resource, lines, fmt, batch_size=IMPORT_BATCH_SIZE, log=None):
+    """
+    Import ``resource`` records from CSV or NDJSON text ``lines`` (any
+    iterable of lines, e.g. an open file). Each batch of ``batch_size``
+    valid rows is inserted in its own transaction. Returns counts of
+    created rows, created authors and invalid rows, with the errors of the
+    first MAX_REPORTED_ERRORS invalid rows.
+    """
+    clean, insert = IMPORTERS[resource]
+    resolver = AuthorResolver()
+    result = {'created': 0, 'authors_created': 0, 'error_count': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            insert(batch, resolver)
+        result['created'] += len(batch)
+        if log:
+            log(f"{result['created']} {resource} imported")
+        batch.clear()
+
+    current_year = datetime.now().year
+    for line, record in read_records(lines, fmt):
+        if isinstance(record, dict):
+            row, errors = clean(record, current_year)
+        else:
+            message = 'Not valid JSON.' if record is INVALID_JSON else 'Expected an object.'
+            row, errors = None, {'non_field_errors': message}
+        if errors:
+            result['error_count'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'line': line, 'errors': errors})
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if resource == 'books':
+        result['authors_created'] = resolver.created
+    return result
@@ -1,20 +1,22 @@
 import django_filters
+from rest_framework import filters
 from .models import Book
 
 class BookFilter(django_filters.FilterSet):
     """
     BookFilter provides comprehensive filtering options for the Book model.
     Allows users to filter books by title, author name, and publication year ranges.
+    Title and author name matching is served by trigram indexes (see api/search.py).
     """
     title = django_filters.CharFilter(
         field_name='title', 
-        lookup_expr='icontains',
+        lookup_expr='indexed_contains',
         help_text="Filter books by title (case-insensitive contains)"
     )
     
     author_name = django_filters.CharFilter(
         field_name='author__name', 
-        lookup_expr='icontains',
+        lookup_expr='indexed_contains',
         help_text="Filter books by author name (case-insensitive contains)"
     )
     
@@ -38,3 +40,13 @@ class BookFilter(django_filters.FilterSet):
     class Meta:
         model = Book
         fields = ['title', 'author_name', 'publication_year']
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter whose default (unprefixed) search fields match with the
+    indexed_contains lookup instead of icontains: the same results (except
+    that non-ASCII case is folded too), but served by the trigram indexes
+    in api/search.py. Prefixed fields (^, =, @, $) behave as in SearchFilter.
+    """
+    default_lookup = 'indexed_contains'
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from api.benchmarks import run_search_benchmark, seed_books
+
+
+class Command(BaseCommand):
+    help = "Compare book search through the trigram indexes with LIKE '%term%' scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='*', help='Search terms (default: a built-in mix)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per term and plan')
+        parser.add_argument('--seed', type=int, default=0, metavar='N',
+                            help='First add N synthetic books to the database')
+        parser.add_argument('--plans', action='store_true', help='Print each query plan')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_books(options['seed'])
+        report = run_search_benchmark(options['terms'], repeat=options['repeat'])
+        self.stdout.write(f"{report['database']}, {report['books']} books")
+        self.stdout.write(f"{'term':<16}{'rows':>8}{'LIKE ms':>12}{'indexed ms':>12}{'speedup':>10}")
+        for row in report['results']:
+            like, indexed = row['like'], row['indexed']
+            if like['rows'] != indexed['rows']:
+                if row['term'].isascii():
+                    self.stderr.write(self.style.ERROR(f"{row['term']!r}: results differ"))
+                else:
+                    self.stderr.write(self.style.WARNING(
+                        f"{row['term']!r}: results differ; the index folds non-ASCII case, LIKE may not"
+                    ))
+            speedup = like['ms'] / indexed['ms'] if indexed['ms'] else 0
+            self.stdout.write(
+                f"{row['term']:<16}{like['rows']:>8}{like['ms']:>12.2f}{indexed['ms']:>12.2f}{speedup:>9.1f}x"
+            )
+            if options['plans']:
+                self.stdout.write(f"  LIKE plan:\n    {like['plan']}")
+                self.stdout.write(f"  indexed plan:\n    {indexed['plan']}")
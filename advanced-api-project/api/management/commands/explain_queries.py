@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from api.benchmarks import seed_books
+from api.query_plans import EXPLAINED_VIEWS, explain_view
+
+
+class Command(BaseCommand):
+    help = 'Log the EXPLAIN plan of every filter/ordering combination the list views expose'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-filters', type=int, default=2,
+                            help='Most filters combined in one query (default: 2)')
+        parser.add_argument('--seed', type=int, default=0, metavar='N',
+                            help='First add N synthetic books to the database')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Refresh the planner statistics (ANALYZE) first')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any query reads a whole table')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_books(options['seed'])
+        if options['analyze'] or options['seed']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        verbosity = options['verbosity']
+
+        def log(result):
+            query = '&'.join(f'{name}={value}' for name, value in result['params'].items()) or '(defaults)'
+            notes = []
+            if result['full_scans']:
+                notes.append(self.style.ERROR(f"full scan of {', '.join(result['full_scans'])}"))
+            if result['sorted']:
+                notes.append('sorted')
+            self.stdout.write(f"{result['view']} ?{query}: {'; '.join(notes) or 'ok'}")
+            if result['full_scans'] or verbosity >= 2:
+                self.stdout.write('  ' + result['plan'].replace('\n', '\n  '))
+
+        results = []
+        for view_class in EXPLAINED_VIEWS:
+            results += explain_view(view_class, max_filters=options['max_filters'], log=log)
+        scans = sum(1 for result in results if result['full_scans'])
+        self.stdout.write(f'{len(results)} queries explained, {scans} with full table scans')
+        if scans and options['fail_on_scan']:
+            raise CommandError(f'{scans} queries read a whole table')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from api.catalog import COLUMNS, FORMATS, export_catalog
+
+
+class Command(BaseCommand):
+    help = 'Stream the book or author catalog out as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=sorted(COLUMNS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='ndjson', dest='fmt')
+        parser.add_argument('--output', '-o', default='-', help='File to write (default: standard output)')
+
+    def handle(self, *args, **options):
+        chunks = export_catalog(options['resource'], options['fmt'])
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Exported {options['resource']} to {options['output']}"))
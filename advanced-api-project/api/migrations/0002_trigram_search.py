@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from api.search import create_trigram_indexes, drop_trigram_indexes
+
+
+def create_indexes(apps, schema_editor):
+    create_trigram_indexes(schema_editor)
+
+
+def drop_indexes(apps, schema_editor):
+    drop_trigram_indexes(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
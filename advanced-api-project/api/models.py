@@ -14,6 +14,10 @@ class Author(models.Model):
     class Meta:
         verbose_name = "Author"
         verbose_name_plural = "Authors"
+        indexes = [
+            # Book list ?ordering=author__name walks authors in name order
+            models.Index(fields=['name'], name='api_author_name_idx'),
+        ]
 
 
 class Book(models.Model):
@@ -38,3 +42,13 @@ class Book(models.Model):
         verbose_name = "Book"
         verbose_name_plural = "Books"
         ordering = ['-publication_year', 'title']
+        # Indexes matching the book list's filters and orderings; check
+        # their use with `manage.py explain_queries` (api/query_plans.py)
+        indexes = [
+            # Default ordering, ?ordering=[-]publication_year and the year filters
+            models.Index(fields=['-publication_year', 'title'], name='api_book_year_title_idx'),
+            # An author's books in Meta order (the author books prefetch window)
+            models.Index(fields=['author', '-publication_year', 'title'], name='api_book_author_year_idx'),
+            # ?ordering=[-]title
+            models.Index(fields=['title'], name='api_book_title_idx'),
+        ]
@@ -0,0 +1,130 @@
+"""
+EXPLAIN plans for every filter/ordering combination a list view exposes.
+
+For a list view, explain_view() enumerates its query parameters: the
+FilterSet's filters, the SearchFilter's search parameter and each ordering
+the OrderingFilter accepts (ascending and descending, plus the default).
+Each combination of up to ``max_filters`` filters with each ordering is run
+through the view's own get_queryset() and filter backends, cut to the first
+page as the paginator would, and EXPLAINed on the configured database.
+
+Plans that read a whole table (SQLite ``SCAN <table>`` without an index,
+PostgreSQL ``Seq Scan``) are flagged as full scans; sorts of the result
+(``USE TEMP B-TREE FOR ORDER BY``, ``Sort``) are reported too, but are
+expected once a filter has narrowed the rows. Only the page query is
+explained: the paginator's COUNT(*) has to visit every matching row anyway.
+
+Planners choose by table size and statistics, so run this against a
+realistically sized database (``explain_queries --seed``), not an empty one.
+"""
+import itertools
+import re
+
+import django_filters
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .views import BookListView
+
+EXPLAINED_VIEWS = [BookListView]
+
+# Values the plans are taken with; filters not listed get a number or a word by type
+SAMPLE_VALUES = {
+    'title': 'love',
+    'author_name': 'Author 4',
+    'publication_year': '2000',
+    'publication_year_min': '1990',
+    'publication_year_max': '2010',
+    'search': 'love',
+}
+
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?: AS \w+)?$', re.MULTILINE),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'\bSort\b'),
+}
+
+
+def _sample_value(name, filter_):
+    if name in SAMPLE_VALUES:
+        return SAMPLE_VALUES[name]
+    return '2000' if isinstance(filter_, django_filters.NumberFilter) else 'the'
+
+
+def exposed_parameters(view_class):
+    """
+    ({filter parameter: sample value}, ordering parameter name, [orderings])
+    for ``view_class``; the first ordering, None, is the view's default.
+    """
+    params = {}
+    ordering_param, orderings = None, [None]
+    filterset_class = getattr(view_class, 'filterset_class', None)
+    if filterset_class is not None:
+        for name, filter_ in filterset_class.base_filters.items():
+            params[name] = _sample_value(name, filter_)
+    for backend in view_class.filter_backends:
+        if issubclass(backend, SearchFilter) and getattr(view_class, 'search_fields', None):
+            params[backend.search_param] = _sample_value(backend.search_param, None)
+        elif issubclass(backend, OrderingFilter):
+            ordering_param = backend.ordering_param
+            for field in getattr(view_class, 'ordering_fields', None) or []:
+                orderings += [field, f'-{field}']
+    return params, ordering_param, orderings
+
+
+def view_queryset(view_class, params):
+    """The page query ``view_class`` would run for a GET with ``params``"""
+    request = RequestFactory().get('/', params)
+    view = view_class()
+    view.setup(request)
+    view.request = view.initialize_request(request)
+    view.format_kwarg = None
+    queryset = view.filter_queryset(view.get_queryset())
+    paginator = view.paginator
+    page_size = paginator and paginator.get_page_size(view.request)
+    return queryset[:page_size] if page_size else queryset
+
+
+def analyze_plan(plan, vendor=None):
+    """(tables read in full, whether the result is sorted) from an EXPLAIN output"""
+    vendor = vendor or connection.vendor
+    full_scans = FULL_SCAN_PATTERNS.get(vendor)
+    sort = SORT_PATTERNS.get(vendor)
+    tables = sorted(set(full_scans.findall(plan))) if full_scans else []
+    return tables, bool(sort and sort.search(plan))
+
+
+def explain_view(view_class, max_filters=2, log=None):
+    """
+    Explain every combination of up to ``max_filters`` of ``view_class``'s
+    filters with each of its orderings. Returns one dict per combination
+    with its params, SQL, plan, full_scans (table names) and sorted flag.
+    """
+    params, ordering_param, orderings = exposed_parameters(view_class)
+    results = []
+    for size in range(max_filters + 1):
+        for names in itertools.combinations(params, size):
+            for ordering in orderings:
+                query = {name: params[name] for name in names}
+                if ordering:
+                    query[ordering_param] = ordering
+                queryset = view_queryset(view_class, query)
+                plan = queryset.explain()
+                full_scans, sorted_ = analyze_plan(plan)
+                result = {
+                    'view': view_class.__name__,
+                    'params': query,
+                    'sql': str(queryset.query),
+                    'plan': plan,
+                    'full_scans': full_scans,
+                    'sorted': sorted_,
+                }
+                results.append(result)
+                if log:
+                    log(result)
+    return results
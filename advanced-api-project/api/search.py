@@ -0,0 +1,154 @@
+"""
+Indexed substring search for book titles and author names.
+
+BookFilter's title/author_name filters and the book list's SearchFilter
+match with ``icontains``, i.e. ``LIKE '%term%'``, which no B-tree index can
+serve. The ``indexed_contains`` lookup registered here returns the same
+rows for ASCII text but lets the database use a trigram index built by
+migration 0002_trigram_search:
+
+* SQLite (3.34+): an external-content FTS5 table with the trigram tokenizer
+  per searched column, kept in sync by triggers. The lookup becomes
+  ``pk IN (SELECT rowid FROM <index> WHERE <index> MATCH '"term"')``.
+* PostgreSQL with pg_trgm: a GIN trigram index on ``UPPER(column)``, which
+  serves Django's own icontains SQL, so the lookup compiles to exactly that.
+* Terms shorter than three characters, unindexed columns and other
+  databases fall back to plain icontains.
+
+Case folding differs for non-ASCII text on SQLite: its LIKE folds only
+ASCII letters, while the trigram tokenizer folds Unicode case, so
+"émile" matches "Émile Zola" through the index (as icontains does on
+PostgreSQL) but not through LIKE. Short terms, which fall back to LIKE,
+keep its ASCII-only folding.
+
+Triggers (and the GIN index) also cover rows written by bulk_create and
+the catalog importer, which send no signals.
+"""
+from django.db import transaction
+from django.db.models import CharField, Lookup
+from django.db.models.expressions import Col
+from django.db.models.lookups import IContains
+from django.db.models.sql.datastructures import Join
+
+# (table, column) -> name of its trigram index
+TRIGRAM_INDEXES = {
+    ('api_book', 'title'): 'api_book_title_trgm',
+    ('api_author', 'name'): 'api_author_name_trgm',
+}
+
+# Trigram indexes can't match anything shorter
+MIN_TERM_LENGTH = 3
+
+
+def sqlite_has_trigram(connection):
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 34, 0)
+
+
+@CharField.register_lookup
+class IndexedContains(Lookup):
+    """
+    Case-insensitive substring match served by a trigram index when there
+    is one; non-ASCII case is folded too on that path (see above)
+    """
+
+    lookup_name = 'indexed_contains'
+    prepare_rhs = False
+
+    def _fts_index(self, connection):
+        if not (sqlite_has_trigram(connection) and isinstance(self.lhs, Col) and self.rhs_is_direct_value()):
+            return None
+        if len(str(self.rhs)) < MIN_TERM_LENGTH:
+            return None
+        target = self.lhs.target
+        return TRIGRAM_INDEXES.get((target.model._meta.db_table, target.column))
+
+    @staticmethod
+    def _key_column(compiler, alias, column):
+        """
+        The outermost column equal to ``alias.column`` through the query's
+        joins, e.g. api_book.author_id for the author's id: a condition on
+        the base table lets the planner drive an OR of matches from indexes.
+        """
+        join = compiler.query.alias_map.get(alias)
+        while isinstance(join, Join) and len(join.join_cols) == 1 and join.join_cols[0][1] == column:
+            alias, column = join.parent_alias, join.join_cols[0][0]
+            join = compiler.query.alias_map.get(alias)
+        return alias, column
+
+    def as_sql(self, compiler, connection):
+        index = self._fts_index(connection)
+        if index is None:
+            return compiler.compile(IContains(self.lhs, self.rhs))
+        alias, column = self._key_column(compiler, self.lhs.alias, self.lhs.target.model._meta.pk.column)
+        pk = f'{compiler.quote_name_unless_alias(alias)}.{connection.ops.quote_name(column)}'
+        # A quoted FTS5 string is a phrase: the term's trigrams in sequence
+        phrase = '"%s"' % str(self.rhs).replace('"', '""')
+        return f'{pk} IN (SELECT rowid FROM {index} WHERE {index} MATCH %s)', [phrase]
+
+
+def _sqlite_create(schema_editor, index, table, column):
+    execute = schema_editor.execute
+    execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} "
+        f"USING fts5({column}, content='{table}', content_rowid='id', tokenize='trigram')"
+    )
+    execute(
+        f'CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {index}(rowid, {column}) VALUES (new.id, new.{column}); END'
+    )
+    execute(
+        f'CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {index}({index}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"
+    )
+    execute(
+        f'CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {column} ON {table} BEGIN '
+        f"INSERT INTO {index}({index}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f'INSERT INTO {index}(rowid, {column}) VALUES (new.id, new.{column}); END'
+    )
+    # Index the rows that already exist
+    execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def _postgres_create(schema_editor, index, table, column):
+    # Same expression as Django's icontains SQL, so the planner can use it
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {index} ON {table} USING GIN ((UPPER({column}::text)) gin_trgm_ops)'
+    )
+
+
+def _postgres_enable_trgm(schema_editor):
+    """Install pg_trgm if the server has it and we may; True if it's usable"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return False
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception:
+        # Typically insufficient privileges; searches fall back to scans
+        return False
+    return True
+
+
+def create_trigram_indexes(schema_editor):
+    connection = schema_editor.connection
+    if sqlite_has_trigram(connection):
+        create = _sqlite_create
+    elif connection.vendor == 'postgresql' and _postgres_enable_trgm(schema_editor):
+        create = _postgres_create
+    else:
+        return
+    for (table, column), index in TRIGRAM_INDEXES.items():
+        create(schema_editor, index, table, column)
+
+
+def drop_trigram_indexes(schema_editor):
+    connection = schema_editor.connection
+    for index in TRIGRAM_INDEXES.values():
+        if connection.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {index}_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {index}')
+        elif connection.vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
@@ -1,32 +1,145 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from rest_framework import serializers
 from .models import Author, Book
 from datetime import datetime
 
+# Rows written per INSERT/UPDATE statement by the bulk book endpoints
+BULK_CHUNK_SIZE = 500
+
+
+def publication_year_error(value, current_year=None):
+    """
+    The reason ``value`` is not an acceptable publication year, or None.
+    Shared by BookSerializer and the catalog importer (api/catalog.py).
+    """
+    current_year = current_year or datetime.now().year
+    if value > current_year:
+        return f"Publication year cannot be in the future. Current year is {current_year}."
+    if value < 1000:
+        return "Publication year must be a valid year (1000 or later)."
+    return None
+
+
+def _int_values(rows, key):
+    """The distinct values of ``key`` across ``rows`` that look like integer pks"""
+    values = set()
+    for row in rows:
+        if isinstance(row, dict) and not isinstance(row.get(key), bool):
+            try:
+                values.add(int(row.get(key)))
+            except (TypeError, ValueError):
+                pass
+    return values
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that, inside a bulk list serializer, resolves pks
+    from the instances the list serializer loaded for all rows at once
+    (related_instances) instead of running one query per row. Used on its
+    own it behaves exactly like PrimaryKeyRelatedField.
+    """
+
+    def to_internal_value(self, data):
+        loaded = getattr(self.root, 'related_instances', {}).get(self.field_name)
+        if loaded is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return loaded[pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class BookListSerializer(serializers.ListSerializer):
+    """
+    BookListSerializer is what BookSerializer(many=True) builds; it backs the
+    bulk book endpoints. Every row is validated by BookSerializer, so the
+    validate_publication_year rules apply unchanged, but the authors of all
+    rows are fetched in one query up front. Saving writes all rows with
+    bulk_create/bulk_update in chunks of BULK_CHUNK_SIZE inside one
+    transaction. Validation errors are keyed by the index of each invalid
+    row; the bulk views turn them into one result per row.
+
+    To update, pass the books being updated as the instance; each row must
+    carry the 'id' of one of them.
+    """
+
+    def to_internal_value(self, data):
+        self.related_instances = {}
+        self.row_instances = []
+        if isinstance(data, list):
+            self.related_instances['author'] = Author.objects.in_bulk(_int_values(data, 'author'))
+            if self.instance is not None:
+                self.instances_by_pk = {book.pk: book for book in self.instance}
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.related_instances = {}
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        pk = data.get('id') if isinstance(data, dict) else None
+        book = self.instances_by_pk.pop(pk, None) if type(pk) is int else None
+        if book is None:
+            # Unknown, missing or repeated ids
+            raise serializers.ValidationError({'id': ['Each row needs the id of a distinct existing book.']})
+        self.child.instance = book
+        self.child.initial_data = data
+        try:
+            validated = super().run_child_validation(data)
+        finally:
+            self.child.instance = None
+        self.row_instances.append(book)
+        return validated
+
+    def create(self, validated_data):
+        books = [Book(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            Book.objects.bulk_create(books, batch_size=BULK_CHUNK_SIZE)
+        return books
+
+    def update(self, instance, validated_data):
+        fields = set()
+        for book, attrs in zip(self.row_instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(book, attr, value)
+            fields.update(attrs)
+        if fields:
+            with transaction.atomic():
+                Book.objects.bulk_update(self.row_instances, sorted(fields), batch_size=BULK_CHUNK_SIZE)
+        return self.row_instances
+
+
 class BookSerializer(serializers.ModelSerializer):
     """
     BookSerializer handles serialization and deserialization of Book instances.
     Includes custom validation for publication_year to ensure it's not in the future.
     This serializer converts Book model instances to JSON and validates incoming data.
     """
+    serializer_related_field = BulkPrimaryKeyRelatedField
+
     class Meta:
         model = Book
         fields = ['id', 'title', 'publication_year', 'author']
         read_only_fields = ['id']
+        list_serializer_class = BookListSerializer
 
     def validate_publication_year(self, value):
         """
         Custom validation to ensure publication year is not in the future.
         This method is automatically called by DRF when validating publication_year data.
         """
-        current_year = datetime.now().year
-        if value > current_year:
-            raise serializers.ValidationError(
-                f"Publication year cannot be in the future. Current year is {current_year}."
-            )
-        if value < 1000:
-            raise serializers.ValidationError(
-                "Publication year must be a valid year (1000 or later)."
-            )
+        error = publication_year_error(value)
+        if error:
+            raise serializers.ValidationError(error)
         return value
 
 
@@ -39,8 +152,29 @@ class AuthorSerializer(serializers.ModelSerializer):
     This demonstrates handling nested objects in DRF serializers.
     """
     books = BookSerializer(many=True, read_only=True)
+    book_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Author
-        fields = ['id', 'name', 'books']
-        read_only_fields = ['id', 'books']
+        fields = ['id', 'name', 'book_count', 'books']
+        read_only_fields = ['id', 'book_count', 'books']
+
+    def get_book_count(self, obj):
+        """
+        Total number of books by the author, even when 'books' is limited.
+        The author views annotate it. Without the annotation the books must
+        have been prefetched in full (prefetch_related('books')), except for
+        a single author, which may fall back to one COUNT query; a list of
+        authors with neither would run one query per author.
+        """
+        book_count = getattr(obj, 'book_count', None)
+        if book_count is not None:
+            return book_count
+        if 'books' in getattr(obj, '_prefetched_objects_cache', {}):
+            return len(obj.books.all())
+        if isinstance(self.parent, serializers.ListSerializer):
+            raise ImproperlyConfigured(
+                "AuthorSerializer(many=True) needs authors annotated with "
+                "book_count or with their books prefetched."
+            )
+        return obj.books.count()
@@ -1,6 +1,17 @@
 """
 Unit tests for Django REST Framework APIs
 """
+import io
+import json
+import os
+import tempfile
+
+from unittest import skipUnless
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
@@ -8,6 +19,12 @@ from rest_framework import status
 from django.contrib.auth.models import User
 from .models import Author, Book
 from .serializers import BookSerializer, AuthorSerializer
+from .catalog import export_catalog, import_catalog
+from .search import sqlite_has_trigram
+from .benchmarks import seed_books
+from .query_plans import FULL_SCAN_PATTERNS, analyze_plan, explain_view
+from .views import BookListView
+from query_instrumentation import QueryBudgetMixin
 
 
 class BookModelTest(TestCase):
@@ -66,6 +83,32 @@ class BookSerializerTest(TestCase):
         self.assertIn('publication_year', serializer.errors)
 
 
+class AuthorSerializerTest(TestCase):
+    """Test the Author serializer's book_count"""
+
+    def setUp(self):
+        for name in ('First Author', 'Second Author'):
+            author = Author.objects.create(name=name)
+            Book.objects.create(title=f'{name} Book', publication_year=2020, author=author)
+
+    def test_book_count_from_prefetched_books(self):
+        """A list with prefetched books counts them without further queries"""
+        authors = list(Author.objects.prefetch_related('books'))
+        with self.assertNumQueries(0):
+            data = AuthorSerializer(authors, many=True).data
+        self.assertEqual([author['book_count'] for author in data], [1, 1])
+
+    def test_list_needs_annotation_or_prefetch(self):
+        """A list of plain authors is refused rather than counted one by one"""
+        with self.assertRaises(ImproperlyConfigured):
+            AuthorSerializer(Author.objects.all(), many=True).data
+
+    def test_single_author_counts_books(self):
+        """A single author may fall back to a COUNT query"""
+        author = Author.objects.get(name='First Author')
+        self.assertEqual(AuthorSerializer(author).data['book_count'], 1)
+
+
 class BookListViewTest(APITestCase):
     """Test Book list view with filtering, searching, ordering"""
     
@@ -283,6 +326,320 @@ class AuthorViewTest(APITestCase):
         self.assertEqual(response.data['books'][0]['title'], 'Test Book')
 
 
+    def test_author_book_count_and_books_limit(self):
+        """Nested books can be limited to the most recent; book_count stays the total"""
+        for year in (2019, 2021):
+            Book.objects.create(title=f"Book {year}", publication_year=year, author=self.author)
+        response = self.client.get(self.detail_url, {'books_limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['book_count'], 3)
+        self.assertEqual([book['publication_year'] for book in response.data['books']], [2021, 2020])
+
+        response = self.client.get(self.list_url, {'books_limit': 1})
+        self.assertEqual(response.data['results'][0]['book_count'], 3)
+        self.assertEqual(len(response.data['results'][0]['books']), 1)
+
+    def test_invalid_books_limit(self):
+        """books_limit must be a positive integer within the maximum"""
+        for value in ('0', 'many', '1000'):
+            response = self.client.get(self.list_url, {'books_limit': value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('books_limit', response.data)
+
+
+class BookBulkTest(QueryBudgetMixin, APITestCase):
+    """Test the bulk create, update and delete book endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.authors = [Author.objects.create(name=f"Author {i}") for i in range(3)]
+        self.client.force_authenticate(user=self.user)
+        self.create_url = reverse('api:book-bulk-create')
+        self.update_url = reverse('api:book-bulk-update')
+        self.delete_url = reverse('api:book-bulk-delete')
+
+    def rows(self, count):
+        return [
+            {'title': f"Book {i}", 'publication_year': 1990 + i % 30, 'author': self.authors[i % 3].pk}
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        """Rows are created in input order with one INSERT per chunk"""
+        # One author lookup, three INSERTs of up to BULK_CHUNK_SIZE rows and
+        # the transaction's savepoints
+        with self.assertQueryBudget(7):
+            response = self.client.post(self.create_url, self.rows(1200), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Book.objects.count(), 1200)
+        self.assertEqual(len(response.data), 1200)
+        self.assertEqual(response.data[5]['index'], 5)
+        self.assertEqual(response.data[5]['status'], 'created')
+        self.assertEqual(Book.objects.get(pk=response.data[5]['id']).title, 'Book 5')
+
+    def test_bulk_create_reports_errors_per_row(self):
+        """Any invalid row rejects the request; every row gets a result"""
+        rows = self.rows(4)
+        rows[1]['publication_year'] = 3000
+        rows[3]['author'] = 999
+        response = self.client.post(self.create_url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([row['index'] for row in response.data], [0, 1, 2, 3])
+        self.assertEqual(
+            [row['status'] for row in response.data], ['skipped', 'invalid', 'skipped', 'invalid']
+        )
+        self.assertIn('publication_year', response.data[1]['errors'])
+        self.assertIn('author', response.data[3]['errors'])
+        self.assertEqual(Book.objects.count(), 0)
+
+        response = self.client.post(self.create_url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', response.data)
+
+    def test_bulk_update(self):
+        """PUT replaces and PATCH partially updates the books named by id"""
+        self.client.post(self.create_url, self.rows(3), format='json')
+        books = list(Book.objects.order_by('pk'))
+        rows = [{'id': book.pk, 'title': f"New {book.title}"} for book in books]
+        response = self.client.patch(self.update_url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [{'index': index, 'status': 'updated', 'id': book.pk} for index, book in enumerate(books)],
+        )
+        self.assertEqual(
+            list(Book.objects.order_by('pk').values_list('title', flat=True)),
+            ['New Book 0', 'New Book 1', 'New Book 2'],
+        )
+        self.assertEqual(Book.objects.get(pk=books[0].pk).publication_year, books[0].publication_year)
+
+        response = self.client.put(self.update_url, [{'id': books[0].pk, 'title': 'Only title'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        rows = [
+            {'id': books[0].pk, 'title': 'A', 'publication_year': 2001, 'author': self.authors[2].pk},
+            {'id': books[0].pk, 'title': 'B', 'publication_year': 2002, 'author': self.authors[2].pk},
+        ]
+        response = self.client.put(self.update_url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([row['status'] for row in response.data], ['skipped', 'invalid'])
+        self.assertIn('id', response.data[1]['errors'])
+        self.assertEqual(Book.objects.get(pk=books[0].pk).title, 'New Book 0')
+
+    def test_bulk_delete(self):
+        """Each id is reported as deleted or not found"""
+        self.client.post(self.create_url, self.rows(3), format='json')
+        first, second = Book.objects.order_by('pk').values_list('pk', flat=True)[:2]
+        response = self.client.delete(self.delete_url, [first, second, 999], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [
+                {'index': 0, 'status': 'deleted', 'id': first},
+                {'index': 1, 'status': 'deleted', 'id': second},
+                {'index': 2, 'status': 'not_found', 'id': 999},
+            ],
+        )
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_bulk_endpoints_require_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(self.create_url, self.rows(1), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.delete(self.delete_url, [1], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CatalogTest(APITestCase):
+    """Test the streaming catalog export and import"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.author = Author.objects.create(name="Known Author")
+        for year in (2001, 2002, 2003):
+            Book.objects.create(title=f"Book, {year}", publication_year=year, author=self.author)
+
+    def export(self, resource, fmt):
+        response = self.client.get(reverse('api:catalog', args=[resource, fmt]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_formats(self):
+        """Exports stream every row, in chunks, as CSV with a header or NDJSON"""
+        lines = self.export('books', 'csv').splitlines()
+        self.assertEqual(lines[0], 'id,title,publication_year,author,author_name')
+        self.assertIn('"Book, 2001",2001', lines[1])
+        self.assertEqual(len(lines), 4)
+
+        rows = [json.loads(line) for line in self.export('authors', 'ndjson').splitlines()]
+        self.assertEqual(rows, [{'id': self.author.pk, 'name': 'Known Author'}])
+        self.assertEqual(len(list(export_catalog('books', 'ndjson', chunk_size=2))), 2)
+        self.assertEqual(self.client.get('/api/catalog/books.xml').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_import_round_trip(self):
+        """An export imports back, resolving author names and creating new authors"""
+        exported = self.export('books', 'ndjson')
+        extra = json.dumps({'title': 'New', 'publication_year': 1999, 'author_name': 'New Author'})
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse('api:catalog', args=['books', 'ndjson']),
+            exported + extra + '\n', content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(response.data['authors_created'], 1)
+        self.assertEqual(Book.objects.filter(author=self.author).count(), 6)
+        self.assertTrue(Book.objects.filter(title='New', author__name='New Author').exists())
+
+    def test_import_reports_invalid_rows(self):
+        """Invalid rows are skipped and reported by line number"""
+        data = (
+            'title,publication_year,author_name\n'
+            'Good,2000,Known Author\n'
+            'Future,3000,Known Author\n'
+            ',2000,\n'
+        )
+        result = import_catalog('books', io.StringIO(data), 'csv', batch_size=1)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['error_count'], 2)
+        self.assertEqual([error['line'] for error in result['errors']], [3, 4])
+        self.assertIn('publication_year', result['errors'][0]['errors'])
+        self.assertEqual(set(result['errors'][1]['errors']), {'title', 'author_name'})
+
+        result = import_catalog('authors', io.StringIO('{"name": "A"}\nnot json\n[1]\n'), 'ndjson')
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['error_count'], 2)
+
+    def test_import_requires_authentication(self):
+        response = self.client.post(
+            reverse('api:catalog', args=['authors', 'csv']), 'name\nA\n', content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_commands(self):
+        """export_catalog and import_catalog round-trip a CSV file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'authors.csv')
+            call_command('export_catalog', 'authors', format='csv', output=path, stderr=io.StringIO())
+            call_command('import_catalog', 'authors', path, stdout=io.StringIO())
+        self.assertEqual(Author.objects.filter(name='Known Author').count(), 2)
+
+        out = io.StringIO()
+        call_command('export_catalog', 'authors', format='ndjson', stdout=out)
+        names = [json.loads(line)['name'] for line in out.getvalue().splitlines()]
+        self.assertEqual(names.count('Known Author'), 2)
+
+
+class SearchIndexTest(APITestCase):
+    """Test that indexed_contains matches icontains and is served by the trigram indexes"""
+
+    def setUp(self):
+        self.achebe = Author.objects.create(name="Chinua Achebe")
+        self.other = Author.objects.create(name="Other Writer")
+        Book.objects.create(title="Things Fall Apart", publication_year=1958, author=self.achebe)
+        Book.objects.create(title="Arrow of God", publication_year=1964, author=self.achebe)
+        self.book = Book.objects.create(title="Small Things", publication_year=1997, author=self.other)
+
+    def assertSameAsIcontains(self, term):
+        indexed = Book.objects.filter(Q(title__indexed_contains=term) | Q(author__name__indexed_contains=term))
+        plain = Book.objects.filter(Q(title__icontains=term) | Q(author__name__icontains=term))
+        self.assertEqual(set(indexed), set(plain), term)
+
+    def test_same_rows_as_icontains(self):
+        """Indexed, short, quoted and unmatched terms return what icontains does"""
+        for term in ('things', 'ALL A', 'ow o', 'achebe', 'Ac', 'g', 'God"', 'writer', 'zzqx'):
+            self.assertSameAsIcontains(term)
+
+    @skipUnless(sqlite_has_trigram(connection), "needs SQLite's trigram tokenizer")
+    def test_unicode_case_folding(self):
+        """The index folds non-ASCII case, which SQLite's LIKE doesn't"""
+        zola = Author.objects.create(name="Émile Zola")
+        Book.objects.create(title="Germinal", publication_year=1885, author=zola)
+        self.assertTrue(Author.objects.filter(name__indexed_contains='émile').exists())
+        self.assertFalse(Author.objects.filter(name__icontains='émile').exists())
+        response = self.client.get(reverse('api:book-list'), {'author_name': 'ÉMILE'})
+        self.assertEqual([book['title'] for book in response.data['results']], ["Germinal"])
+
+    def test_index_follows_writes(self):
+        """Triggers keep the index in step with inserts, updates and deletes"""
+        self.book.title = "The God of Small Things"
+        self.book.save()
+        Book.objects.bulk_create([Book(title="Godot", publication_year=1953, author=self.other)])
+        Author.objects.filter(pk=self.other.pk).update(name="Arundhati Roy")
+        Book.objects.filter(title="Arrow of God").delete()
+        for term in ('god', 'small', 'roy', 'writer', 'arrow'):
+            self.assertSameAsIcontains(term)
+
+    @skipUnless(sqlite_has_trigram(connection), "needs SQLite's trigram tokenizer")
+    def test_plan_uses_index(self):
+        """Title and author name lookups read the trigram tables, not the book table"""
+        plan = Book.objects.filter(
+            Q(title__indexed_contains='thing') | Q(author__name__indexed_contains='thing')
+        ).explain()
+        self.assertIn('api_book_title_trgm', plan)
+        self.assertIn('api_author_name_trgm', plan)
+        self.assertNotIn('SCAN api_book\n', plan + '\n')
+
+    def test_filter_and_search_params(self):
+        """?title=, ?author_name= and ?search= go through the indexed lookup"""
+        url = reverse('api:book-list')
+        cases = [
+            ({'title': 'things'}, {"Things Fall Apart", "Small Things"}),
+            ({'author_name': 'achebe'}, {"Things Fall Apart", "Arrow of God"}),
+            ({'search': 'other'}, {"Small Things"}),
+            ({'search': 'of'}, {"Arrow of God"}),
+        ]
+        for params, titles in cases:
+            response = self.client.get(url, params)
+            self.assertEqual({book['title'] for book in response.data['results']}, titles, params)
+
+    def test_benchmark_command(self):
+        """benchmark_search reports both timings for each term"""
+        out = io.StringIO()
+        call_command('benchmark_search', 'things', '--repeat', '1', stdout=out)
+        self.assertIn('things', out.getvalue())
+
+
+class QueryPlanTest(TestCase):
+    """Test that the book list's filter/ordering combinations are served by indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_books(3000, authors=100)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_indexes_exist(self):
+        """The migration creates the indexes the model declares"""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Book._meta.db_table)
+        for name in ('api_book_year_title_idx', 'api_book_author_year_idx', 'api_book_title_idx'):
+            self.assertIn(name, constraints)
+
+    def test_analyze_plan(self):
+        """Table scans are flagged, index scans and searches are not"""
+        self.assertEqual(analyze_plan('4 0 0 SCAN api_book\n18 0 0 USE TEMP B-TREE FOR ORDER BY', 'sqlite'),
+                         (['api_book'], True))
+        self.assertEqual(analyze_plan('5 0 0 SCAN api_book USING INDEX api_book_title_idx', 'sqlite'), ([], False))
+        self.assertEqual(analyze_plan('Sort\n  ->  Seq Scan on api_book', 'postgresql'), (['api_book'], True))
+
+    @skipUnless(connection.vendor in FULL_SCAN_PATTERNS, "no plan patterns for this database")
+    def test_no_full_scans(self):
+        """No combination of a filter with an ordering reads a whole table"""
+        results = explain_view(BookListView, max_filters=1)
+        self.assertEqual(len(results), 49)
+        scans = {str(result['params']): result['plan'] for result in results if result['full_scans']}
+        self.assertEqual(scans, {})
+
+    def test_command(self):
+        """explain_queries logs every combination and passes --fail-on-scan"""
+        out = io.StringIO()
+        call_command('explain_queries', '--max-filters', '0', '--fail-on-scan', stdout=out)
+        self.assertIn('?ordering=-author__name: ok', out.getvalue())
+        self.assertIn('7 queries explained, 0 with full table scans', out.getvalue())
+
+
 class AuthenticationTest(APITestCase):
     """Specific tests for authentication using client.login"""
     
@@ -354,3 +711,41 @@ class AuthenticationTest(APITestCase):
         # Delete without login
         response = self.client.delete(self.delete_url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class QueryBudgetTest(QueryBudgetMixin, APITestCase):
+    """Pin the number of queries each list endpoint may run"""
+
+    def setUp(self):
+        author = Author.objects.create(name="Test Author")
+        for year in range(2000, 2015):
+            Book.objects.create(title=f"Book {year}", publication_year=year, author=author)
+
+    def test_book_list_budget(self):
+        """Book list runs a count and a page query regardless of page size"""
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('api:book-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_instrumentation_headers(self):
+        """Sampled responses carry the X-DB-* headers"""
+        with self.settings(QUERY_INSTRUMENTATION={'SAMPLE_RATE': 1.0, 'HEADERS': True}):
+            response = self.client.get(reverse('api:book-list'))
+        self.assertEqual(response['X-DB-Query-Count'], '2')
+        self.assertEqual(response['X-DB-Duplicate-Queries'], '0')
+
+    def test_author_list_budget(self):
+        """Author list runs a count, a page and one books prefetch, however many authors and books"""
+        with self.assertQueryBudget(3):
+            response = self.client.get(reverse('api:author-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for i in range(9):
+            author = Author.objects.create(name=f"Author {i}")
+            Book.objects.bulk_create(
+                Book(title=f"Book {i}.{j}", publication_year=2000 + j, author=author) for j in range(i)
+            )
+        for params in ({}, {'books_limit': 2}):
+            with self.assertQueryBudget(3, max_similar=0):
+                response = self.client.get(reverse('api:author-list'), params)
+            self.assertEqual(len(response.data['results']), 10)
@@ -10,8 +10,14 @@ urlpatterns = [
     path('books/create/', views.BookCreateView.as_view(), name='book-create'),
     path('books/update/<int:pk>/', views.BookUpdateView.as_view(), name='book-update'),
     path('books/delete/<int:pk>/', views.BookDeleteView.as_view(), name='book-delete'),
+    path('books/bulk/create/', views.BookBulkCreateView.as_view(), name='book-bulk-create'),
+    path('books/bulk/update/', views.BookBulkUpdateView.as_view(), name='book-bulk-update'),
+    path('books/bulk/delete/', views.BookBulkDeleteView.as_view(), name='book-bulk-delete'),
     
     # Author endpoints
     path('authors/', views.AuthorListView.as_view(), name='author-list'),
     path('authors/<int:pk>/', views.AuthorDetailView.as_view(), name='author-detail'),
+
+    # Catalog export/import, e.g. catalog/books.csv or catalog/authors.ndjson
+    path('catalog/<slug:resource>.<slug:fmt>', views.CatalogView.as_view(), name='catalog'),
 ]
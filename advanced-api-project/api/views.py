@@ -1,10 +1,21 @@
-from rest_framework import generics
+import codecs
+import csv
+
+from rest_framework import generics, serializers, status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.db.models import Count, F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from django_filters import rest_framework
 from .models import Book, Author
-from .serializers import BookSerializer, AuthorSerializer
-from .filters import BookFilter
+from .serializers import BULK_CHUNK_SIZE, BookSerializer, AuthorSerializer
+from .filters import BookFilter, IndexedSearchFilter
+from .catalog import COLUMNS, FORMATS, export_catalog, import_catalog
 
 class BookListView(generics.ListAPIView):
     """
@@ -23,10 +34,11 @@ class BookListView(generics.ListAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
     
     # Filtering configuration
-    filter_backends = [rest_framework.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [rest_framework.DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_class = BookFilter
     
-    # Search configuration - search across title and author name
+    # Search configuration - search across title and author name, through
+    # their trigram indexes (see api/search.py)
     search_fields = ['title', 'author__name']
     
     # Ordering configuration - default ordering and available fields
@@ -98,23 +110,217 @@ class BookDeleteView(generics.DestroyAPIView):
         instance.delete()
 
 
-class AuthorListView(generics.ListAPIView):
+class BulkBookMixin:
+    """
+    BulkBookMixin holds the settings shared by the bulk book endpoints, which
+    take a JSON array of up to max_rows rows per request.
+    """
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    permission_classes = [IsAuthenticated]
+    max_rows = 10000
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(many=True, allow_empty=False, max_length=self.max_rows)
+        return super().get_serializer(*args, **kwargs)
+
+    def save_rows(self, serializer, saved_status, success_status):
+        """
+        Validate and save ``serializer``'s rows, returning one result per
+        input row in input order: {'index', 'status': saved_status, 'id'} once
+        saved, or, when any row is invalid and nothing was written,
+        {'index', 'status': 'invalid', 'errors'} for the invalid rows and
+        {'index', 'status': 'skipped'} for the rest.
+        """
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, list):
+                errors = {index: row for index, row in enumerate(errors) if row}
+            elif not all(isinstance(index, int) for index in errors):
+                # Not a list of rows at all, e.g. an empty or oversized array
+                raise ValidationError(errors)
+            results = [
+                {'index': index, 'status': 'invalid', 'errors': errors[index]}
+                if index in errors else {'index': index, 'status': 'skipped'}
+                for index in range(len(serializer.initial_data))
+            ]
+            return Response(results, status=status.HTTP_400_BAD_REQUEST)
+        books = serializer.save()
+        return Response(
+            [{'index': index, 'status': saved_status, 'id': book.pk} for index, book in enumerate(books)],
+            status=success_status,
+        )
+
+
+class BookBulkCreateView(BulkBookMixin, generics.CreateAPIView):
+    """
+    BookBulkCreateView creates many Book instances from a JSON array of books.
+    Rows are validated by BookSerializer and inserted with bulk_create in one
+    transaction; if any row is invalid nothing is written.
+    Returns one result per row, in input order: 201 with each row 'created'
+    and its new id, or 400 with each row 'invalid' (with its errors) or
+    'skipped'.
+    Permission: IsAuthenticated - Only authenticated users can create books.
+    """
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        return self.save_rows(serializer, 'created', status.HTTP_201_CREATED)
+
+
+class BookBulkUpdateView(BulkBookMixin, generics.GenericAPIView):
+    """
+    BookBulkUpdateView updates many Book instances from a JSON array of books,
+    each with the 'id' of the book it replaces (PUT) or partially updates
+    (PATCH). The books are locked, validated and written with bulk_update in
+    one transaction; any invalid row rejects the whole request. Returns one
+    result per row, in input order: each row 'updated' with its id, or 400
+    with each row 'invalid' (with its errors) or 'skipped'.
+    Permission: IsAuthenticated - Only authenticated users can update books.
+    """
+
+    def put(self, request, *args, **kwargs):
+        return self.update(request, partial=False)
+
+    def patch(self, request, *args, **kwargs):
+        return self.update(request, partial=True)
+
+    def update(self, request, partial):
+        rows = request.data if isinstance(request.data, list) else []
+        ids = [row.get('id') for row in rows if isinstance(row, dict)]
+        with transaction.atomic():
+            books = list(
+                self.get_queryset().select_for_update().filter(pk__in=[pk for pk in ids if type(pk) is int])
+            )
+            serializer = self.get_serializer(books, data=request.data, partial=partial)
+            return self.save_rows(serializer, 'updated', status.HTTP_200_OK)
+
+
+class BookBulkDeleteView(BulkBookMixin, generics.GenericAPIView):
+    """
+    BookBulkDeleteView deletes the books whose ids are given as a JSON array,
+    in chunks inside one transaction. Ids of books that don't exist are
+    skipped. Returns one result per id, in input order: its index, the id
+    and 'deleted' or 'not_found'.
+    Permission: IsAuthenticated - Only authenticated users can delete books.
+    """
+
+    def delete(self, request, *args, **kwargs):
+        ids = serializers.ListField(
+            child=serializers.IntegerField(), allow_empty=False, max_length=self.max_rows
+        ).run_validation(request.data)
+        deleted = set()
+        unique_ids = list(dict.fromkeys(ids))
+        with transaction.atomic():
+            for start in range(0, len(unique_ids), BULK_CHUNK_SIZE):
+                books = self.get_queryset().filter(pk__in=unique_ids[start:start + BULK_CHUNK_SIZE])
+                deleted.update(books.values_list('pk', flat=True))
+                books.delete()
+        return Response(
+            [
+                {'index': index, 'status': 'deleted' if pk in deleted else 'not_found', 'id': pk}
+                for index, pk in enumerate(ids)
+            ],
+            status=status.HTTP_200_OK,
+        )
+
+
+class AuthorBooksMixin:
+    """
+    AuthorBooksMixin builds the Author queryset shared by the author views.
+    Each author's books are loaded with one prefetch query for the whole page
+    and book_count is annotated in the author query, so the number of queries
+    does not grow with the number of authors or books.
+
+    The optional ?books_limit=N query parameter caps the nested books at the
+    N most recent per author (at most max_books_limit); book_count still
+    reports the total.
+    """
+    max_books_limit = 100
+
+    def get_books_limit(self):
+        value = self.request.query_params.get('books_limit')
+        if value in (None, ''):
+            return None
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_books_limit:
+            raise ValidationError(
+                {'books_limit': f'Must be an integer between 1 and {self.max_books_limit}.'}
+            )
+        return limit
+
+    def get_queryset(self):
+        books = Book.objects.order_by(*Book._meta.ordering)
+        limit = self.get_books_limit()
+        if limit is not None:
+            # Rank each author's books in the prefetch query itself
+            books = books.annotate(
+                author_rank=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    order_by=[F('publication_year').desc(), F('title').asc()],
+                )
+            ).filter(author_rank__lte=limit)
+        return (
+            Author.objects.annotate(book_count=Count('books'))
+            .prefetch_related(Prefetch('books', queryset=books))
+            .order_by('pk')
+        )
+
+
+class AuthorListView(AuthorBooksMixin, generics.ListAPIView):
     """
     AuthorListView provides a read-only endpoint that returns a list of all Author instances.
     Includes nested book data through the AuthorSerializer.
+    Supports ?books_limit=N to return only each author's N most recent books.
     Permission: IsAuthenticatedOrReadOnly - Read access for all, write for authenticated users.
     """
-    queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class AuthorDetailView(generics.RetrieveAPIView):
+class AuthorDetailView(AuthorBooksMixin, generics.RetrieveAPIView):
     """
     AuthorDetailView provides a read-only endpoint to retrieve a single Author instance by ID.
     Includes nested book data through the AuthorSerializer.
+    Supports ?books_limit=N to return only the author's N most recent books.
     Permission: IsAuthenticatedOrReadOnly - Read access for all, write for authenticated users.
     """
-    queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+
+
+class CatalogView(APIView):
+    """
+    CatalogView exports and imports the whole book or author catalog as CSV
+    or NDJSON, e.g. /api/catalog/books.ndjson (see api/catalog.py).
+    GET streams the export without loading the catalog into memory. POST
+    imports the request body, which is parsed as it is read and inserted in
+    batches; the response reports how many rows were created and the errors
+    of invalid rows by line number.
+    Permission: IsAuthenticatedOrReadOnly - Anyone can export, only authenticated users can import.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def initial(self, request, *args, **kwargs):
+        if kwargs['resource'] not in COLUMNS or kwargs['fmt'] not in FORMATS:
+            raise Http404
+        super().initial(request, *args, **kwargs)
+
+    def get(self, request, resource, fmt):
+        response = StreamingHttpResponse(export_catalog(resource, fmt), content_type=FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{fmt}"'
+        return response
+
+    def post(self, request, resource, fmt):
+        # Read the raw body line by line; request.data would parse it whole
+        stream = request.stream
+        lines = codecs.iterdecode(iter(stream.readline, b''), 'utf-8-sig') if stream else []
+        try:
+            result = import_catalog(resource, lines, fmt)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ValidationError({'non_field_errors': [f'Could not read the file: {exc}']})
+        return Response(result, status=status.HTTP_200_OK)
@@ -0,0 +1,219 @@
+"""
+Per-request database cost instrumentation.
+
+QueryInstrumentationMiddleware records, for a sample of requests, the
+number of SQL queries, total SQL time, repeated queries (the signature of
+an N+1 loop) and the time spent building DRF serializer output. Results are
+logged to the ``instrumentation`` logger and, by default only with DEBUG,
+exposed as X-DB-* response headers.
+
+Settings (all optional)::
+
+    QUERY_INSTRUMENTATION = {
+        'SAMPLE_RATE': 0.01,       # fraction of requests to instrument
+                                   # (default: 1.0 with DEBUG, else 0.01)
+        'HEADERS': False,          # add X-DB-* headers to sampled responses
+                                   # (default: DEBUG; they reveal query costs)
+        'WARN_QUERY_COUNT': 50,    # log a warning above this many queries
+    }
+
+QueryBudgetMixin gives test cases assertQueryBudget() so per-endpoint query
+budgets can be pinned in CI.
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('instrumentation')
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Database and serializer cost collected for one request"""
+
+    def __init__(self):
+        self.queries = []
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+    def record(self, sql, params, duration):
+        self.queries.append((sql, _freeze(params)))
+        self.sql_seconds += duration
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def duplicate_count(self):
+        """Executions of a query with the exact same SQL and parameters beyond the first"""
+        return sum(count - 1 for count in Counter(self.queries).values())
+
+    @property
+    def similar_count(self):
+        """Executions of the same SQL with any parameters beyond the first (N+1 loops)"""
+        return sum(count - 1 for count in Counter(sql for sql, _ in self.queries).values())
+
+    def most_repeated(self, limit=3, width=120):
+        repeated = Counter(sql for sql, _ in self.queries).most_common(limit)
+        return [(sql[:width], count) for sql, count in repeated if count > 1]
+
+    def as_dict(self):
+        return {
+            'queries': self.query_count,
+            'sql_ms': round(self.sql_seconds * 1000, 2),
+            'duplicates': self.duplicate_count,
+            'similar': self.similar_count,
+            'serializer_ms': round(self.serializer_seconds * 1000, 2),
+        }
+
+
+def _freeze(params):
+    if isinstance(params, (list, tuple)):
+        return tuple(_freeze(value) for value in params)
+    if isinstance(params, dict):
+        return tuple(sorted((key, _freeze(value)) for key, value in params.items()))
+    try:
+        hash(params)
+    except TypeError:
+        return repr(params)
+    return params
+
+
+def current_stats():
+    """Stats for the request being instrumented on this thread, or None"""
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def capture(stats=None):
+    """Record every query executed on any configured database into ``stats``"""
+    stats = stats or RequestStats()
+
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.record(sql, params, time.perf_counter() - started)
+
+    previous = current_stats()
+    _local.stats = stats
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(wrapper))
+            yield stats
+    finally:
+        _local.stats = previous
+
+
+def _install_serializer_timing():
+    """
+    Time the outermost ``serializer.data`` evaluation. Nested serializers
+    run inside their parent's to_representation() and are not counted twice.
+    """
+    try:
+        from rest_framework.serializers import BaseSerializer
+    except ImportError:
+        return
+    if getattr(BaseSerializer, '_instrumented', False):
+        return
+
+    original = BaseSerializer.data.fget
+
+    def timed_data(self):
+        stats = current_stats()
+        if stats is None:
+            return original(self)
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            stats.serializer_depth -= 1
+            if stats.serializer_depth == 0:
+                stats.serializer_seconds += time.perf_counter() - started
+
+    BaseSerializer.data = property(timed_data)
+    BaseSerializer._instrumented = True
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Report query count, SQL time, duplicate queries and serializer time
+    for a sampled fraction of requests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, 'QUERY_INSTRUMENTATION', {})
+        self.sample_rate = options.get('SAMPLE_RATE', 1.0 if settings.DEBUG else 0.01)
+        self.headers = options.get('HEADERS', settings.DEBUG)
+        self.warn_query_count = options.get('WARN_QUERY_COUNT', 50)
+        _install_serializer_timing()
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with capture() as stats:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        if self.headers:
+            response['X-DB-Query-Count'] = str(stats.query_count)
+            response['X-DB-Query-Time-Ms'] = f'{stats.sql_seconds * 1000:.2f}'
+            response['X-DB-Duplicate-Queries'] = str(stats.duplicate_count)
+            response['X-DB-Similar-Queries'] = str(stats.similar_count)
+            response['X-Serializer-Time-Ms'] = f'{stats.serializer_seconds * 1000:.2f}'
+
+        view = getattr(getattr(request, 'resolver_match', None), 'view_name', None) or request.path
+        summary = stats.as_dict()
+        message = (
+            '%s %s [%s] queries=%d sql_ms=%.2f duplicates=%d similar=%d '
+            'serializer_ms=%.2f total_ms=%.2f'
+        )
+        args = (
+            request.method, request.path, view, summary['queries'], summary['sql_ms'],
+            summary['duplicates'], summary['similar'], summary['serializer_ms'], total_ms,
+        )
+        if stats.query_count > self.warn_query_count or stats.similar_count > self.warn_query_count:
+            logger.warning(message + ' most repeated=%r', *args, stats.most_repeated())
+        else:
+            logger.info(message, *args)
+        return response
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin for pinning per-endpoint query budgets.
+
+        def test_book_list_budget(self):
+            with self.assertQueryBudget(2, max_similar=0):
+                self.client.get(reverse('book-list'))
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, max_similar=None):
+        with capture() as stats:
+            yield stats
+        if stats.query_count > max_queries:
+            self.fail(
+                f'{stats.query_count} queries executed, budget is {max_queries}. '
+                f'Most repeated: {stats.most_repeated()}'
+            )
+        if max_similar is not None and stats.similar_count > max_similar:
+            self.fail(
+                f'{stats.similar_count} repeated queries executed, budget is {max_similar}. '
+                f'Most repeated: {stats.most_repeated()}'
+            )
@@ -1,9 +1,10 @@
 from django.contrib import admin
-from .models import Post, Comment
+from .models import Post, Comment, SpamToken, TagUsage
+from .moderation import review
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ['title', 'author', 'published_date']
+    list_display = ['title', 'author', 'published_date', 'comment_count']
     list_filter = ['published_date', 'author']
     search_fields = ['title', 'content']
     date_hierarchy = 'published_date'
@@ -11,8 +12,37 @@ class PostAdmin(admin.ModelAdmin):
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ['author', 'post', 'created_at', 'updated_at']
-    list_filter = ['created_at', 'author']
+    list_display = ['author', 'post', 'status', 'spam_score', 'created_at', 'updated_at']
+    list_filter = ['status', 'created_at', 'author']
     search_fields = ['content', 'author__username', 'post__title']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
+    readonly_fields = ['status', 'spam_score']
+    actions = ['approve_comments', 'reject_comments']
+
+    # Status changes go through the actions, which keep comment counts
+    # right and teach the spam classifier (see blog/moderation.py)
+    @admin.action(description='Approve selected comments')
+    def approve_comments(self, request, queryset):
+        changed = review(queryset, Comment.Status.APPROVED)
+        self.message_user(request, f'Approved {changed} comments.')
+
+    @admin.action(description='Reject selected comments as spam')
+    def reject_comments(self, request, queryset):
+        changed = review(queryset, Comment.Status.REJECTED)
+        self.message_user(request, f'Rejected {changed} comments.')
+
+
+@admin.register(TagUsage)
+class TagUsageAdmin(admin.ModelAdmin):
+    list_display = ['tag', 'post_count']
+    search_fields = ['tag__name']
+    ordering = ['-post_count']
+    readonly_fields = ['tag', 'post_count']
+
+
+@admin.register(SpamToken)
+class SpamTokenAdmin(admin.ModelAdmin):
+    list_display = ['token', 'spam_count', 'ham_count']
+    search_fields = ['token']
+    ordering = ['-spam_count']
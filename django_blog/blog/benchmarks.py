@@ -0,0 +1,130 @@
+"""
+WSGI vs ASGI throughput of the blog's read views.
+
+Drives the hot pages in-process through Django's WSGI handler (the test
+Client, one thread per concurrent reader) and its ASGI handler (the
+AsyncClient, one task per concurrent reader) against the configured
+database, and reports latency percentiles and requests per second for
+each. Readers are logged in by default so the anonymous full-page cache
+doesn't answer every request.
+"""
+import asyncio
+import threading
+import time
+from statistics import quantiles
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from .models import Post
+
+BENCH_USERNAME = 'bench_reader'
+
+SCENARIOS = {
+    'home': lambda pk, title: reverse('home'),
+    'post-detail': lambda pk, title: reverse('post-detail', args=[pk]),
+    'search': lambda pk, title: f"{reverse('search')}?{urlencode({'q': title.split()[0]})}",
+}
+
+
+def _summary(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    if len(latencies) > 1:
+        cuts = quantiles(latencies, n=100)
+    else:
+        # One sample is every percentile; none reports zeros
+        cuts = (latencies or [0.0]) * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'latency_ms': {
+            'p50': cuts[49] * 1000,
+            'p95': cuts[94] * 1000,
+            'p99': cuts[98] * 1000,
+        },
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def _run_wsgi(urls, concurrency, user):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def reader(share):
+        client = Client()
+        if user:
+            client.force_login(user)
+        try:
+            for url in share:
+                started = time.perf_counter()
+                status = client.get(url).status_code
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    errors.append(status != 200)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=reader, args=(urls[i::concurrency],)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _summary(latencies, sum(errors), time.perf_counter() - started)
+
+
+def _run_asgi(urls, concurrency, user):
+    latencies, errors = [], []
+
+    async def reader(share):
+        client = AsyncClient()
+        if user:
+            await client.aforce_login(user)
+        for url in share:
+            started = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - started)
+            errors.append(response.status_code != 200)
+
+    async def main():
+        await asyncio.gather(*(reader(urls[i::concurrency]) for i in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return _summary(latencies, sum(errors), time.perf_counter() - started)
+
+
+def run_benchmark(scenarios=None, requests=200, concurrency=10, anonymous=False, warmup=5):
+    """
+    Time ``requests`` requests per scenario through each handler with
+    ``concurrency`` readers at once. Raises ValueError if there are no
+    posts to read.
+    """
+    posts = list(Post.objects.order_by('-published_date').values_list('pk', 'title')[:100])
+    if not posts:
+        raise ValueError('No posts to read; create some posts first')
+    user = None
+    if not anonymous:
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+
+    results = []
+    # The test clients send Host: testserver
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for name in scenarios or SCENARIOS:
+            build = SCENARIOS[name]
+            urls = [build(*posts[i % len(posts)]) for i in range(requests)]
+            for server, run in (('wsgi', _run_wsgi), ('asgi', _run_asgi)):
+                if warmup:
+                    run(urls[:warmup], 1, user)
+                results.append({'scenario': name, 'server': server, **run(urls, concurrency, user)})
+    return {
+        'database': connection.vendor,
+        'posts': Post.objects.count(),
+        'concurrency': concurrency,
+        'anonymous': anonymous,
+        'results': results,
+    }
@@ -0,0 +1,75 @@
+"""
+Cached site statistics and template fragment versioning.
+
+Template fragments are keyed by a site-wide cache generation, so bumping
+the generation invalidates every fragment at once without having to know
+each (per-page, per-user) fragment key. The site stats object is stored
+under its own key with a TTL and dropped on the same events. Both are
+invalidated by the signal handlers in blog/signals.py.
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .models import Post
+from .tag_stats import popular_tags
+
+GENERATION_KEY = 'blog:cache-generation'
+SITE_STATS_KEY = 'blog:site-stats'
+
+
+def cache_ttl():
+    """Lifetime in seconds of cached fragments and stats"""
+    return getattr(settings, 'BLOG_CACHE_TTL', 300)
+
+
+def cache_generation():
+    """Current fragment generation, used as a vary-on value in {% cache %} tags"""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock rather than 1 so an evicted counter never
+        # brings back fragments rendered under an earlier generation.
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _compute_site_stats():
+    return {
+        'total_posts': Post.objects.count(),
+        'total_authors': User.objects.count(),
+        'popular_tags': popular_tags(15),
+    }
+
+
+def get_site_stats():
+    """Post/author totals and popular tags, cached for cache_ttl() seconds"""
+    return cache.get_or_set(SITE_STATS_KEY, _compute_site_stats, cache_ttl())
+
+
+async def aget_site_stats():
+    """get_site_stats() for async views; on a miss the three lookups run together"""
+    stats = await cache.aget(SITE_STATS_KEY)
+    if stats is None:
+        total_posts, total_authors, tags = await asyncio.gather(
+            Post.objects.acount(),
+            User.objects.acount(),
+            sync_to_async(popular_tags)(15),
+        )
+        stats = {'total_posts': total_posts, 'total_authors': total_authors, 'popular_tags': tags}
+        await cache.aset(SITE_STATS_KEY, stats, cache_ttl())
+    return stats
+
+
+def invalidate_site_cache():
+    """Drop the cached stats and every fragment rendered so far"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # No generation yet; the next read starts a fresh one
+        pass
+    cache.delete(SITE_STATS_KEY)
@@ -0,0 +1,236 @@
+"""
+RSS, Atom and JSON feeds of the latest posts: site-wide, per author and
+per tag.
+
+Feeds are streamed: posts are read with QuerySet.iterator() and each entry
+is written out as soon as it is rendered, so a feed never holds all its
+posts in memory. Every feed carries a Last-Modified (and ETag) taken from
+its newest published_date, a single indexed lookup, so readers polling an
+unchanged feed get a 304 without any post being read, and a public
+Cache-Control so shared caches can answer in between.
+"""
+import hashlib
+import io
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Max, Subquery
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed, SyndicationFeed
+from django.utils.http import http_date, quote_etag
+from django.utils.xmlutils import SimplerXMLGenerator
+from taggit.models import Tag
+
+from .models import Post, TagPosting
+from .tag_stats import tag_postings
+
+FEED_ITEMS = 50
+FEED_CHUNK_SIZE = 25
+
+
+def feed_max_age():
+    """Seconds shared caches and readers may reuse a feed without asking"""
+    return getattr(settings, 'BLOG_FEED_MAX_AGE', 900)
+
+
+class StreamingFeedMixin:
+    """
+    Write a feed generator's document piece by piece: the channel header,
+    then one chunk per item drawn from a lazy iterable, then the footer.
+    """
+
+    def __init__(self, *args, newest=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.newest = newest
+
+    def latest_post_date(self):
+        # Items are never collected in self.items, so use the known date
+        return self.newest or super().latest_post_date()
+
+    def make_item(self, **kwargs):
+        """The item dict add_item() would store, without storing it"""
+        self.add_item(**kwargs)
+        return self.items.pop()
+
+    def stream(self, items, encoding='utf-8'):
+        buffer = io.StringIO()
+
+        def drain():
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return chunk
+
+        handler = SimplerXMLGenerator(buffer, encoding, short_empty_elements=True)
+        handler.startDocument()
+        self.start_feed(handler)
+        yield drain()
+        for item in items:
+            self.write_item(handler, item)
+            yield drain()
+        self.end_feed(handler)
+        yield drain()
+
+
+class StreamingRssFeed(StreamingFeedMixin, Rss201rev2Feed):
+    def start_feed(self, handler):
+        handler.startElement('rss', self.rss_attributes())
+        handler.startElement('channel', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def write_item(self, handler, item):
+        handler.startElement('item', self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement('item')
+
+    def end_feed(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement('rss')
+
+
+class StreamingAtomFeed(StreamingFeedMixin, Atom1Feed):
+    def start_feed(self, handler):
+        handler.startElement('feed', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def write_item(self, handler, item):
+        handler.startElement('entry', self.item_attributes(item))
+        self.add_item_elements(handler, item)
+        handler.endElement('entry')
+
+    def end_feed(self, handler):
+        handler.endElement('feed')
+
+
+class StreamingJSONFeed(StreamingFeedMixin, SyndicationFeed):
+    """JSON Feed 1.1 (https://jsonfeed.org/version/1.1)"""
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def stream(self, items, encoding='utf-8'):
+        header = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.feed['title'],
+            'home_page_url': self.feed['link'],
+            'feed_url': self.feed['feed_url'],
+            'description': self.feed['description'],
+            'language': self.feed['language'],
+        })
+        # Splice the items array into the top-level object
+        yield header[:-1] + ', "items": ['
+        separator = ''
+        for item in items:
+            entry = {
+                'id': item['unique_id'] or item['link'],
+                'url': item['link'],
+                'title': item['title'],
+                'content_html': item['description'],
+                'date_published': item['pubdate'].isoformat(),
+                'authors': [{'name': item['author_name']}],
+                'tags': list(item['categories']),
+            }
+            if item['updateddate']:
+                entry['date_modified'] = item['updateddate'].isoformat()
+            yield separator + json.dumps(entry)
+            separator = ', '
+        yield ']}'
+
+
+FEED_TYPES = {
+    'rss': StreamingRssFeed,
+    'atom': StreamingAtomFeed,
+    'json': StreamingJSONFeed,
+}
+
+
+def _feed_items(feed, request, posts):
+    for post in posts.iterator(chunk_size=FEED_CHUNK_SIZE):
+        link = request.build_absolute_uri(post.get_absolute_url())
+        yield feed.make_item(
+            title=post.title,
+            link=link,
+            description=post.content_html,
+            author_name=post.author.username,
+            pubdate=post.published_date,
+            unique_id=link,
+            unique_id_is_permalink=True,
+            categories=[tag.name for tag in post.tags.all()],
+        )
+
+
+def _feed_response(request, feed_format, title, description, link, posts, newest):
+    feed_class = FEED_TYPES.get(feed_format)
+    if feed_class is None:
+        raise Http404(f'Unknown feed format {feed_format!r}')
+
+    etag = newest and quote_etag(
+        hashlib.md5(f'{request.path}:{newest.isoformat()}'.encode()).hexdigest()
+    )
+    last_modified = newest and int(newest.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        feed = feed_class(
+            title=title,
+            link=request.build_absolute_uri(link),
+            description=description,
+            feed_url=request.build_absolute_uri(request.path),
+            language=settings.LANGUAGE_CODE,
+            newest=newest,
+        )
+        posts = (
+            posts.select_related('author')
+            .only('id', 'title', 'content_html', 'published_date', 'author__username')
+            .prefetch_related('tags')
+            .order_by('-published_date', '-id')[:FEED_ITEMS]
+        )
+        response = StreamingHttpResponse(
+            feed.stream(_feed_items(feed, request, posts)),
+            content_type=feed.content_type,
+        )
+    if etag:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=feed_max_age())
+    return response
+
+
+def posts_feed(request, feed_format):
+    posts = Post.objects.all()
+    return _feed_response(
+        request, feed_format,
+        title='Django Blog',
+        description='Latest posts',
+        link=reverse('post-list'),
+        posts=posts,
+        newest=posts.aggregate(newest=Max('published_date'))['newest'],
+    )
+
+
+def author_feed(request, username, feed_format):
+    author = get_object_or_404(User, username=username)
+    posts = Post.objects.filter(author=author)
+    return _feed_response(
+        request, feed_format,
+        title=f'Django Blog: posts by {author.username}',
+        description=f'Latest posts by {author.username}',
+        link=reverse('post-list'),
+        posts=posts,
+        newest=posts.aggregate(newest=Max('published_date'))['newest'],
+    )
+
+
+def tag_feed(request, tag_name, feed_format):
+    tag = get_object_or_404(Tag, name=tag_name)
+    # Both lookups read the tag's posting list (see blog/tag_stats.py)
+    latest = tag_postings(tag).order_by('-published_date', '-post_id').values('post_id')[:FEED_ITEMS]
+    return _feed_response(
+        request, feed_format,
+        title=f'Django Blog: posts tagged {tag.name}',
+        description=f'Latest posts tagged {tag.name}',
+        link=reverse('posts-by-tag', args=[tag.name]),
+        posts=Post.objects.filter(pk__in=Subquery(latest)),
+        newest=TagPosting.objects.filter(tag=tag).aggregate(newest=Max('published_date'))['newest'],
+    )
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from blog.benchmarks import SCENARIOS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare WSGI and ASGI latency and throughput of the hot blog pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS),
+                            help='Pages to benchmark (default: all)')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per page and server')
+        parser.add_argument('--concurrency', type=int, default=10, help='Readers requesting at once')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per page and server')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Read logged out, so the full-page cache is in play')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            report = run_benchmark(
+                scenarios=options['scenarios'],
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                anonymous=options['anonymous'],
+                warmup=options['warmup'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['posts']} posts ({report['database']}), concurrency {report['concurrency']}"
+            f"{', anonymous' if report['anonymous'] else ''}"
+        )
+        self.stdout.write(
+            f"{'page':<14}{'server':<8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}"
+        )
+        for row in report['results']:
+            latency = row['latency_ms']
+            self.stdout.write(
+                f"{row['scenario']:<14}{row['server']:<8}{latency['p50']:>10.2f}{latency['p95']:>10.2f}"
+                f"{latency['p99']:>10.2f}{row['throughput_rps']:>10.1f}{row['errors']:>8}"
+            )
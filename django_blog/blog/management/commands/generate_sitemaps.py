@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from blog.sitemaps import SITEMAP_MAX_URLS, sitemap_root, write_sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Write the gzipped sitemap files and sitemap index for every post and tag page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=None,
+                            help='Scheme and host of the site (default: BLOG_SITEMAP_BASE_URL)')
+        parser.add_argument('--output', default=None, help='Directory to write to (default: BLOG_SITEMAP_ROOT)')
+        parser.add_argument('--max-urls', type=int, default=SITEMAP_MAX_URLS, help='URLs per sitemap file')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows read per query')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'] or getattr(settings, 'BLOG_SITEMAP_BASE_URL', 'http://localhost:8000')
+        directory = options['output'] or sitemap_root()
+        written = write_sitemaps(
+            base_url,
+            directory=directory,
+            max_urls=options['max_urls'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} URLs to {directory}'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from blog.moderation import moderate_pending
+
+
+class Command(BaseCommand):
+    help = 'Score pending comments for spam in batches, approving and rejecting the clear cases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Comments scored per batch')
+        parser.add_argument('--rescore', action='store_true',
+                            help='Score again the comments left pending for a moderator')
+        parser.add_argument('--watch', action='store_true', help='Keep polling the queue')
+        parser.add_argument('--interval', type=float, default=10.0,
+                            help='Seconds between polls with --watch')
+
+    def handle(self, *args, **options):
+        while True:
+            totals = moderate_pending(
+                batch_size=options['batch_size'],
+                rescore=options['rescore'],
+                log=self.stdout.write if options['verbosity'] > 1 else None,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Approved {totals['approved']}, rejected {totals['rejected']}, "
+                f"left {totals['pending']} for a moderator"
+            ))
+            if not options['watch']:
+                break
+            # Only newly arrived comments are worth scoring on later passes
+            options['rescore'] = False
+            time.sleep(options['interval'])
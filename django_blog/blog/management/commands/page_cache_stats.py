@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from blog.page_cache import page_cache_stats, reset_page_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Report the hit ratio of the anonymous full-page cache (needs a cache shared between processes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting')
+
+    def handle(self, *args, **options):
+        stats = page_cache_stats()
+        self.stdout.write(
+            f"hits={stats['hit']} misses={stats['miss']} bypasses={stats['bypass']} "
+            f"hit_ratio={stats['hit_ratio']:.1%}"
+        )
+        if options['reset']:
+            reset_page_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
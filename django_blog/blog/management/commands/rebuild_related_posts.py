@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from blog.related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related-posts index for every post using a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: one per CPU; 1 runs in-process)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Posts ranked per task')
+
+    def handle(self, *args, **options):
+        ranked = rebuild_related_posts(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Ranked related posts for {ranked} posts'))
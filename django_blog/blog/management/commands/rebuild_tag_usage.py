@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from blog.caching import invalidate_site_cache
+from blog.tag_stats import rebuild_tag_postings, rebuild_tag_usage
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-tag post counts and posting lists behind tag pages, popular tags and the tag cloud'
+
+    def handle(self, *args, **options):
+        counted = rebuild_tag_usage()
+        listed = rebuild_tag_postings()
+        invalidate_site_cache()
+        self.stdout.write(self.style.SUCCESS(f'Counted usage for {counted} tags, listed {listed} tagged posts'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from blog.caching import invalidate_site_cache
+from blog.markup import renderer_version, rerender_markup
+from blog.models import Comment, Post
+from blog.page_cache import ALL_PAGES, purge_pages
+
+
+class Command(BaseCommand):
+    help = 'Re-render stored post and comment HTML left by an older Markdown renderer, using a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: one per CPU; 1 runs in-process)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Bodies rendered per task')
+        parser.add_argument('--all', action='store_true', dest='force',
+                            help='Re-render every body, not only stale ones')
+
+    def handle(self, *args, **options):
+        rendered = rerender_markup(
+            [Post, Comment],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            force=options['force'],
+            log=self.stdout.write,
+        )
+        if rendered:
+            invalidate_site_cache()
+            purge_pages(ALL_PAGES)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} bodies with renderer {renderer_version()}'))
@@ -0,0 +1,133 @@
+"""
+Markdown rendering for post and comment bodies.
+
+Bodies are rendered once, when they are saved, into the ``content_html``
+column next to the Markdown source, so pages only ever output stored HTML.
+Rendered HTML is sanitized with an allowlist, since authors are not
+trusted to write markup.
+
+Rendering needs the ``markdown`` and ``nh3`` packages. Without them bodies
+are rendered as escaped plain text with paragraphs and line breaks, like
+the linebreaks filter. Each row records the renderer version that produced
+its HTML; when RENDERER_VERSION is bumped (or the packages are installed)
+the rerender_markup command renders the stale rows again on a process pool.
+"""
+from html import unescape
+
+from django.utils.html import linebreaks, strip_tags
+from django.utils.text import Truncator
+
+from .workers import bounded_map, process_pool
+
+try:
+    import markdown
+    import nh3
+except ImportError:
+    markdown = nh3 = None
+
+# Bump whenever a change here changes the HTML produced for the same source
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'blockquote', 'br', 'code', 'del', 'em', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'img', 'li', 'ol', 'p', 'pre', 'strong', 'table',
+    'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'img': {'src', 'alt', 'title'},
+    'td': {'align'},
+    'th': {'align'},
+}
+ALLOWED_URL_SCHEMES = {'http', 'https', 'mailto'}
+
+EXCERPT_WORDS = 50
+
+
+def renderer_version():
+    """Identifies the renderer in use; stored with each row's rendered HTML"""
+    return f"{RENDERER_VERSION}-{'markdown' if markdown else 'plain'}"
+
+
+def render_markdown(text):
+    """Sanitized HTML for a Markdown body"""
+    if markdown is None:
+        return linebreaks(text, autoescape=True)
+    html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS, output_format='html')
+    return nh3.clean(
+        html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes=ALLOWED_URL_SCHEMES,
+        link_rel='nofollow noopener',
+    )
+
+
+def make_excerpt(content_html):
+    """
+    The first EXCERPT_WORDS words of rendered HTML as plain text (tags
+    stripped, entities decoded), as truncatewords would render them
+    """
+    return Truncator(unescape(strip_tags(content_html))).words(EXCERPT_WORDS, truncate=' …')
+
+
+def _render_chunk(rows):
+    return [(pk, render_markdown(text)) for pk, text in rows]
+
+
+def _stale_chunks(rows, chunk_size):
+    """(pk, content) of ``rows`` in pk order, ``chunk_size`` rows per query"""
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk).values_list('pk', 'content')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+def rerender_markup(models, workers=None, chunk_size=200, force=False, log=None):
+    """
+    Re-render the stored HTML of every row of ``models`` rendered by an
+    older renderer version (every row with ``force``). Rendering is spread
+    over ``workers`` processes (all CPUs by default, in-process with
+    ``workers=1``); rows are read and written in the calling process, one
+    chunk of ``chunk_size`` rows at a time. Returns the number of rows
+    rendered.
+    """
+    version = renderer_version()
+    rendered = 0
+    pool = None
+    try:
+        for model in models:
+            rows = model.objects.order_by('pk')
+            if not force:
+                rows = rows.exclude(content_html_version=version)
+            total = rows.count()
+            if pool is None and workers != 1 and total > chunk_size:
+                pool = process_pool(workers)
+            # Post excerpts are taken from the HTML, so they change with it
+            fields = ['content_html', 'content_html_version']
+            has_excerpt = any(field.name == 'excerpt' for field in model._meta.concrete_fields)
+            if has_excerpt:
+                fields.append('excerpt')
+            done = 0
+            for chunk in bounded_map(pool, _render_chunk, _stale_chunks(rows, chunk_size), workers):
+                objs = []
+                for pk, content_html in chunk:
+                    obj = model(pk=pk, content_html=content_html, content_html_version=version)
+                    if has_excerpt:
+                        obj.excerpt = make_excerpt(content_html)
+                    objs.append(obj)
+                model.objects.bulk_update(objs, fields)
+                done += len(chunk)
+                if log:
+                    log(f'{model._meta.verbose_name_plural}: rendered {done}/{total}')
+            rendered += done
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return rendered
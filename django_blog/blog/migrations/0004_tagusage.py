@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_existing_tags(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    TagUsage = apps.get_model('blog', 'TagUsage')
+    content_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    if content_type is None:
+        return
+    counts = (
+        TaggedItem.objects.filter(content_type=content_type)
+        .values('tag_id')
+        .annotate(total=models.Count('id'))
+    )
+    TagUsage.objects.bulk_create(
+        [TagUsage(tag_id=row['tag_id'], post_count=row['total']) for row in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_post_tags'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagUsage',
+            fields=[
+                ('tag', models.OneToOneField(help_text='Tag being counted', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='taggit.tag')),
+                ('post_count', models.PositiveIntegerField(default=0, help_text='Number of posts tagged with this tag')),
+            ],
+            options={
+                'verbose_name': 'Tag Usage',
+                'verbose_name_plural': 'Tag Usage',
+                'indexes': [models.Index(fields=['-post_count', 'tag'], name='blog_tagusage_popular_idx')],
+            },
+        ),
+        migrations.RunPython(count_existing_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+from blog.search import get_backend
+
+
+def create_search_index(apps, schema_editor):
+    backend = get_backend(schema_editor.connection.vendor)
+    backend.create_index(schema_editor)
+
+    # Index the posts that already exist
+    Post = apps.get_model('blog', 'Post')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    content_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    tags = {}
+    if content_type is not None:
+        for object_id, name in TaggedItem.objects.filter(content_type=content_type).values_list(
+            'object_id', 'tag__name'
+        ):
+            tags.setdefault(object_id, []).append(name)
+    for pk, title, content in Post.objects.values_list('pk', 'title', 'content').iterator():
+        backend.index(pk, title, content, ' '.join(tags.get(pk, [])))
+
+
+def drop_search_index(apps, schema_editor):
+    get_backend(schema_editor.connection.vendor).drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_tagusage'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Blend of tag Jaccard similarity and recency')),
+                ('shared_tags', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(help_text='Post the list belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='blog.post')),
+                ('related', models.ForeignKey(help_text='Post being recommended', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post')),
+            ],
+            options={
+                'verbose_name': 'Related Post',
+                'verbose_name_plural': 'Related Posts',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['post', '-score'], name='blog_relatedpost_rank_idx')],
+                'unique_together': {('post', 'related')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:29
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_existing_comments(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    counts = models.Subquery(
+        Comment.objects.filter(post=models.OuterRef('pk'))
+        .values('post')
+        .annotate(total=models.Count('pk'))
+        .values('total')
+    )
+    Post.objects.update(comment_count=Coalesce(counts, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_relatedpost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of comments on this post'),
+        ),
+        migrations.RunPython(count_existing_comments, migrations.RunPython.noop),
+    ]
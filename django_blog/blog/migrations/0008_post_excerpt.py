@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:30
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def make_excerpt(content):
+    """
+    Frozen copy of the excerpt logic at this point: the first 50 words of the
+    Markdown source. 0014_excerpt_from_html replaces these excerpts with ones
+    cut from the rendered HTML.
+    """
+    return Truncator(content).words(50, truncate=' …')
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'content').iterator(chunk_size=500):
+        post.excerpt = make_excerpt(post.content)
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Start of the content shown on list pages; updated on save'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
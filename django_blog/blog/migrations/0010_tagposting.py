@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_postings(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    Post = apps.get_model('blog', 'Post')
+    TagPosting = apps.get_model('blog', 'TagPosting')
+    content_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    if content_type is None:
+        return
+    published = dict(Post.objects.values_list('pk', 'published_date'))
+    rows = TaggedItem.objects.filter(content_type=content_type).values_list('tag_id', 'object_id')
+    TagPosting.objects.bulk_create(
+        [
+            TagPosting(tag_id=tag_id, post_id=post_id, published_date=published[post_id])
+            for tag_id, post_id in rows.iterator() if post_id in published
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_post_published_idx'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_date', models.DateTimeField(help_text="Copy of the post's published date")),
+                ('post', models.ForeignKey(help_text='Tagged post', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post')),
+                ('tag', models.ForeignKey(help_text='Tag the post is listed under', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='taggit.tag')),
+            ],
+            options={
+                'verbose_name': 'Tag Posting',
+                'verbose_name_plural': 'Tag Postings',
+                'indexes': [models.Index(fields=['tag', 'published_date', 'post'], name='blog_tagposting_listing_idx')],
+                'unique_together': {('tag', 'post')},
+            },
+        ),
+        migrations.RunPython(build_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:42
+
+from django.db import migrations, models
+
+from blog.markup import render_markdown, renderer_version
+
+
+def render_existing(apps, schema_editor):
+    version = renderer_version()
+    for name in ('Post', 'Comment'):
+        model = apps.get_model('blog', name)
+        rows = [
+            model(pk=pk, content_html=render_markdown(content), content_html_version=version)
+            for pk, content in model.objects.values_list('pk', 'content').iterator()
+        ]
+        model.objects.bulk_update(rows, ['content_html', 'content_html_version'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_tagposting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, help_text='Sanitized HTML rendered from the content on save'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='content_html_version',
+            field=models.CharField(blank=True, editable=False, help_text='Renderer version that produced content_html', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, help_text='Sanitized HTML rendered from the content on save'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html_version',
+            field=models.CharField(blank=True, editable=False, help_text='Renderer version that produced content_html', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='content',
+            field=models.TextField(help_text='Content of the comment, in Markdown', max_length=1000),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='content',
+            field=models.TextField(help_text='Main content of the blog post, in Markdown'),
+        ),
+        migrations.RunPython(render_existing, migrations.RunPython.noop),
+    ]
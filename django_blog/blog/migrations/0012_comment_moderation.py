@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def approve_existing(apps, schema_editor):
+    # Comments posted before moderation were already published and counted
+    apps.get_model('blog', 'Comment').objects.update(status='approved')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_content_html'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(help_text='Normalized word or feature', max_length=64, unique=True)),
+                ('spam_count', models.PositiveIntegerField(default=0, help_text='Spam comments containing the token')),
+                ('ham_count', models.PositiveIntegerField(default=0, help_text='Legitimate comments containing the token')),
+            ],
+            options={
+                'verbose_name': 'Spam Token',
+                'verbose_name_plural': 'Spam Tokens',
+            },
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='spam_score',
+            field=models.FloatField(blank=True, editable=False, help_text='Spam probability from the classifier; empty until scored', null=True),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', help_text='Moderation state; only approved comments are published', max_length=10),
+        ),
+        migrations.RunPython(approve_existing, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of approved comments on this post'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['post', '-created_at', '-id'], name='blog_comment_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='blog_comment_pending_idx'),
+        ),
+    ]
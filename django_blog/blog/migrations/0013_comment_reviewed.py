@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_comment_moderation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='reviewed',
+            field=models.BooleanField(default=False, editable=False, help_text='Status set by a moderator, who trained the classifier with it'),
+        ),
+    ]
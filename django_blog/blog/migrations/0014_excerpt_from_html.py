@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:28
+
+from html import unescape
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+def make_excerpt(content_html):
+    """Frozen copy of blog.markup.make_excerpt as of this migration"""
+    return Truncator(unescape(strip_tags(content_html))).words(50, truncate=' …')
+
+
+def excerpts_from_html(apps, schema_editor):
+    """Excerpts were cut from the Markdown source; take them from the HTML"""
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for pk, content_html in Post.objects.values_list('pk', 'content_html').iterator(chunk_size=500):
+        batch.append(Post(pk=pk, excerpt=make_excerpt(content_html)))
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_comment_reviewed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Start of the rendered content as plain text, shown on list pages; updated on save'),
+        ),
+        migrations.RunPython(excerpts_from_html, migrations.RunPython.noop),
+    ]
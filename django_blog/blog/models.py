@@ -3,10 +3,52 @@ from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 from taggit.managers import TaggableManager
+from taggit.models import Tag
+
+from .markup import EXCERPT_WORDS, make_excerpt, render_markdown, renderer_version
+
+
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Posts for list pages: author joined and the full content left in the
+        database, since lists only show the stored excerpt.
+        """
+        return self.select_related('author').defer('content', 'content_html')
+
+
+def render_content(instance, update_fields):
+    """
+    Render ``instance.content`` into its content_html column if the save
+    writes content; returns the update_fields to save with.
+    """
+    if update_fields is None or 'content' in update_fields:
+        instance.content_html = render_markdown(instance.content)
+        instance.content_html_version = renderer_version()
+        if update_fields is not None:
+            update_fields = {*update_fields, 'content_html', 'content_html_version'}
+    return update_fields
+
 
 class Post(models.Model):
     title = models.CharField(max_length=200, help_text="Title of the blog post")
-    content = models.TextField(help_text="Main content of the blog post")
+    content = models.TextField(help_text="Main content of the blog post, in Markdown")
+    content_html = models.TextField(
+        blank=True,
+        editable=False,
+        help_text="Sanitized HTML rendered from the content on save"
+    )
+    content_html_version = models.CharField(
+        max_length=20,
+        blank=True,
+        editable=False,
+        help_text="Renderer version that produced content_html"
+    )
+    excerpt = models.TextField(
+        blank=True,
+        editable=False,
+        help_text="Start of the rendered content as plain text, shown on list pages; updated on save"
+    )
     published_date = models.DateTimeField(auto_now_add=True, help_text="Date when the post was published")
     author = models.ForeignKey(
         User, 
@@ -16,6 +58,16 @@ class Post(models.Model):
     )
     # Add tagging functionality
     tags = TaggableManager(blank=True, help_text="Tags for categorizing the post")
+    # Denormalized so list pages can show it without aggregating comments;
+    # counts approved comments, maintained by blog/moderation.py, the comment
+    # edit view and the comment post_delete handler in blog/signals.py
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of approved comments on this post"
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.title} by {self.author.username}"
@@ -23,17 +75,49 @@ class Post(models.Model):
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        update_fields = render_content(self, kwargs.get('update_fields'))
+        if update_fields is None or 'content' in update_fields:
+            # From the rendered HTML, so lists show text rather than Markdown
+            self.excerpt = make_excerpt(self.content_html)
+            if update_fields is not None:
+                update_fields = {*update_fields, 'excerpt'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def adjust_comment_count(cls, post_id, delta):
+        """Atomically add ``delta`` to a post's stored comment count"""
+        posts = cls.objects.filter(pk=post_id)
+        if delta < 0:
+            posts = posts.filter(comment_count__gte=-delta)
+        posts.update(comment_count=models.F('comment_count') + delta)
+
     class Meta:
         verbose_name = "Blog Post"
         verbose_name_plural = "Blog Posts"
         ordering = ['-published_date']
+        indexes = [
+            # Keyset pagination order (see blog/pagination.py)
+            models.Index(fields=['published_date', 'id'], name='blog_post_published_idx'),
+        ]
 
 
 class Comment(models.Model):
     """
     Comment model representing user comments on blog posts.
     Each comment is linked to a specific post and user (author).
+
+    New comments are pending until blog/moderation.py (or a moderator)
+    approves them; only approved comments are shown or counted.
     """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        APPROVED = 'approved', 'Approved'
+        REJECTED = 'rejected', 'Rejected'
+
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -48,7 +132,18 @@ class Comment(models.Model):
     )
     content = models.TextField(
         max_length=1000,
-        help_text="Content of the comment"
+        help_text="Content of the comment, in Markdown"
+    )
+    content_html = models.TextField(
+        blank=True,
+        editable=False,
+        help_text="Sanitized HTML rendered from the content on save"
+    )
+    content_html_version = models.CharField(
+        max_length=20,
+        blank=True,
+        editable=False,
+        help_text="Renderer version that produced content_html"
     )
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -58,6 +153,23 @@ class Comment(models.Model):
         auto_now=True,
         help_text="Date and time when the comment was last updated"
     )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        help_text="Moderation state; only approved comments are published"
+    )
+    spam_score = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Spam probability from the classifier; empty until scored"
+    )
+    reviewed = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Status set by a moderator, who trained the classifier with it"
+    )
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
@@ -65,7 +177,140 @@ class Comment(models.Model):
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'pk': self.post.pk})
 
+    def save(self, *args, **kwargs):
+        update_fields = render_content(self, kwargs.get('update_fields'))
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
         ordering = ['-created_at']
+        indexes = [
+            # A post's published comments, newest first (PostDetailView)
+            models.Index(
+                fields=['post', '-created_at', '-id'],
+                name='blog_comment_approved_idx',
+                condition=models.Q(status='approved'),
+            ),
+            # The moderation queue, in arrival order
+            models.Index(
+                fields=['id'],
+                name='blog_comment_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+
+class TagUsage(models.Model):
+    """
+    Number of posts carrying each tag. Maintained incrementally from
+    taggit's through-model signals (see blog/signals.py) so popular tags are
+    an index scan instead of a GROUP BY over every tagged item.
+    """
+    tag = models.OneToOneField(
+        Tag,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='usage',
+        help_text="Tag being counted"
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of posts tagged with this tag"
+    )
+
+    def __str__(self):
+        return f"{self.tag.name}: {self.post_count}"
+
+    class Meta:
+        verbose_name = "Tag Usage"
+        verbose_name_plural = "Tag Usage"
+        indexes = [
+            models.Index(fields=['-post_count', 'tag'], name='blog_tagusage_popular_idx'),
+        ]
+
+
+class RelatedPost(models.Model):
+    """
+    Precomputed "related posts" list entry, scored by shared tags and
+    recency. Maintained by blog/related.py.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_entries',
+        help_text="Post the list belongs to"
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text="Post being recommended"
+    )
+    score = models.FloatField(help_text="Blend of tag Jaccard similarity and recency")
+    shared_tags = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id} ({self.score:.3f})"
+
+    class Meta:
+        verbose_name = "Related Post"
+        verbose_name_plural = "Related Posts"
+        ordering = ['-score']
+        unique_together = ['post', 'related']
+        indexes = [
+            models.Index(fields=['post', '-score'], name='blog_relatedpost_rank_idx'),
+        ]
+
+
+class TagPosting(models.Model):
+    """
+    Per-tag posting list: one row per tagged post, carrying the post's
+    published date so a tag page is one range scan of the listing index
+    instead of a join through taggit's generic TaggedItem table.
+    Maintained by blog/tag_stats.py.
+    """
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text="Tag the post is listed under"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text="Tagged post"
+    )
+    published_date = models.DateTimeField(help_text="Copy of the post's published date")
+
+    def __str__(self):
+        return f"{self.tag_id}: {self.post_id}"
+
+    class Meta:
+        verbose_name = "Tag Posting"
+        verbose_name_plural = "Tag Postings"
+        unique_together = ['tag', 'post']
+        indexes = [
+            models.Index(fields=['tag', 'published_date', 'post'], name='blog_tagposting_listing_idx'),
+        ]
+
+
+class SpamToken(models.Model):
+    """
+    Word counts the comment spam classifier learns from: how many spam and
+    how many legitimate comments each token appeared in. Trained by
+    moderators' decisions (see blog/moderation.py).
+    """
+    token = models.CharField(max_length=64, unique=True, help_text="Normalized word or feature")
+    spam_count = models.PositiveIntegerField(default=0, help_text="Spam comments containing the token")
+    ham_count = models.PositiveIntegerField(default=0, help_text="Legitimate comments containing the token")
+
+    def __str__(self):
+        return f"{self.token}: {self.spam_count}/{self.ham_count}"
+
+    class Meta:
+        verbose_name = "Spam Token"
+        verbose_name_plural = "Spam Tokens"
@@ -0,0 +1,247 @@
+"""
+Comment moderation and spam scoring.
+
+New comments are saved as pending and stay off the site until they are
+moderated. The moderate_comments command works through the queue in
+batches: a batch is tokenized as a whole, the statistics of every token in
+it are read in one query, each comment gets a naive Bayes spam probability
+(with keyword and link heuristics as extra evidence), and the decisions
+are written with one UPDATE per outcome. Comments scoring between the two
+thresholds stay pending for a moderator.
+
+The classifier learns only from moderators (the admin's approve and reject
+actions), never from its own decisions; overturning a moderator's earlier
+decision also takes back what it taught. Until it has been trained, most
+comments score as undecided and wait for a moderator.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .caching import invalidate_site_cache
+from .models import Comment, Post, SpamToken
+from .page_cache import purge_post_pages
+
+DEFAULTS = {
+    # At or above: rejected as spam
+    'SPAM_THRESHOLD': 0.9,
+    # At or below: approved
+    'HAM_THRESHOLD': 0.2,
+    # More links than this counts as evidence of spam
+    'MAX_LINKS': 2,
+    'SPAM_KEYWORDS': ['casino', 'viagra', 'cialis', 'crypto', 'loan', 'porn', 'seo'],
+}
+
+WORD_RE = re.compile(r"[^\W_][\w'$-]*")
+LINK_RE = re.compile(r'(?:https?://|www\.)([^\s/"\'<>)]+)', re.IGNORECASE)
+MAX_TOKEN_LENGTH = 32
+
+# The row whose counts are the number of spam and legitimate comments
+# trained on; real tokens are never empty
+TOTALS_TOKEN = ''
+
+# Weight of the neutral prior against a token's observed counts
+PRIOR_STRENGTH = 1.0
+# Only the tokens furthest from neutral decide a comment's score
+INTERESTING_TOKENS = 15
+KEYWORD_PROBABILITY = 0.95
+LINKS_PROBABILITY = 0.95
+LOOKUP_CHUNK_SIZE = 500
+
+
+def moderation_settings():
+    return {**DEFAULTS, **getattr(settings, 'BLOG_COMMENT_MODERATION', {})}
+
+
+def tokenize(text):
+    """The distinct features of a comment: its words and linked domains"""
+    tokens = {
+        word for word in (match.lower() for match in WORD_RE.findall(text))
+        if len(word) <= MAX_TOKEN_LENGTH
+    }
+    tokens.update(f'link:{domain.lower()[:50]}' for domain in LINK_RE.findall(text))
+    return tokens
+
+
+def _token_stats(tokens):
+    """{token: (spam_count, ham_count)} for the known ``tokens``"""
+    tokens = list(tokens)
+    stats = {}
+    for start in range(0, len(tokens), LOOKUP_CHUNK_SIZE):
+        rows = SpamToken.objects.filter(token__in=tokens[start:start + LOOKUP_CHUNK_SIZE])
+        stats.update((token, (spam, ham)) for token, spam, ham in rows.values_list('token', 'spam_count', 'ham_count'))
+    return stats
+
+
+def _token_probability(spam, ham, spam_docs, ham_docs):
+    """Smoothed probability that a comment containing the token is spam"""
+    spam_rate = spam / spam_docs if spam_docs else 0.0
+    ham_rate = ham / ham_docs if ham_docs else 0.0
+    observed = spam_rate / (spam_rate + ham_rate) if spam_rate + ham_rate else 0.5
+    seen = spam + ham
+    probability = (PRIOR_STRENGTH * 0.5 + seen * observed) / (PRIOR_STRENGTH + seen)
+    return min(max(probability, 0.01), 0.99)
+
+
+def _combine(probabilities):
+    """Naive Bayes combination with equal priors, as a sum of log-odds"""
+    log_odds = sum(math.log(p / (1 - p)) for p in probabilities)
+    if log_odds > 0:
+        return 1 / (1 + math.exp(-log_odds))
+    return math.exp(log_odds) / (1 + math.exp(log_odds))
+
+
+def score_texts(texts):
+    """Spam probabilities in [0, 1] for ``texts``, one lookup for all of them"""
+    config = moderation_settings()
+    keywords = {keyword.lower() for keyword in config['SPAM_KEYWORDS']}
+    features = [tokenize(text) for text in texts]
+    stats = _token_stats(set().union(*features) | {TOTALS_TOKEN})
+    spam_docs, ham_docs = stats.get(TOTALS_TOKEN, (0, 0))
+
+    scores = []
+    for text, tokens in zip(texts, features):
+        learned = sorted(
+            (_token_probability(*stats[token], spam_docs, ham_docs) for token in tokens if token in stats),
+            key=lambda p: abs(p - 0.5),
+            reverse=True,
+        )[:INTERESTING_TOKENS]
+        evidence = learned + [KEYWORD_PROBABILITY] * len(tokens & keywords)
+        if len(LINK_RE.findall(text)) > config['MAX_LINKS']:
+            evidence.append(LINKS_PROBABILITY)
+        scores.append(_combine(evidence))
+    return scores
+
+
+def train(texts, spam, forget=False):
+    """
+    Learn from comments a moderator judged spam (or not), or with
+    ``forget`` take back what an earlier judgement of them taught.
+    """
+    texts = list(texts)
+    if not texts:
+        return
+    # How many of the comments each token appears in
+    counts = Counter()
+    for text in texts:
+        counts.update(tokenize(text))
+    counts[TOTALS_TOKEN] = len(texts)
+    field = 'spam_count' if spam else 'ham_count'
+    sign = -1 if forget else 1
+    with transaction.atomic():
+        if not forget:
+            SpamToken.objects.bulk_create(
+                [SpamToken(token=token) for token in counts], ignore_conflicts=True, batch_size=LOOKUP_CHUNK_SIZE
+            )
+        tokens = list(counts)
+        rows = []
+        for start in range(0, len(tokens), LOOKUP_CHUNK_SIZE):
+            rows.extend(SpamToken.objects.select_for_update().filter(token__in=tokens[start:start + LOOKUP_CHUNK_SIZE]))
+        for row in rows:
+            setattr(row, field, max(getattr(row, field) + sign * counts[row.token], 0))
+        SpamToken.objects.bulk_update(rows, [field], batch_size=LOOKUP_CHUNK_SIZE)
+
+
+def purge_comment_pages(post_ids):
+    """Approved comments of these posts appeared or disappeared"""
+    invalidate_site_cache()
+    for post_id in post_ids:
+        purge_post_pages(post_id)
+
+
+def set_status(comment_ids, status):
+    """
+    Move comments to ``status`` with a single UPDATE, keep their posts'
+    comment counts in step and purge the pages that show them. Returns the
+    number of comments changed.
+    """
+    with transaction.atomic():
+        changed = list(
+            Comment.objects.select_for_update().filter(pk__in=list(comment_ids)).exclude(status=status)
+            .values_list('pk', 'post_id', 'status')
+        )
+        if not changed:
+            return 0
+        Comment.objects.filter(pk__in=[pk for pk, _, _ in changed]).update(status=status)
+
+        deltas = Counter()
+        for _, post_id, old_status in changed:
+            if old_status == Comment.Status.APPROVED:
+                deltas[post_id] -= 1
+            elif status == Comment.Status.APPROVED:
+                deltas[post_id] += 1
+        # One UPDATE per distinct adjustment rather than one per post
+        posts_by_delta = defaultdict(list)
+        for post_id, delta in deltas.items():
+            if delta:
+                posts_by_delta[delta].append(post_id)
+        for delta, post_ids in posts_by_delta.items():
+            posts = Post.objects.filter(pk__in=post_ids)
+            if delta < 0:
+                posts = posts.filter(comment_count__gte=-delta)
+            posts.update(comment_count=F('comment_count') + delta)
+
+    # Bulk updates send no signals, and the comment signal handlers ignore
+    # unpublished comments; only approvals and withdrawals change pages
+    if deltas:
+        purge_comment_pages(deltas)
+    return len(changed)
+
+
+def review(comments, status):
+    """
+    A moderator's decision on ``comments`` (a Comment queryset): apply it
+    and train the classifier with the comments whose status changes,
+    forgetting what an earlier moderator decision on them taught.
+    """
+    with transaction.atomic():
+        changing = list(comments.exclude(status=status).values_list('pk', 'content', 'status', 'reviewed'))
+        for label in (Comment.Status.APPROVED, Comment.Status.REJECTED):
+            # Automatic decisions were never learned from, so only undo reviewed ones
+            previous = [content for _, content, old, reviewed in changing if reviewed and old == label]
+            train(previous, spam=label == Comment.Status.REJECTED, forget=True)
+        if status != Comment.Status.PENDING:
+            train((content for _, content, _, _ in changing), spam=status == Comment.Status.REJECTED)
+        pks = [pk for pk, _, _, _ in changing]
+        Comment.objects.filter(pk__in=pks).update(reviewed=status != Comment.Status.PENDING)
+    return set_status(pks, status)
+
+
+def moderate_pending(batch_size=200, rescore=False, log=None):
+    """
+    Score the pending comments not scored yet (all pending comments with
+    ``rescore``) in batches of ``batch_size``, approving and rejecting those
+    past the thresholds. Returns counts of approved, rejected and still
+    pending comments.
+    """
+    config = moderation_settings()
+    queue = Comment.objects.filter(status=Comment.Status.PENDING)
+    if not rescore:
+        queue = queue.filter(spam_score__isnull=True)
+    totals = Counter(approved=0, rejected=0, pending=0)
+    last_pk = 0
+    while True:
+        batch = list(queue.filter(pk__gt=last_pk).order_by('pk').only('pk', 'content')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        approved, rejected = [], []
+        for comment, score in zip(batch, score_texts([comment.content for comment in batch])):
+            comment.spam_score = score
+            if score >= config['SPAM_THRESHOLD']:
+                rejected.append(comment.pk)
+            elif score <= config['HAM_THRESHOLD']:
+                approved.append(comment.pk)
+        Comment.objects.bulk_update(batch, ['spam_score'])
+        set_status(approved, Comment.Status.APPROVED)
+        set_status(rejected, Comment.Status.REJECTED)
+        totals['approved'] += len(approved)
+        totals['rejected'] += len(rejected)
+        totals['pending'] += len(batch) - len(approved) - len(rejected)
+        if log:
+            log(f'Scored {len(batch)} comments: {len(approved)} approved, {len(rejected)} rejected')
+    return dict(totals)
@@ -0,0 +1,193 @@
+"""
+Full-page cache for anonymous readers.
+
+Public pages (home, post list, post detail, tag pages, tag cloud) are the
+same for every anonymous reader, so the whole rendered response is cached,
+keyed on the path and query string. Each page is also labelled with purge
+tags, e.g. ``post:42`` or ``tag:django``. Every tag has a version counter
+in the cache and the versions are part of the page key, so purging a tag
+(bumping its version) orphans every page carrying it, the same way
+caching.cache_generation() retires template fragments. Purges are issued
+by the signal handlers in blog/signals.py.
+
+Sidebars built from other posts (related posts, an author's recent posts)
+are not tracked and may lag by up to page_cache_ttl() seconds.
+
+A request bypasses the cache when the reader is logged in, has pending
+messages, or when rendering needed a CSRF token or set a cookie; those
+responses are specific to one reader. Hits, misses and bypasses are
+counted for page_cache_stats() and shown in an X-Page-Cache header.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+PAGE_KEY_PREFIX = 'blog:page'
+TAG_VERSION_PREFIX = 'blog:page-tag'
+STATS_KEY_PREFIX = 'blog:page-stats'
+OUTCOMES = ('hit', 'miss', 'bypass')
+
+# Carried by every cached page, for purges that affect the whole site
+ALL_PAGES = 'all'
+# Pages listing the latest posts: home and the post list
+POST_LISTS = 'posts'
+# Pages showing site totals or popular tags
+SITE_STATS = 'site'
+TAG_CLOUD = 'tags'
+
+
+def page_cache_ttl():
+    """Lifetime in seconds of cached pages"""
+    return getattr(settings, 'BLOG_PAGE_CACHE_TTL', 300)
+
+
+def for_post(post_id):
+    """Purge tag of a post's detail page"""
+    return f'post:{post_id}'
+
+
+def for_tag(tag_name):
+    """Purge tag of a blog tag's page"""
+    # Tag names are free text; hash them so they make valid cache keys
+    return 'tag:' + hashlib.md5(tag_name.encode()).hexdigest()
+
+
+def _version_key(tag):
+    return f'{TAG_VERSION_PREFIX}:{tag}'
+
+
+def _tag_versions(tags):
+    keys = [_version_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock so an evicted counter never brings back
+            # pages cached under an earlier version
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+    return [str(versions[key]) for key in keys]
+
+
+def _page_key(request, tags):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    versions = hashlib.md5('.'.join(_tag_versions(tags)).encode()).hexdigest()
+    return f'{PAGE_KEY_PREFIX}:{path}:{versions}'
+
+
+def purge_pages(*tags):
+    """Drop every cached page labelled with any of ``tags``"""
+    for tag in tags:
+        try:
+            cache.incr(_version_key(tag))
+        except ValueError:
+            # Never versioned, so nothing was cached under it
+            pass
+
+
+def purge_post_pages(post_id, tag_names=()):
+    """A post changed: its detail page, the post lists and its tags' pages"""
+    purge_pages(for_post(post_id), POST_LISTS, SITE_STATS, *(for_tag(name) for name in tag_names))
+
+
+def _count(outcome):
+    key = f'{STATS_KEY_PREFIX}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def page_cache_stats():
+    """Hit, miss and bypass counts, and the hit ratio of cacheable requests"""
+    counts = cache.get_many([f'{STATS_KEY_PREFIX}:{outcome}' for outcome in OUTCOMES])
+    stats = {outcome: counts.get(f'{STATS_KEY_PREFIX}:{outcome}', 0) for outcome in OUTCOMES}
+    lookups = stats['hit'] + stats['miss']
+    stats['hit_ratio'] = stats['hit'] / lookups if lookups else 0.0
+    return stats
+
+
+def reset_page_cache_stats():
+    cache.delete_many([f'{STATS_KEY_PREFIX}:{outcome}' for outcome in OUTCOMES])
+
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # Messages are rendered into the page once and then consumed;
+    # len() loads them without marking them as seen
+    return not len(get_messages(request))
+
+
+def _is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def _lookup(request, tags, args, kwargs):
+    """
+    The cached response for a request, if any, and the key to store its
+    response under; the key is None when the request bypasses the cache.
+    """
+    if not _is_cacheable_request(request):
+        return None, None
+    page_tags = [ALL_PAGES] + [
+        tag(request, *args, **kwargs) if callable(tag) else tag for tag in tags
+    ]
+    key = _page_key(request, page_tags)
+    response = cache.get(key)
+    if response is not None:
+        _count('hit')
+        response['X-Page-Cache'] = 'HIT'
+    return response, key
+
+
+def _store(request, key, response):
+    if key is not None:
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        if _is_cacheable_response(request, response):
+            _count('miss')
+            cache.set(key, response, page_cache_ttl())
+            response['X-Page-Cache'] = 'MISS'
+            return response
+    _count('bypass')
+    response['X-Page-Cache'] = 'BYPASS'
+    return response
+
+
+def anonymous_page_cache(*tags):
+    """
+    Cache the decorated view's pages for anonymous readers. ``tags`` are
+    purge tags, either strings or callables taking the view's arguments
+    ``(request, *args, **kwargs)`` and returning a tag. Works on sync and
+    async views; for async views the session, user and cache lookups run
+    in a worker thread.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                response, key = await sync_to_async(_lookup)(request, tags, args, kwargs)
+                if response is not None:
+                    return response
+                response = await view(request, *args, **kwargs)
+                return await sync_to_async(_store)(request, key, response)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response, key = _lookup(request, tags, args, kwargs)
+            if response is not None:
+                return response
+            return _store(request, key, view(request, *args, **kwargs))
+        return wrapper
+    return decorator
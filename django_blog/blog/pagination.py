@@ -0,0 +1,134 @@
+"""
+Keyset ("cursor") pagination over (published_date, id), newest first.
+
+Unlike Django's Paginator this never runs COUNT(*) and never uses OFFSET:
+each page is a range scan that starts right after the last row of the
+previous page, so page 1000 costs the same as page 1. Pages are addressed
+by an opaque cursor instead of a page number. When a total is wanted for
+display, the caller can supply an approximate count from cached stats.
+
+The id half of the key defaults to the row's pk; a table that lists posts
+by reference (such as TagPosting) pages on its ``post_id`` column instead.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(row, direction, pk_field='pk'):
+    raw = f'{direction}|{row.published_date.isoformat()}|{getattr(row, pk_field)}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(direction, published_date, pk) for a cursor, or None if it is invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        direction, published, pk = raw.split('|')
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(published), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class CursorPage:
+    """One page of a CursorPaginator; mirrors the parts of Page templates use"""
+
+    def __init__(self, paginator, object_list, cursor, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.cursor = cursor or ''
+        # Cursors come from the paged rows even if the caller later swaps
+        # object_list for the objects those rows point at
+        self._first = object_list[0] if object_list else None
+        self._last = object_list[-1] if object_list else None
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self._last is not None:
+            return encode_cursor(self._last, 'next', self.paginator.pk_field)
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self._first is not None:
+            return encode_cursor(self._first, 'prev', self.paginator.pk_field)
+
+
+class CursorPaginator:
+    """
+    Paginate ``queryset`` newest first on (published_date, ``pk_field``).
+
+    ``approximate_count`` is an optional callable returning a (possibly
+    stale) total for display; it is only called if a template asks for it.
+    """
+
+    def __init__(self, queryset, per_page, approximate_count=None, pk_field='pk'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self._approximate_count = approximate_count
+        self.pk_field = pk_field
+
+    @property
+    def approximate_count(self):
+        return self._approximate_count() if self._approximate_count else None
+
+    def page(self, cursor=None):
+        key = self.pk_field
+        position = decode_cursor(cursor) if cursor else None
+        if position is None:
+            rows = list(self.queryset.order_by('-published_date', f'-{key}')[:self.per_page + 1])
+            return CursorPage(self, rows[:self.per_page], None, len(rows) > self.per_page, False)
+
+        direction, published, pk = position
+        if direction == 'next':
+            rows = list(
+                self.queryset
+                .filter(Q(published_date__lt=published) | Q(published_date=published, **{f'{key}__lt': pk}))
+                .order_by('-published_date', f'-{key}')[:self.per_page + 1]
+            )
+            return CursorPage(self, rows[:self.per_page], cursor, len(rows) > self.per_page, True)
+
+        # Walk backwards from the cursor, then restore newest-first order
+        rows = list(
+            self.queryset
+            .filter(Q(published_date__gt=published) | Q(published_date=published, **{f'{key}__gt': pk}))
+            .order_by('published_date', key)[:self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        return CursorPage(self, rows[:self.per_page][::-1], cursor, True, has_previous)
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin that pages with CursorPaginator instead of Paginator.
+    The page is selected by the ``cursor`` query parameter; override
+    get_approximate_count() to expose a display total.
+    """
+    cursor_query_param = 'cursor'
+
+    def get_approximate_count(self):
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, approximate_count=self.get_approximate_count)
+        page = paginator.page(self.request.GET.get(self.cursor_query_param))
+        return paginator, page, page.object_list, page.has_other_pages()
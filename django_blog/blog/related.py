@@ -0,0 +1,199 @@
+"""
+Precomputed related posts.
+
+Each post keeps its RELATED_POSTS_LIMIT best matches in the RelatedPost
+table. A candidate's score blends the Jaccard similarity of the two posts'
+tag sets with the candidate's recency:
+
+    score = (1 - RECENCY_WEIGHT) * |A & B| / |A | B|
+            + RECENCY_WEIGHT * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+refresh_related() recomputes a post and its tag neighbourhood, bounded to
+each tag's most recent posts, when its tags change;
+rebuild_related_posts() recomputes everything, ranking chunks of posts on
+a process pool.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from taggit.models import TaggedItem
+
+from .models import Post, RelatedPost, TagPosting
+from .workers import process_pool
+
+RELATED_POSTS_LIMIT = 5
+RECENCY_WEIGHT = 0.2
+RECENCY_HALF_LIFE_DAYS = 90
+# Neighbours refreshed synchronously when a post is re-tagged, and the most
+# recent posts per tag they are ranked against; the rest are picked up by
+# the rebuild_related_posts command
+INCREMENTAL_NEIGHBOUR_LIMIT = 200
+CANDIDATES_PER_TAG = 200
+
+
+def score(shared, size, other_size, other_published, now):
+    """Similarity of two posts sharing ``shared`` of their tags"""
+    jaccard = shared / (size + other_size - shared)
+    age_days = max((now - other_published).total_seconds() / 86400, 0)
+    recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    return (1 - RECENCY_WEIGHT) * jaccard + RECENCY_WEIGHT * recency
+
+
+def rank_related(post_id, tags_by_post, posts_by_tag, published, now, limit=RELATED_POSTS_LIMIT):
+    """
+    Best ``limit`` related posts for ``post_id`` as (score, related_id, shared)
+    tuples, highest score first.
+    """
+    tags = tags_by_post.get(post_id, ())
+    shared = Counter()
+    for tag_id in tags:
+        shared.update(posts_by_tag[tag_id])
+    shared.pop(post_id, None)
+    return heapq.nlargest(limit, (
+        (score(count, len(tags), len(tags_by_post[other]), published[other], now), other, count)
+        for other, count in shared.items()
+    ))
+
+
+def _tagged_items():
+    return TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Post))
+
+
+def _index(rows):
+    tags_by_post = defaultdict(set)
+    posts_by_tag = defaultdict(set)
+    for post_id, tag_id in rows:
+        tags_by_post[post_id].add(tag_id)
+        posts_by_tag[tag_id].add(post_id)
+    return tags_by_post, posts_by_tag
+
+
+def _store(rankings):
+    """Replace the related lists of every post in ``rankings``"""
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=list(rankings)).delete()
+        RelatedPost.objects.bulk_create(
+            [
+                RelatedPost(post_id=post_id, related_id=related_id, score=value, shared_tags=shared)
+                for post_id, ranked in rankings.items()
+                for value, related_id, shared in ranked
+            ],
+            batch_size=1000,
+        )
+
+
+def _recent_postings(tag_ids):
+    """
+    (post_id, tag_id) of the CANDIDATES_PER_TAG most recent posts of each
+    tag, read from the tag posting lists' (tag, published_date) index
+    """
+    ranked = (
+        TagPosting.objects.filter(tag_id__in=tag_ids)
+        .annotate(rank=Window(
+            RowNumber(), partition_by=F('tag_id'), order_by=[F('published_date').desc(), F('post_id').desc()]
+        ))
+        .filter(rank__lte=CANDIDATES_PER_TAG)
+    )
+    return list(ranked.values_list('post_id', 'tag_id'))
+
+
+def refresh_related(post_ids):
+    """
+    Recompute the related lists of ``post_ids`` and of the posts whose lists
+    may have changed with them: posts sharing a tag, and posts currently
+    listing them.
+
+    This runs when a post is re-tagged, so its cost is bounded however
+    popular the tags are: neighbours and candidates are drawn from the
+    CANDIDATES_PER_TAG most recent posts of each tag. Older posts are
+    ranked by the rebuild_related_posts command.
+    """
+    post_ids = set(post_ids)
+    items = _tagged_items()
+    own_tags = set(items.filter(object_id__in=post_ids).values_list('tag_id', flat=True))
+
+    listing = set(
+        RelatedPost.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True)
+    )
+    shared = Counter(post_id for post_id, _ in _recent_postings(own_tags))
+    sharing = [
+        post_id for post_id, _ in shared.most_common()
+        if post_id not in post_ids and post_id not in listing
+    ][:INCREMENTAL_NEIGHBOUR_LIMIT]
+    affected = post_ids | listing | set(sharing)
+
+    # Everything the affected posts could be related to: each tag's recent
+    # posts, with all their tags for the similarity
+    neighbourhood_tags = set(items.filter(object_id__in=affected).values_list('tag_id', flat=True))
+    recent = _recent_postings(neighbourhood_tags)
+    _, posts_by_tag = _index(recent)
+    candidates = {post_id for post_id, _ in recent}
+    tags_by_post, _ = _index(
+        items.filter(object_id__in=candidates | affected).values_list('object_id', 'tag_id')
+    )
+    published = dict(Post.objects.filter(pk__in=candidates | affected).values_list('pk', 'published_date'))
+    # TaggedItem has no foreign key to Post, so drop rows of posts that are gone
+    for tag_posts in posts_by_tag.values():
+        tag_posts.intersection_update(published)
+
+    now = timezone.now()
+    _store({
+        post_id: rank_related(post_id, tags_by_post, posts_by_tag, published, now)
+        for post_id in affected if post_id in published
+    })
+    return len(affected)
+
+
+# Process pool workers receive the tag index once, through the initializer,
+# instead of with every chunk.
+_worker_state = {}
+
+
+def _init_worker(tags_by_post, posts_by_tag, published, now):
+    _worker_state.update(
+        tags_by_post=tags_by_post, posts_by_tag=posts_by_tag, published=published, now=now
+    )
+
+
+def _rank_chunk(post_ids):
+    return {post_id: rank_related(post_id, **_worker_state) for post_id in post_ids}
+
+
+def rebuild_related_posts(workers=None, chunk_size=500, log=None):
+    """
+    Recompute every post's related list. Ranking is pure Python over an
+    in-memory tag index and is spread over ``workers`` processes (all CPUs
+    by default, or in-process with ``workers=1``). Returns the number of
+    posts ranked.
+    """
+    published = dict(Post.objects.values_list('pk', 'published_date'))
+    tags_by_post, posts_by_tag = _index(
+        (post_id, tag_id)
+        for post_id, tag_id in _tagged_items().values_list('object_id', 'tag_id').iterator()
+        if post_id in published
+    )
+    post_ids = sorted(tags_by_post)
+    chunks = [post_ids[i:i + chunk_size] for i in range(0, len(post_ids), chunk_size)]
+    state = (dict(tags_by_post), dict(posts_by_tag), published, timezone.now())
+
+    rankings = {}
+    if workers == 1 or len(chunks) <= 1:
+        _init_worker(*state)
+        for chunk in chunks:
+            rankings.update(_rank_chunk(chunk))
+    else:
+        with process_pool(workers, initializer=_init_worker, initargs=state) as pool:
+            for done, ranked in enumerate(pool.map(_rank_chunk, chunks), 1):
+                rankings.update(ranked)
+                if log:
+                    log(f'Ranked {done}/{len(chunks)} chunks')
+
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        _store(rankings)
+    return len(rankings)
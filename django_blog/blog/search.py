@@ -0,0 +1,289 @@
+"""
+Full-text search over blog posts.
+
+Posts are copied into a search index table as they are saved, re-tagged or
+deleted (see blog/signals.py):
+
+* SQLite: an FTS5 virtual table ``blog_post_fts`` ranked with bm25().
+* PostgreSQL: ``blog_post_search`` holding a weighted tsvector with a GIN
+  index, ranked with ts_rank_cd().
+* Anything else falls back to icontains matching without an index.
+
+search() returns a lazy, sliceable result set that works with Django's
+Paginator; each slice runs one LIMIT/OFFSET query against the index and
+hydrates the matching posts with their rank and a highlighted snippet.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+# Control characters can't occur in post text, so they are safe snippet
+# markers that survive HTML escaping and are swapped for <mark> tags after.
+_START, _STOP = '\x02', '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SNIPPET_WORDS = 24
+
+
+def _highlight(snippet):
+    return mark_safe(
+        escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>')
+    )
+
+
+class SQLiteBackend:
+    """FTS5 virtual table keyed by post id"""
+
+    table = 'blog_post_fts'
+
+    @classmethod
+    def create_index(cls, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {cls.table} "
+            "USING fts5(title, content, tags, tokenize='porter unicode61')"
+        )
+
+    @classmethod
+    def drop_index(cls, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {cls.table}')
+
+    def index(self, post_id, title, content, tags):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {self.table}(rowid, title, content, tags) VALUES (%s, %s, %s, %s)',
+                [post_id, title, content, tags],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    @staticmethod
+    def parse(query):
+        # Every word must match, as a prefix; quoting keeps FTS5 operators
+        # and punctuation in user input from being interpreted.
+        return ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+    def count(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {self.table} WHERE {self.table} MATCH %s', [query])
+            return cursor.fetchone()[0]
+
+    def fetch(self, query, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, -bm25({self.table}, 10.0, 1.0, 5.0) AS rank, "
+                f"snippet({self.table}, 1, %s, %s, '…', %s) "
+                f"FROM {self.table} WHERE {self.table} MATCH %s "
+                "ORDER BY rank DESC, rowid DESC LIMIT %s OFFSET %s",
+                [_START, _STOP, SNIPPET_WORDS, query, limit, offset],
+            )
+            return cursor.fetchall()
+
+
+class PostgresBackend:
+    """Weighted tsvector per post with a GIN index"""
+
+    table = 'blog_post_search'
+    config = 'english'
+
+    @classmethod
+    def create_index(cls, schema_editor):
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS {cls.table} ('
+            'post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {cls.table}_document_idx ON {cls.table} USING GIN (document)'
+        )
+
+    @classmethod
+    def drop_index(cls, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {cls.table}')
+
+    def index(self, post_id, title, content, tags):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.table} (post_id, document) VALUES (%s, '
+                'setweight(to_tsvector(%s::regconfig, %s), \'A\') || '
+                'setweight(to_tsvector(%s::regconfig, %s), \'B\') || '
+                'setweight(to_tsvector(%s::regconfig, %s), \'C\')) '
+                'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+                [post_id, self.config, title, self.config, tags, self.config, content],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE post_id = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    @staticmethod
+    def parse(query):
+        return ' & '.join(f"'{token}':*" for token in _TOKEN_RE.findall(query))
+
+    def count(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {self.table} WHERE document @@ to_tsquery(%s::regconfig, %s)',
+                [self.config, query],
+            )
+            return cursor.fetchone()[0]
+
+    def fetch(self, query, offset, limit):
+        options = f'StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_WORDS}, MinWords=8'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT s.post_id, ts_rank_cd(s.document, q) AS rank, '
+                'ts_headline(%s::regconfig, p.content, q, %s) '
+                f'FROM {self.table} s JOIN blog_post p ON p.id = s.post_id, '
+                'to_tsquery(%s::regconfig, %s) q '
+                'WHERE s.document @@ q ORDER BY rank DESC, s.post_id DESC LIMIT %s OFFSET %s',
+                [self.config, options, self.config, query, limit, offset],
+            )
+            return cursor.fetchall()
+
+
+class BasicBackend:
+    """Unindexed icontains matching for databases without full-text support"""
+
+    @classmethod
+    def create_index(cls, schema_editor):
+        pass
+
+    @classmethod
+    def drop_index(cls, schema_editor):
+        pass
+
+    def index(self, post_id, title, content, tags):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def clear(self):
+        pass
+
+    @staticmethod
+    def parse(query):
+        return query.strip()
+
+    def _queryset(self, query):
+        return Post.objects.filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(tags__name__icontains=query)
+        ).distinct().order_by('-published_date')
+
+    def count(self, query):
+        return self._queryset(query).count()
+
+    def fetch(self, query, offset, limit):
+        rows = self._queryset(query).values_list('pk', 'content')[offset:offset + limit]
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        results = []
+        for pk, content in rows:
+            match = pattern.search(content)
+            start = max((match.start() if match else 0) - 80, 0)
+            excerpt = pattern.sub(lambda m: f'{_START}{m.group(0)}{_STOP}', content[start:start + 200])
+            results.append((pk, 0.0, excerpt))
+        return results
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def get_backend(vendor=None):
+    """Search backend for the database vendor (defaults to the default connection's)"""
+    return BACKENDS.get(vendor or connection.vendor, BasicBackend)()
+
+
+def index_post(post):
+    tags = ' '.join(tag.name for tag in post.tags.all())
+    get_backend().index(post.pk, post.title, post.content, tags)
+
+
+def remove_post(post_id):
+    get_backend().remove(post_id)
+
+
+def rebuild_index(batch_size=500):
+    """Re-index every post; returns the number of posts indexed"""
+    backend = get_backend()
+    backend.clear()
+    indexed = 0
+    posts = Post.objects.prefetch_related('tags').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return indexed
+        for post in batch:
+            tags = ' '.join(tag.name for tag in post.tags.all())
+            backend.index(post.pk, post.title, post.content, tags)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+
+class SearchResults:
+    """
+    Lazily evaluated, ranked search results. Supports len() and slicing so
+    it can be handed straight to a Paginator.
+    """
+
+    def __init__(self, query, backend=None):
+        self.backend = backend or get_backend()
+        self.query = self.backend.parse(query)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query) if self.query else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        offset = index.start or 0
+        limit = (index.stop if index.stop is not None else self.count()) - offset
+        if not self.query or limit <= 0:
+            return []
+        rows = self.backend.fetch(self.query, offset, limit)
+        posts = (
+            Post.objects.for_listing()
+            .prefetch_related('tags')
+            .in_bulk([row[0] for row in rows])
+        )
+        results = []
+        for pk, rank, snippet in rows:
+            post = posts.get(pk)
+            if post is None:
+                # Deleted after the index was read
+                continue
+            post.search_rank = rank
+            post.search_snippet = _highlight(snippet)
+            results.append(post)
+        return results
+
+
+def search(query):
+    """Ranked posts matching ``query``"""
+    return SearchResults(query)
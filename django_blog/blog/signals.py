@@ -0,0 +1,136 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from taggit.models import TaggedItem
+
+from .caching import invalidate_site_cache
+from .models import Post, Comment, RelatedPost
+from .page_cache import ALL_PAGES, SITE_STATS, TAG_CLOUD, for_post, for_tag, purge_pages, purge_post_pages
+from .moderation import purge_comment_pages
+from .related import refresh_related
+from .search import index_post, remove_post
+from .tag_stats import add_posting, adjust_tag_usage, is_post_tagging, remove_posting
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=User)
+def invalidate_on_content_change(sender, **kwargs):
+    """Content shown on the cached pages changed"""
+    invalidate_site_cache()
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_user_save(sender, created, update_fields=None, **kwargs):
+    """New or edited users; logins only touch last_login and are ignored"""
+    if created or not update_fields or set(update_fields) != {'last_login'}:
+        invalidate_site_cache()
+
+
+@receiver(post_save, sender=Post)
+def purge_saved_post_pages(sender, instance, **kwargs):
+    purge_post_pages(instance.pk, instance.tags.names())
+
+
+@receiver(post_delete, sender=Post)
+def purge_deleted_post_pages(sender, instance, **kwargs):
+    """Its tag pages are purged as the post's TaggedItems are deleted"""
+    purge_post_pages(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_commented_post_pages(sender, instance, **kwargs):
+    """
+    Approved comments and their counts show on the post and in the post
+    lists. Pending and rejected ones are never shown, so a burst of spam
+    purges nothing; blog/moderation.py purges when comments are approved.
+    """
+    if instance.status != Comment.Status.APPROVED:
+        return
+    purge_comment_pages([instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_deleted_comment(sender, instance, **kwargs):
+    """
+    However an approved comment is deleted (its view, the admin, a queryset
+    or a cascade from its author), it leaves the post's stored count.
+    """
+    if instance.status == Comment.Status.APPROVED:
+        Post.adjust_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=User)
+def purge_pages_on_user_save(sender, created, update_fields=None, **kwargs):
+    if created or not update_fields or set(update_fields) != {'last_login'}:
+        purge_pages(ALL_PAGES)
+
+
+@receiver(post_delete, sender=User)
+def purge_pages_on_user_delete(sender, **kwargs):
+    purge_pages(ALL_PAGES)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_on_tag_change(sender, action, **kwargs):
+    """A post's tags were added, removed or cleared"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_site_cache()
+
+
+@receiver(post_save, sender=TaggedItem)
+def count_tag_added(sender, instance, created, **kwargs):
+    """taggit creates one TaggedItem per tag added to a post"""
+    if created and is_post_tagging(instance):
+        adjust_tag_usage([instance.tag_id], 1)
+        add_posting(instance.tag_id, instance.object_id)
+        purge_pages(for_tag(instance.tag.name), for_post(instance.object_id), TAG_CLOUD, SITE_STATS)
+
+
+@receiver(post_delete, sender=TaggedItem)
+def count_tag_removed(sender, instance, **kwargs):
+    """Tags removed or cleared from a post, or the post itself deleted"""
+    if is_post_tagging(instance):
+        adjust_tag_usage([instance.tag_id], -1)
+        remove_posting(instance.tag_id, instance.object_id)
+        purge_pages(for_tag(instance.tag.name), for_post(instance.object_id), TAG_CLOUD, SITE_STATS)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    remove_post(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_retagged_post(sender, instance, action, **kwargs):
+    """Tags are part of the search document"""
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        index_post(instance)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def refresh_related_on_retag(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        refresh_related([instance.pk])
+
+
+@receiver(pre_delete, sender=Post)
+def remember_related_listings(sender, instance, **kwargs):
+    """The cascade removes this post from other lists; remember which ones"""
+    instance._listed_by = list(
+        RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def refill_related_listings(sender, instance, **kwargs):
+    listed_by = getattr(instance, '_listed_by', None)
+    if listed_by:
+        refresh_related(listed_by)
@@ -0,0 +1,168 @@
+"""
+Sitemap files for crawlers, built offline.
+
+The generate_sitemaps command streams every post and every used tag out of
+the database in primary-key order (keyset batches, never OFFSET) and writes
+them to gzipped sitemap files of at most SITEMAP_MAX_URLS URLs each, plus
+a sitemap index listing those files. Requests only ever read the finished
+files from BLOG_SITEMAP_ROOT, so serving a sitemap costs no queries however
+many posts there are.
+
+Files are written under temporary names and moved into place once the new
+set is complete, so crawlers never see a half-written sitemap.
+"""
+import gzip
+import os
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from taggit.models import Tag
+
+from .models import Post
+
+SITEMAP_MAX_URLS = 50000
+INDEX_NAME = 'sitemap.xml'
+
+_URLSET_START = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+_URLSET_END = '</urlset>\n'
+
+
+def sitemap_root():
+    return getattr(settings, 'BLOG_SITEMAP_ROOT', os.path.join(settings.BASE_DIR, 'sitemaps'))
+
+
+def _keyset(queryset, fields, batch_size):
+    """Yield ``fields`` of every row of ``queryset`` in pk order, batch by batch"""
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', *fields)[:batch_size])
+        if not rows:
+            return
+        yield from rows
+        last_pk = rows[-1][0]
+
+
+def post_entries(batch_size):
+    for pk, published in _keyset(Post.objects.all(), ['published_date'], batch_size):
+        yield reverse('post-detail', args=[pk]), published
+
+
+def tag_entries(batch_size):
+    # Only tags with posts have a page worth crawling
+    tags = Tag.objects.filter(usage__post_count__gt=0)
+    for pk, name in _keyset(tags, ['name'], batch_size):
+        try:
+            yield reverse('posts-by-tag', args=[name]), None
+        except NoReverseMatch:
+            # Names with a slash have no tag page URL
+            continue
+
+
+SECTIONS = {
+    'posts': post_entries,
+    'tags': tag_entries,
+}
+
+
+class _ChunkWriter:
+    """Writes one section's entries into numbered gzip files"""
+
+    def __init__(self, directory, section, base_url, max_urls):
+        self.directory = directory
+        self.section = section
+        self.base_url = base_url
+        self.max_urls = max_urls
+        self.files = []
+        self._file = None
+        self._count = 0
+
+    def write(self, path, lastmod):
+        if self._file is None or self._count >= self.max_urls:
+            self._close()
+            name = f'sitemap-{self.section}-{len(self.files) + 1}.xml.gz'
+            self.files.append(name)
+            self._file = gzip.open(os.path.join(self.directory, name + '.tmp'), 'wt', encoding='utf-8')
+            self._file.write(_URLSET_START)
+            self._count = 0
+        entry = f'<url><loc>{escape(self.base_url + path)}</loc>'
+        if lastmod:
+            entry += f'<lastmod>{lastmod.isoformat()}</lastmod>'
+        self._file.write(entry + '</url>\n')
+        self._count += 1
+
+    def _close(self):
+        if self._file is not None:
+            self._file.write(_URLSET_END)
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self._close()
+        return self.files
+
+
+def write_sitemaps(base_url, directory=None, max_urls=SITEMAP_MAX_URLS, batch_size=2000, log=None):
+    """
+    Write the sitemap files and index for ``base_url`` (scheme and host,
+    e.g. https://blog.example.com) into ``directory``. Returns the number
+    of URLs written.
+    """
+    directory = directory or sitemap_root()
+    os.makedirs(directory, exist_ok=True)
+    base_url = base_url.rstrip('/')
+
+    files, total = [], 0
+    for section, entries in SECTIONS.items():
+        writer = _ChunkWriter(directory, section, base_url, max_urls)
+        count = 0
+        for path, lastmod in entries(batch_size):
+            writer.write(path, lastmod)
+            count += 1
+        files.extend(writer.close())
+        total += count
+        if log:
+            log(f'{section}: {count} URLs')
+
+    now = timezone.now().isoformat()
+    with open(os.path.join(directory, INDEX_NAME + '.tmp'), 'w', encoding='utf-8') as index:
+        index.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        )
+        for name in files:
+            location = escape(base_url + reverse('sitemap-section', args=[name]))
+            index.write(f'<sitemap><loc>{location}</loc><lastmod>{now}</lastmod></sitemap>\n')
+        index.write('</sitemapindex>\n')
+
+    # Publish the new set, then drop sections that no longer exist
+    for name in files + [INDEX_NAME]:
+        os.replace(os.path.join(directory, name + '.tmp'), os.path.join(directory, name))
+    for name in os.listdir(directory):
+        if name.startswith('sitemap-') and name.endswith('.xml.gz') and name not in files:
+            os.remove(os.path.join(directory, name))
+    return total
+
+
+def _serve(name, content_type):
+    try:
+        response = FileResponse(open(os.path.join(sitemap_root(), name), 'rb'), content_type=content_type)
+    except FileNotFoundError:
+        raise Http404('Sitemaps have not been generated')
+    patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+
+def sitemap_index(request):
+    return _serve(INDEX_NAME, 'application/xml')
+
+
+def sitemap_section(request, name):
+    # The URL pattern only admits generated file names
+    return _serve(name, 'application/gzip')
@@ -0,0 +1,121 @@
+"""
+Tag popularity and per-tag post listings.
+
+Counts in TagUsage are adjusted as posts gain and lose tags, so the popular
+tags and the tag cloud are read as the top rows of the post_count index, no
+matter how many tags exist. TagPosting mirrors each post's taggings with
+its published date, so a tag page is a range scan of one index.
+"""
+import math
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, F
+from taggit.models import TaggedItem
+
+from .models import Post, TagPosting, TagUsage
+
+TAG_CLOUD_SIZE = 100
+TAG_CLOUD_STEPS = 5
+
+
+def is_post_tagging(tagged_item):
+    """Whether a TaggedItem row belongs to a blog Post"""
+    return tagged_item.content_type_id == ContentType.objects.get_for_model(Post).id
+
+
+def adjust_tag_usage(tag_ids, delta):
+    """Add ``delta`` to the post count of each tag in ``tag_ids``"""
+    tag_ids = list(tag_ids)
+    if not tag_ids:
+        return
+    if delta > 0:
+        TagUsage.objects.bulk_create(
+            [TagUsage(tag_id=tag_id) for tag_id in tag_ids], ignore_conflicts=True
+        )
+        TagUsage.objects.filter(tag_id__in=tag_ids).update(post_count=F('post_count') + delta)
+    else:
+        TagUsage.objects.filter(tag_id__in=tag_ids, post_count__gte=-delta).update(
+            post_count=F('post_count') + delta
+        )
+
+
+def add_posting(tag_id, post_id):
+    """List a post under a tag"""
+    published = Post.objects.filter(pk=post_id).values_list('published_date', flat=True).first()
+    if published is not None:
+        TagPosting.objects.bulk_create(
+            [TagPosting(tag_id=tag_id, post_id=post_id, published_date=published)],
+            ignore_conflicts=True,
+        )
+
+
+def remove_posting(tag_id, post_id):
+    TagPosting.objects.filter(tag_id=tag_id, post_id=post_id).delete()
+
+
+def tag_postings(tag):
+    """A tag's posting rows, for keyset pagination on (published_date, post)"""
+    return TagPosting.objects.filter(tag=tag).only('post_id', 'published_date')
+
+
+def popular_tags(limit=10):
+    """The ``limit`` most used tags, each with a ``post_count`` attribute"""
+    usage = (
+        TagUsage.objects.filter(post_count__gt=0)
+        .select_related('tag')
+        .order_by('-post_count', 'tag')[:limit]
+    )
+    tags = []
+    for row in usage:
+        row.tag.post_count = row.post_count
+        tags.append(row.tag)
+    return tags
+
+
+def tag_cloud(limit=TAG_CLOUD_SIZE, steps=TAG_CLOUD_STEPS):
+    """
+    The ``limit`` most used tags in name order, each with a ``weight`` from
+    1 to ``steps`` on a logarithmic scale of its post count.
+    """
+    tags = popular_tags(limit)
+    if not tags:
+        return []
+    low = math.log(min(tag.post_count for tag in tags))
+    high = math.log(max(tag.post_count for tag in tags))
+    spread = high - low or 1
+    for tag in tags:
+        tag.weight = 1 + round((math.log(tag.post_count) - low) / spread * (steps - 1))
+    return sorted(tags, key=lambda tag: tag.name.lower())
+
+
+def rebuild_tag_usage():
+    """Recompute every tag's post count from scratch; returns the number of tags counted"""
+    content_type = ContentType.objects.get_for_model(Post)
+    counts = (
+        TaggedItem.objects.filter(content_type=content_type)
+        .values('tag_id')
+        .annotate(total=Count('id'))
+    )
+    rows = [TagUsage(tag_id=row['tag_id'], post_count=row['total']) for row in counts]
+    with transaction.atomic():
+        TagUsage.objects.all().delete()
+        TagUsage.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_tag_postings(batch_size=1000):
+    """Recreate every tag's posting list from the taggings; returns the number of rows"""
+    published = dict(Post.objects.values_list('pk', 'published_date'))
+    items = (
+        TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Post))
+        .values_list('tag_id', 'object_id')
+    )
+    rows = [
+        TagPosting(tag_id=tag_id, post_id=post_id, published_date=published[post_id])
+        for tag_id, post_id in items.iterator() if post_id in published
+    ]
+    with transaction.atomic():
+        TagPosting.objects.all().delete()
+        TagPosting.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
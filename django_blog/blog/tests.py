@@ -1,3 +1,978 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.templatetags.static import static
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import markup, views
+from .caching import cache_generation, get_site_stats
+from .feeds import FEED_ITEMS
+from .markup import render_markdown, renderer_version, rerender_markup
+from .models import EXCERPT_WORDS, Post, Comment, RelatedPost, SpamToken, TagPosting, TagUsage, make_excerpt
+from .moderation import moderate_pending, review, score_texts, set_status
+from .related import RELATED_POSTS_LIMIT, rebuild_related_posts, refresh_related
+from .page_cache import anonymous_page_cache, page_cache_stats, reset_page_cache_stats
+from .pagination import CursorPaginator
+from .search import get_backend, rebuild_index, search
+from .sitemaps import write_sitemaps
+from .views import PostDetailView
+from .tag_stats import popular_tags, rebuild_tag_postings, rebuild_tag_usage, tag_cloud
+
+
+def make_post(author, title='Post', content='Body', tags=()):
+    post = Post.objects.create(title=title, content=content, author=author)
+    post.tags.add(*tags)
+    return post
+
+
+class SiteCacheTest(TestCase):
+    """Test the cached site stats and page fragments"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        for i in range(3):
+            make_post(self.author, f'Post {i}', tags=['django'])
+
+    def test_home_renders_without_queries_on_warm_cache(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Post 2')
+        self.assertContains(response, 'django')
+
+    def test_post_save_invalidates(self):
+        self.client.get(reverse('home'))
+        Post.objects.create(title='Fresh post', content='Body', author=self.author)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Fresh post')
+        self.assertEqual(response.context['total_posts'], 4)
+
+    def test_comment_and_user_changes_invalidate_stats(self):
+        self.assertEqual(get_site_stats()['total_authors'], 1)
+        User.objects.create_user(username='reader', password='pass12345')
+        self.assertEqual(get_site_stats()['total_authors'], 2)
+
+        stats = get_site_stats()
+        Comment.objects.create(post=Post.objects.first(), author=self.author, content='Hi')
+        self.assertIsNot(get_site_stats(), stats)
+
+    def test_login_does_not_invalidate(self):
+        stats = get_site_stats()
+        self.client.login(username='author', password='pass12345')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_site_stats(), stats)
+
+    def test_post_list_fragment_is_invalidated_by_delete(self):
+        self.client.get(reverse('post-list'))
+        Post.objects.filter(title='Post 2').first().delete()
+        response = self.client.get(reverse('post-list'))
+        self.assertNotContains(response, 'Post 2')
+
+
+class TagUsageTest(TestCase):
+    """Test the incrementally maintained tag usage counts"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+
+    def counts(self):
+        return {tag.name: tag.post_count for tag in popular_tags(50)}
+
+    def test_counts_follow_add_remove_clear_and_delete(self):
+        first = make_post(self.author, tags=['django', 'python'])
+        second = make_post(self.author, tags=['django'])
+        self.assertEqual(self.counts(), {'django': 2, 'python': 1})
+
+        first.tags.remove('python')
+        self.assertEqual(self.counts(), {'django': 2})
+
+        second.tags.set(['css'])
+        self.assertEqual(self.counts(), {'django': 1, 'css': 1})
+
+        first.tags.clear()
+        second.delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_popular_tags_are_ranked(self):
+        for _ in range(3):
+            make_post(self.author, tags=['django'])
+        make_post(self.author, tags=['css', 'python'])
+        make_post(self.author, tags=['python'])
+        self.assertEqual([tag.name for tag in popular_tags(2)], ['django', 'python'])
+
+    def test_popular_tags_query_is_constant(self):
+        for i in range(30):
+            make_post(self.author, tags=[f'tag{i}'])
+        with self.assertNumQueries(1):
+            popular_tags(10)
+
+    def test_tag_cloud_weights(self):
+        for _ in range(8):
+            make_post(self.author, tags=['django'])
+        make_post(self.author, tags=['css'])
+        cloud = {tag.name: tag.weight for tag in tag_cloud()}
+        self.assertEqual(cloud, {'css': 1, 'django': 5})
+        response = self.client.get(reverse('tag-cloud'))
+        self.assertContains(response, 'tag-weight-5')
+
+    def test_rebuild_matches_incremental_counts(self):
+        make_post(self.author, tags=['django', 'python'])
+        make_post(self.author, tags=['django'])
+        expected = self.counts()
+        TagUsage.objects.update(post_count=0)
+        rebuild_tag_usage()
+        self.assertEqual(self.counts(), expected)
+
+
+class SearchTest(TestCase):
+    """Test the full-text search index and view"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+
+    def titles(self, query):
+        return [post.title for post in search(query)[:20]]
+
+    def test_ranking_prefers_title_matches(self):
+        make_post(self.author, 'Gardening notes', content='Some words about django in passing')
+        make_post(self.author, 'Django tips', content='Nothing else')
+        self.assertEqual(self.titles('django'), ['Django tips', 'Gardening notes'])
+
+    def test_prefix_stemming_and_tags(self):
+        make_post(self.author, 'Running fast', tags=['sports'])
+        make_post(self.author, 'Unrelated', tags=['sports'])
+        self.assertEqual(self.titles('run'), ['Running fast'])
+        self.assertEqual(sorted(self.titles('sport')), ['Running fast', 'Unrelated'])
+
+    def test_index_follows_saves_retags_and_deletes(self):
+        post = make_post(self.author, 'Original title')
+        post.title = 'Renamed title'
+        post.save()
+        self.assertEqual(self.titles('renamed'), ['Renamed title'])
+        self.assertEqual(self.titles('original'), [])
+
+        post.tags.add('python')
+        self.assertEqual(self.titles('python'), ['Renamed title'])
+        post.tags.clear()
+        self.assertEqual(self.titles('python'), [])
+
+        post.delete()
+        self.assertEqual(self.titles('renamed'), [])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        make_post(self.author, 'Post', content='Use <script>alert(1)</script> carefully with django')
+        snippet = search('django')[0].search_snippet
+        self.assertIn('<mark>django</mark>', snippet)
+        self.assertNotIn('<script>', snippet)
+
+    def test_operators_in_query_are_not_interpreted(self):
+        make_post(self.author, 'Django')
+        self.assertEqual(self.titles('django" OR *'), [])
+        self.assertEqual(self.titles('"django"'), ['Django'])
+
+    def test_view_paginates(self):
+        for i in range(12):
+            make_post(self.author, f'Django post {i}', content='All about django')
+        response = self.client.get(reverse('search'), {'q': 'django'})
+        self.assertEqual(response.context['results_count'], 12)
+        self.assertEqual(len(response.context['posts']), 10)
+        response = self.client.get(reverse('search'), {'q': 'django', 'page': 2})
+        self.assertEqual(len(response.context['posts']), 2)
+        self.assertContains(response, '<mark>django</mark>', count=2)
+
+    def test_rebuild_index(self):
+        make_post(self.author, 'Django')
+        get_backend().clear()
+        self.assertEqual(self.titles('django'), [])
+        self.assertEqual(rebuild_index(), 1)
+        self.assertEqual(self.titles('django'), ['Django'])
+
+
+class RelatedPostsTest(TestCase):
+    """Test the precomputed related-posts index"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+
+    def related(self, post):
+        return [entry.related.title for entry in post.related_entries.select_related('related')]
+
+    def test_ranked_by_shared_tags(self):
+        post = make_post(self.author, 'Django ORM', tags=['django', 'orm', 'python'])
+        make_post(self.author, 'Django views', tags=['django', 'python'])
+        make_post(self.author, 'Python basics', tags=['python'])
+        make_post(self.author, 'CSS grid', tags=['css'])
+        self.assertEqual(self.related(post), ['Django views', 'Python basics'])
+
+    def test_recency_breaks_ties(self):
+        post = make_post(self.author, 'Django', tags=['django'])
+        old = make_post(self.author, 'Old', tags=['django'])
+        Post.objects.filter(pk=old.pk).update(published_date=timezone.now() - timedelta(days=365))
+        make_post(self.author, 'New', tags=['django'])
+        refresh_related([post.pk])
+        self.assertEqual(self.related(post), ['New', 'Old'])
+
+    def test_neighbours_update_when_tags_change(self):
+        first = make_post(self.author, 'First', tags=['django'])
+        second = make_post(self.author, 'Second', tags=['css'])
+        self.assertEqual(self.related(first), [])
+
+        second.tags.add('django')
+        self.assertEqual(self.related(first), ['Second'])
+        self.assertEqual(self.related(second), ['First'])
+
+        second.tags.remove('django')
+        self.assertEqual(self.related(first), [])
+
+    def test_deleted_post_is_replaced(self):
+        post = make_post(self.author, 'Post', tags=['django', 'python'])
+        for i in range(RELATED_POSTS_LIMIT):
+            make_post(self.author, f'Close {i}', tags=['django', 'python'])
+        make_post(self.author, 'Distant', tags=['django'])
+        self.assertNotIn('Distant', self.related(post))
+
+        Post.objects.get(title='Close 0').delete()
+        self.assertIn('Distant', self.related(post))
+        self.assertEqual(len(self.related(post)), RELATED_POSTS_LIMIT)
+
+    def test_refresh_is_bounded_per_tag(self):
+        with mock.patch('blog.related.CANDIDATES_PER_TAG', 3):
+            posts = [make_post(self.author, f'Post {i}', tags=['django']) for i in range(6)]
+            refresh_related([posts[-1].pk])
+        # Only the tag's three most recent posts are read
+        self.assertEqual(sorted(self.related(posts[-1])), ['Post 3', 'Post 4'])
+
+    def test_detail_view_reads_index(self):
+        post = make_post(self.author, 'Django ORM', tags=['django'])
+        make_post(self.author, 'Django views', tags=['django'])
+        response = self.client.get(reverse('post-detail', args=[post.pk]))
+        self.assertEqual([p.title for p in response.context['related_posts']], ['Django views'])
+        self.assertContains(response, 'Related Posts')
+
+    def test_rebuild_matches_incremental_index(self):
+        for i in range(12):
+            make_post(self.author, f'Post {i}', tags=[f'tag{j}' for j in range(i % 4, i % 4 + 3)])
+        expected = set(RelatedPost.objects.values_list('post_id', 'related_id'))
+        RelatedPost.objects.all().delete()
+        self.assertEqual(rebuild_related_posts(workers=2, chunk_size=3), 12)
+        self.assertEqual(set(RelatedPost.objects.values_list('post_id', 'related_id')), expected)
+
+
+class CommentTest(TestCase):
+    """Test comment pagination and the stored comment count"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.author)
+        self.client.login(username='author', password='pass12345')
+
+    def test_views_maintain_comment_count(self):
+        self.client.post(reverse('add-comment', args=[self.post.pk]), {'content': 'First'})
+        self.client.post(reverse('comment-create', args=[self.post.pk]), {'content': 'Second'})
+        self.post.refresh_from_db()
+        # Only approved comments are counted
+        self.assertEqual(self.post.comment_count, 0)
+        set_status(self.post.comments.values_list('pk', flat=True), Comment.Status.APPROVED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+        comment = self.post.comments.first()
+        response = self.client.post(reverse('comment-delete', args=[comment.pk]))
+        self.assertRedirects(response, reverse('post-detail', args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_every_deletion_path_maintains_comment_count(self):
+        commenter = User.objects.create_user(username='commenter', password='pass12345')
+        comments = [
+            Comment.objects.create(post=self.post, author=author, content=f'Comment {i}')
+            for i, author in enumerate([self.author, self.author, self.author, commenter, commenter])
+        ]
+        set_status([comment.pk for comment in comments[1:]], Comment.Status.APPROVED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 4)
+
+        # Pending comments were never counted
+        comments[0].delete()
+        # The admin's "delete selected" action deletes through a queryset
+        admin = User.objects.create_superuser(username='admin', password='pass12345')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:blog_comment_changelist'), {
+            'action': 'delete_selected', '_selected_action': [comments[1].pk], 'post': 'yes',
+        })
+        self.assertFalse(Comment.objects.filter(pk=comments[1].pk).exists())
+        Comment.objects.filter(pk=comments[2].pk).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+        # Deleting the author cascades to their comments
+        commenter.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_comments_are_paginated_with_authors_joined(self):
+        readers = [
+            User.objects.create_user(username=f'reader{i}', password='pass12345') for i in range(5)
+        ]
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=readers[i % 5], content=f'Comment {i}', status=Comment.Status.APPROVED)
+            for i in range(25)
+        ])
+        url = reverse('post-detail', args=[self.post.pk])
+        response = self.client.get(url)
+        page = response.context['comments_page']
+        self.assertEqual(len(page['comments']), PostDetailView.comments_per_page)
+        self.assertTrue(page['has_next'])
+
+        response = self.client.get(url, {'comments_page': 2})
+        page = response.context['comments_page']
+        self.assertEqual(len(page['comments']), 5)
+        self.assertFalse(page['has_next'])
+
+        # Comment authors come from the join: more distinct authors on the
+        # page must not mean more queries
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        Comment.objects.bulk_create([
+            Comment(
+                post=self.post, author=User.objects.create_user(username=f'new{i}'), content='New',
+                status=Comment.Status.APPROVED,
+            )
+            for i in range(10)
+        ])
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(after), len(before))
+
+    def test_list_pages_show_stored_count(self):
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+        cache.clear()
+        self.assertContains(self.client.get(reverse('post-list')), '7 comments')
+
+
+class ModerationTest(TestCase):
+    """Test the comment moderation queue and spam scoring"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.post = Post.objects.create(title='Post', content='Body', author=self.author)
+        self.detail = reverse('post-detail', args=[self.post.pk])
+
+    def comment(self, content, **kwargs):
+        return Comment.objects.create(post=self.post, author=self.author, content=content, **kwargs)
+
+    def train(self):
+        spam = [self.comment(f'Cheap pills and casino bonus offer {i}') for i in range(5)]
+        ham = [self.comment(f'Thanks for the clear explanation of Django views {i}') for i in range(5)]
+        review(Comment.objects.filter(pk__in=[c.pk for c in spam]), Comment.Status.REJECTED)
+        review(Comment.objects.filter(pk__in=[c.pk for c in ham]), Comment.Status.APPROVED)
+
+    def test_new_comments_wait_for_approval(self):
+        self.client.login(username='author', password='pass12345')
+        response = self.client.post(reverse('add-comment', args=[self.post.pk]), {'content': 'Hidden for now'}, follow=True)
+        self.assertContains(response, 'once it is approved')
+        self.assertNotContains(response, 'Hidden for now')
+        self.assertEqual(Comment.objects.get().status, Comment.Status.PENDING)
+
+    def test_moderator_decisions_train_and_count(self):
+        self.train()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 5)
+        self.assertEqual(SpamToken.objects.get(token='casino').spam_count, 5)
+        self.assertEqual(SpamToken.objects.get(token='').ham_count, 5)
+
+        spam, ham = score_texts(['Casino bonus pills', 'A clear explanation, thanks'])
+        self.assertGreater(spam, 0.9)
+        self.assertLess(ham, 0.2)
+
+    def test_batches_are_scored_and_applied_in_bulk(self):
+        self.train()
+        cache.clear()
+        for i in range(6):
+            self.comment(f'Great casino bonus, cheap pills {i}')
+            self.comment(f'Thanks, the explanation of views was clear {i}')
+        self.comment('Something nobody has written before')
+        pending = Comment.objects.filter(status=Comment.Status.PENDING)
+
+        # A fixed number of queries per batch, not per comment
+        with CaptureQueriesContext(connection) as queries:
+            totals = moderate_pending(batch_size=50)
+        self.assertLessEqual(len(queries), 15)
+        self.assertEqual(totals, {'approved': 6, 'rejected': 6, 'pending': 1})
+        self.assertEqual(pending.get().content, 'Something nobody has written before')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 11)
+        # Scored comments left pending are not scored again
+        self.assertEqual(moderate_pending(), {'approved': 0, 'rejected': 0, 'pending': 0})
+
+        response = self.client.get(self.detail)
+        self.assertContains(response, 'was clear 3')
+        self.assertNotContains(response, 'casino')
+        self.assertNotContains(response, 'nobody has written')
+
+    def test_keywords_and_links_count_without_training(self):
+        links = ' '.join(f'https://spam{i}.example.com' for i in range(3))
+        self.assertGreater(score_texts([f'crypto loan {links}'])[0], 0.9)
+        self.assertEqual(score_texts(['Nice post'])[0], 0.5)
+
+    def test_withdrawing_approval(self):
+        comment = self.comment('Fine comment', status=Comment.Status.APPROVED)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=1)
+        self.client.login(username='author', password='pass12345')
+        self.client.post(reverse('comment-update', args=[comment.pk]), {'content': 'Edited into spam'})
+        comment.refresh_from_db()
+        self.post.refresh_from_db()
+        self.assertEqual(comment.status, Comment.Status.PENDING)
+        self.assertEqual(self.post.comment_count, 0)
+
+        set_status([comment.pk], Comment.Status.APPROVED)
+        self.assertContains(self.client.get(self.detail), 'Edited into spam')
+        self.assertEqual(set_status([comment.pk], Comment.Status.REJECTED), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_pending_comments_purge_nothing(self):
+        self.assertEqual(self.client.get(self.detail)['X-Page-Cache'], 'MISS')
+        generation = cache_generation()
+        self.comment('Buy cheap casino chips')
+        self.assertEqual(cache_generation(), generation)
+        self.assertEqual(self.client.get(self.detail)['X-Page-Cache'], 'HIT')
+
+        # Approval is what publishes it
+        set_status(Comment.objects.values_list('pk', flat=True), Comment.Status.APPROVED)
+        self.assertNotEqual(cache_generation(), generation)
+        response = self.client.get(self.detail)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'casino chips')
+
+    def test_overturned_decisions_are_unlearned(self):
+        comment = self.comment('Lovely unique words')
+        review(Comment.objects.filter(pk=comment.pk), Comment.Status.APPROVED)
+        self.assertEqual(SpamToken.objects.get(token='unique').ham_count, 1)
+        review(Comment.objects.filter(pk=comment.pk), Comment.Status.REJECTED)
+        token = SpamToken.objects.get(token='unique')
+        self.assertEqual((token.spam_count, token.ham_count), (1, 0))
+        self.assertEqual(SpamToken.objects.get(token='').ham_count, 0)
+
+        # Automatic decisions were never learned, so there's nothing to undo
+        automatic = self.comment('Other unique words')
+        set_status([automatic.pk], Comment.Status.REJECTED)
+        review(Comment.objects.filter(pk=automatic.pk), Comment.Status.APPROVED)
+        token.refresh_from_db()
+        self.assertEqual((token.spam_count, token.ham_count), (1, 1))
+
+
+class ExcerptTest(TestCase):
+    """Test the stored excerpt and deferred content on list pages"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.post = make_post(self.author, 'Long', content='word ' * 200, tags=['django'])
+
+    def test_excerpt_is_stored_on_save(self):
+        self.assertEqual(self.post.excerpt, make_excerpt('word ' * 200))
+        self.assertEqual(len(self.post.excerpt.split()), EXCERPT_WORDS + 1)
+
+        self.post.content = 'Short now'
+        self.post.save(update_fields=['content'])
+        self.assertEqual(Post.objects.get(pk=self.post.pk).excerpt, 'Short now')
+
+    def test_excerpt_is_plain_text_of_the_html(self):
+        post = Post.objects.create(title='Escaped', content='Fish & <chips>\n\nMore', author=self.author)
+        self.assertEqual(post.excerpt, 'Fish & <chips> More')
+        Post.objects.filter(pk=post.pk).update(excerpt='stale', content_html_version='old')
+        rerender_markup([Post], workers=1)
+        self.assertEqual(Post.objects.get(pk=post.pk).excerpt, 'Fish & <chips> More')
+
+    @skipUnless(markup.markdown, 'markdown and nh3 are not installed')
+    def test_excerpt_has_no_markdown_syntax(self):
+        post = Post.objects.create(
+            title='Markdown', content='# Heading\n\nSome *emphasis* and a [link](https://example.com)',
+            author=self.author,
+        )
+        self.assertEqual(post.excerpt, 'Heading Some emphasis and a link')
+
+    def test_list_pages_do_not_load_content(self):
+        cache.clear()
+        for url in [reverse('home'), reverse('post-list'), reverse('posts-by-tag', args=['django'])]:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertContains(response, 'word word word')
+            self.assertFalse(
+                [q['sql'] for q in queries if '"blog_post"."content"' in q['sql']], url
+            )
+
+
+class CursorPaginationTest(TestCase):
+    """Test keyset pagination on (published_date, id)"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        now = timezone.now()
+        for i in range(12):
+            post = Post.objects.create(title=f'Post {i:02}', content='Body', author=self.author)
+            # Pairs of posts share a timestamp to exercise the id tie-breaker
+            Post.objects.filter(pk=post.pk).update(published_date=now - timedelta(hours=12 - i // 2))
+            post.tags.add('django')
+        self.expected = [
+            post.title for post in Post.objects.order_by('-published_date', '-pk')
+        ]
+
+    def walk(self, paginator):
+        titles, page = [], paginator.page()
+        titles.append([post.title for post in page])
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            titles.append([post.title for post in page])
+        return titles, page
+
+    def test_forward_and_backward(self):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        pages, last = self.walk(paginator)
+        self.assertEqual([title for page in pages for title in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+
+        previous = paginator.page(last.previous_cursor)
+        self.assertEqual([post.title for post in previous], pages[1])
+        first = paginator.page(previous.previous_cursor)
+        self.assertEqual([post.title for post in first], pages[0])
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor_shows_first_page(self):
+        page = CursorPaginator(Post.objects.all(), 5).page('not-a-cursor')
+        self.assertEqual([post.title for post in page], self.expected[:5])
+
+    def test_post_list_pages_without_count(self):
+        cache.clear()
+        get_site_stats()  # the approximate total comes from the cached stats
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post-list'))
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+        self.assertEqual(len(response.context['posts']), 5)
+        self.assertEqual(response.context['paginator'].approximate_count, 12)
+
+        response = self.client.get(reverse('post-list'), {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual([post.title for post in response.context['posts']], self.expected[5:10])
+
+    def test_posts_by_tag_uses_tag_usage_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts-by-tag', args=['django']))
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'].upper()])
+        self.assertEqual(response.context['posts_count'], 12)
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertContains(response, 'Older')
+
+
+class TagPostingTest(TestCase):
+    """Test the per-tag posting lists behind tag pages"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        now = timezone.now()
+        self.posts = []
+        for i in range(15):
+            post = Post.objects.create(title=f'Post {i:02}', content='Body', author=self.author)
+            Post.objects.filter(pk=post.pk).update(published_date=now - timedelta(hours=15 - i))
+            post.tags.add('django', 'python' if i % 2 else 'web')
+            self.posts.append(post)
+
+    def postings(self, name):
+        return list(
+            TagPosting.objects.filter(tag__name=name)
+            .order_by('-published_date', '-post_id')
+            .values_list('post_id', flat=True)
+        )
+
+    def test_postings_follow_tagging(self):
+        self.assertEqual(self.postings('django'), [post.pk for post in reversed(self.posts)])
+        first, second = self.posts[:2]
+        first.tags.remove('django')
+        second.tags.clear()
+        self.assertNotIn(first.pk, self.postings('django'))
+        self.assertNotIn(second.pk, self.postings('django') + self.postings('python'))
+        self.posts[2].delete()
+        self.assertNotIn(self.posts[2].pk, self.postings('django'))
+
+    def test_rebuild_matches_incremental(self):
+        expected = sorted(TagPosting.objects.values_list('tag_id', 'post_id', 'published_date'))
+        TagPosting.objects.all().delete()
+        self.assertEqual(rebuild_tag_postings(), len(expected))
+        self.assertEqual(sorted(TagPosting.objects.values_list('tag_id', 'post_id', 'published_date')), expected)
+
+    def test_tag_page_reads_posting_list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts-by-tag', args=['python']))
+        paging = [q['sql'] for q in queries if 'LIMIT' in q['sql'] and 'blog_tagposting' in q['sql']]
+        self.assertEqual(len(paging), 1)
+        self.assertNotIn('JOIN', paging[0])
+        expected = [post.title for post in reversed(self.posts) if self.posts.index(post) % 2]
+        self.assertEqual([post.title for post in response.context['posts']], expected)
+
+        response = self.client.get(reverse('posts-by-tag', args=['django']))
+        self.assertEqual(len(response.context['posts']), 10)
+        response = self.client.get(
+            reverse('posts-by-tag', args=['django']), {'cursor': response.context['page_obj'].next_cursor}
+        )
+        self.assertEqual(
+            [post.title for post in response.context['posts']], [post.title for post in reversed(self.posts[:5])]
+        )
+        self.assertTrue(response.context['page_obj'].has_previous())
+        self.assertFalse(response.context['page_obj'].has_next())
+
+
+class PageCacheTest(TestCase):
+    """Test the full-page cache for anonymous readers"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.post = make_post(self.author, 'Cached post', tags=['django'])
+        self.other = make_post(self.author, 'Other post', tags=['python'])
+        reset_page_cache_stats()
+
+    def get(self, url, **params):
+        return self.client.get(url, params)
+
+    def test_anonymous_pages_are_cached(self):
+        for url in [
+            reverse('home'), reverse('post-list'), reverse('post-detail', args=[self.post.pk]),
+            reverse('posts-by-tag', args=['django']), reverse('tag-cloud'),
+        ]:
+            self.assertEqual(self.get(url)['X-Page-Cache'], 'MISS', url)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'HIT', url)
+            self.assertEqual(len(queries), 0, url)
+        stats = page_cache_stats()
+        self.assertEqual((stats['hit'], stats['miss']), (5, 5))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_query_string_is_part_of_the_key(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        self.get(url)
+        self.assertEqual(self.get(url, comments_page=2)['X-Page-Cache'], 'MISS')
+
+    def test_saving_a_post_purges_its_pages(self):
+        detail = reverse('post-detail', args=[self.post.pk])
+        other_detail = reverse('post-detail', args=[self.other.pk])
+        django_page = reverse('posts-by-tag', args=['django'])
+        python_page = reverse('posts-by-tag', args=['python'])
+        for url in (detail, other_detail, django_page, python_page, reverse('post-list')):
+            self.get(url)
+
+        self.post.title = 'Edited post'
+        self.post.save()
+        for url in (detail, django_page, reverse('post-list')):
+            response = self.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'MISS', url)
+            self.assertContains(response, 'Edited post')
+        for url in (other_detail, python_page):
+            self.assertEqual(self.get(url)['X-Page-Cache'], 'HIT', url)
+
+    def test_retagging_and_comments_purge(self):
+        detail = reverse('post-detail', args=[self.post.pk])
+        self.get(detail)
+        self.get(reverse('tag-cloud'))
+        self.post.tags.add('new-tag')
+        self.assertEqual(self.get(reverse('tag-cloud'))['X-Page-Cache'], 'MISS')
+        self.get(detail)
+        Comment.objects.create(post=self.post, author=self.author, content='A comment', status=Comment.Status.APPROVED)
+        self.assertContains(self.get(detail), 'A comment')
+
+    def test_logged_in_readers_bypass_the_cache(self):
+        self.get(reverse('home'))
+        self.client.login(username='author', password='pass12345')
+        response = self.get(reverse('home'))
+        self.assertEqual(response['X-Page-Cache'], 'BYPASS')
+        self.assertContains(response, 'Logout')
+
+    def test_pending_messages_bypass_the_cache(self):
+        self.get(reverse('home'))
+        self.client.login(username='author', password='pass12345')
+        response = self.client.get(reverse('logout'), follow=True)
+        self.assertEqual(response['X-Page-Cache'], 'BYPASS')
+        self.assertContains(response, 'logged out')
+        # Once the message has been shown the cached page is served again
+        self.assertEqual(self.get(reverse('home'))['X-Page-Cache'], 'HIT')
+
+    def test_pages_using_csrf_are_not_stored(self):
+        @anonymous_page_cache('form')
+        def form_view(request):
+            return HttpResponse(get_token(request))
+
+        for _ in range(2):
+            request = RequestFactory().get('/form/')
+            request.user = AnonymousUser()
+            self.assertEqual(form_view(request)['X-Page-Cache'], 'BYPASS')
+
+
+class StaticAssetsTest(TestCase):
+    """Test the hashed, precompressed static build"""
+
+    def setUp(self):
+        cache.clear()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        storages = {
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+        }
+        overrides = override_settings(STATIC_ROOT=self.static_root, STORAGES=storages, WHITENOISE_AUTOREFRESH=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_collectstatic_fingerprints_and_compresses(self):
+        url = static('css/style.css')
+        self.assertRegex(url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        hashed = os.path.join(self.static_root, url[len('/static/'):])
+        self.assertTrue(os.path.exists(hashed + '.gz'))
+
+    def test_hashed_assets_are_served_with_far_future_headers(self):
+        url = static('css/style.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('max-age=315360000', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(url, self.client.get(reverse('home')).content.decode())
+
+
+class MarkupTest(TestCase):
+    """Test Markdown bodies rendered to stored HTML on save"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.post = Post.objects.create(
+            title='Markup', content='Hello **world**\n\n<script>alert(1)</script>', author=self.author
+        )
+
+    def test_html_is_rendered_and_sanitized_on_save(self):
+        self.assertEqual(self.post.content_html_version, renderer_version())
+        self.assertIn('Hello', self.post.content_html)
+        self.assertNotIn('<script>', self.post.content_html)
+
+        comment = Comment.objects.create(post=self.post, author=self.author, content='Nice <b onclick="x()">post</b>')
+        self.assertNotIn('<b onclick', comment.content_html)
+
+        self.post.content = 'Edited'
+        self.post.save(update_fields=['content'])
+        self.post.refresh_from_db()
+        self.assertIn('Edited', self.post.content_html)
+
+    @skipUnless(markup.markdown, 'markdown and nh3 are not installed')
+    def test_markdown_syntax(self):
+        html = render_markdown('# Title\n\n*em* [link](https://example.com) [bad](javascript:alert(1))')
+        self.assertIn('<h1>Title</h1>', html)
+        self.assertIn('<em>em</em>', html)
+        self.assertIn('href="https://example.com"', html)
+        self.assertNotIn('javascript:', html)
+
+    def test_pages_never_render(self):
+        Comment.objects.create(post=self.post, author=self.author, content='A comment', status=Comment.Status.APPROVED)
+        with mock.patch('blog.markup.render_markdown', side_effect=AssertionError('rendered on read')), \
+                mock.patch('blog.models.render_markdown', side_effect=AssertionError('rendered on read')):
+            response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertContains(response, self.post.content_html, html=False)
+        self.assertContains(response, 'A comment')
+
+    def test_rerender_stale_rows(self):
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.author, content=f'Comment {i}')
+        Post.objects.update(content_html='', content_html_version='old')
+        Comment.objects.filter(content='Comment 0').update(content_html='', content_html_version='old')
+
+        self.assertEqual(rerender_markup([Post, Comment], workers=1), 2)
+        self.assertEqual(rerender_markup([Post, Comment], workers=1), 0)
+        self.assertIn('Comment 0', Comment.objects.get(content='Comment 0').content_html)
+        self.assertEqual(rerender_markup([Post, Comment], workers=2, chunk_size=2, force=True), 6)
+        self.assertFalse(
+            Comment.objects.exclude(content_html_version=renderer_version()).exists()
+        )
+
+    def test_rerender_reads_in_chunks(self):
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.author, content=f'Comment {i}')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(rerender_markup([Comment], workers=1, chunk_size=2, force=True), 5)
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and '"content"' in query['sql']]
+        # Three chunks and the empty read that ends them, none unbounded
+        self.assertEqual(len(reads), 4)
+        self.assertTrue(all('LIMIT 2' in sql for sql in reads))
+
+
+class AsyncViewsTest(TestCase):
+    """Test the async home, post detail and search views"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.posts = [
+            Post.objects.create(title=f'Async post {i}', content='Concurrent body', author=self.author)
+            for i in range(12)
+        ]
+        self.client.force_login(self.author)
+
+    def test_views_are_async(self):
+        self.assertTrue(asyncio.iscoroutinefunction(views.home))
+        self.assertTrue(asyncio.iscoroutinefunction(views.search_posts))
+        self.assertTrue(PostDetailView.view_is_async)
+
+    async def test_async_client(self):
+        client = AsyncClient()
+        self.assertContains(await client.get(reverse('home')), 'Async post 11')
+        response = await client.get(reverse('post-detail', args=[self.posts[0].pk]))
+        self.assertEqual(response.context['author_post_count'], 12)
+        self.assertEqual(len(response.context['recent_posts']), 5)
+        self.assertNotIn(self.posts[0], response.context['recent_posts'])
+        self.assertEqual((await client.get(reverse('post-detail', args=[0]))).status_code, 404)
+
+    def test_search_pages(self):
+        response = self.client.get(reverse('search'), {'q': 'concurrent'})
+        self.assertEqual(response.context['results_count'], 12)
+        self.assertEqual(len(response.context['posts']), 10)
+        response = self.client.get(reverse('search'), {'q': 'concurrent', 'page': 2})
+        self.assertEqual(len(response.context['posts']), 2)
+        # Past the end falls back to the last page, as Paginator.get_page does
+        response = self.client.get(reverse('search'), {'q': 'concurrent', 'page': 9})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(len(response.context['posts']), 2)
+
+
+class FeedTest(TestCase):
+    """Test the streamed RSS, Atom and JSON feeds"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        now = timezone.now()
+        for i in range(60):
+            post = Post.objects.create(
+                title=f'Feed post {i}', content=f'Body **{i}**', author=self.author if i % 2 else self.other
+            )
+            Post.objects.filter(pk=post.pk).update(published_date=now - timedelta(hours=60 - i))
+            post.tags.add('even' if i % 2 == 0 else 'odd')
+
+    def read(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        if response.status_code != 200:
+            return response, ''
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_formats(self):
+        response, body = self.read(reverse('feed', args=['rss']))
+        self.assertTrue(response['Content-Type'].startswith('application/rss+xml'))
+        self.assertEqual(body.count('<item>'), FEED_ITEMS)
+        self.assertIn('Feed post 59', body)
+        self.assertLess(body.index('Feed post 59'), body.index('Feed post 58'))
+
+        response, body = self.read(reverse('feed', args=['atom']))
+        self.assertTrue(response['Content-Type'].startswith('application/atom+xml'))
+        self.assertEqual(body.count('<entry>'), FEED_ITEMS)
+
+        response, body = self.read(reverse('feed', args=['json']))
+        data = json.loads(body)
+        self.assertEqual(data['version'], 'https://jsonfeed.org/version/1.1')
+        self.assertEqual(len(data['items']), FEED_ITEMS)
+        self.assertEqual(data['items'][0]['title'], 'Feed post 59')
+        self.assertEqual(data['items'][0]['tags'], ['odd'])
+        self.assertIn('59', data['items'][0]['content_html'])
+
+        self.assertEqual(self.client.get(reverse('feed', args=['xml'])).status_code, 404)
+
+    def test_author_and_tag_feeds(self):
+        _, body = self.read(reverse('author-feed', args=['author', 'json']))
+        titles = [item['title'] for item in json.loads(body)['items']]
+        self.assertEqual(len(titles), 30)
+        self.assertTrue(all(int(title.split()[-1]) % 2 for title in titles))
+
+        _, body = self.read(reverse('tag-feed', args=['even', 'json']))
+        titles = [item['title'] for item in json.loads(body)['items']]
+        self.assertEqual(titles[0], 'Feed post 58')
+        self.assertEqual(len(titles), 30)
+        self.assertEqual(self.client.get(reverse('tag-feed', args=['missing', 'rss'])).status_code, 404)
+
+    def test_conditional_get(self):
+        url = reverse('feed', args=['atom'])
+        response, _ = self.read(url)
+        self.assertIn('public', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, headers={'if-modified-since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(title='Newest', content='Body', author=self.author)
+        response, body = self.read(url, **{'if-modified-since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Newest', body)
+
+
+class SitemapTest(TestCase):
+    """Test the chunked, gzipped sitemap files"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        overrides = override_settings(BLOG_SITEMAP_ROOT=self.directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        author = User.objects.create_user(username='author', password='pass12345')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Body', author=author) for i in range(7)]
+        self.posts[0].tags.add('django', 'python')
+
+    def read(self, name):
+        with gzip.open(os.path.join(self.directory, name), 'rt') as fh:
+            return fh.read()
+
+    def test_chunks_and_index(self):
+        self.assertEqual(write_sitemaps('https://blog.example.com/', max_urls=3, batch_size=2), 9)
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.directory)),
+            ['sitemap-posts-1.xml.gz', 'sitemap-posts-2.xml.gz', 'sitemap-posts-3.xml.gz',
+             'sitemap-tags-1.xml.gz', 'sitemap.xml'],
+        )
+        posts = ''.join(self.read(f'sitemap-posts-{i}.xml.gz') for i in (1, 2, 3))
+        for post in self.posts:
+            self.assertIn(f'<loc>https://blog.example.com/post/{post.pk}/</loc>', posts)
+        self.assertEqual(self.read('sitemap-posts-3.xml.gz').count('<url>'), 1)
+        self.assertIn('https://blog.example.com/tags/python/', self.read('sitemap-tags-1.xml.gz'))
+
+        response = self.client.get(reverse('sitemap'))
+        index = b''.join(response.streaming_content).decode()
+        self.assertEqual(index.count('<sitemap>'), 4)
+        self.assertIn('https://blog.example.com/sitemaps/sitemap-posts-2.xml.gz', index)
+        response = self.client.get(reverse('sitemap-section', args=['sitemap-tags-1.xml.gz']))
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+
+    def test_shrinking_removes_old_chunks(self):
+        write_sitemaps('https://blog.example.com', max_urls=3)
+        Post.objects.filter(pk__in=[post.pk for post in self.posts[3:]]).delete()
+        write_sitemaps('https://blog.example.com', max_urls=3)
+        self.assertNotIn('sitemap-posts-2.xml.gz', os.listdir(self.directory))
+        self.assertEqual(self.client.get('/sitemaps/sitemap-posts-2.xml.gz').status_code, 404)
+
+    def test_serving_reads_files_only(self):
+        write_sitemaps('https://blog.example.com')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('sitemap'))
@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import feeds, sitemaps, views
 from .views import (
     PostListView, PostDetailView, PostCreateView, PostUpdateView, PostDeleteView,
     CommentCreateView, CommentUpdateView, CommentDeleteView
@@ -30,4 +30,13 @@ urlpatterns = [
     path('search/', views.search_posts, name='search'),
     path('tags/<str:tag_name>/', views.posts_by_tag, name='posts-by-tag'),
     path('tags/', views.tag_cloud, name='tag-cloud'),
+    
+    # Feeds (feed_format is rss, atom or json)
+    path('feed/<str:feed_format>/', feeds.posts_feed, name='feed'),
+    path('authors/<str:username>/feed/<str:feed_format>/', feeds.author_feed, name='author-feed'),
+    path('tags/<str:tag_name>/feed/<str:feed_format>/', feeds.tag_feed, name='tag-feed'),
+    
+    # Sitemaps, written by the generate_sitemaps command
+    path('sitemap.xml', sitemaps.sitemap_index, name='sitemap'),
+    re_path(r'^sitemaps/(?P<name>sitemap-[a-z]+-\d+\.xml\.gz)$', sitemaps.sitemap_section, name='sitemap-section'),
 ]
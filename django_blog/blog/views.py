@@ -1,3 +1,6 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.models import User
 from django.contrib.auth import login, logout, authenticate
@@ -7,27 +10,38 @@ from django.contrib import messages
 from django.contrib.auth.forms import AuthenticationForm
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Q
+from django.core.paginator import Page, Paginator
+from django.http import Http404
+from django.utils.decorators import method_decorator
 from taggit.models import Tag
-from .models import Post, Comment
+from .caching import aget_site_stats, cache_generation, cache_ttl, get_site_stats
+from .models import Post, Comment, TagUsage
+from .moderation import purge_comment_pages
+from .page_cache import POST_LISTS, SITE_STATS, TAG_CLOUD, anonymous_page_cache, for_post, for_tag
+from .pagination import CursorPaginationMixin, CursorPaginator
+from .search import search
+from .tag_stats import tag_cloud as weighted_tag_cloud, tag_postings
 from .forms import UserRegisterForm, UserUpdateForm, PostForm, CommentForm
 
 # Function-based views for authentication (keep these)
-def home(request):
-    latest_posts = Post.objects.all().order_by('-published_date')[:5]
-    total_posts = Post.objects.count()
-    total_authors = User.objects.count()
-    
-    # Get popular tags
-    popular_tags = Tag.objects.all()[:10]
+@anonymous_page_cache(POST_LISTS, SITE_STATS)
+async def home(request):
+    # The queryset is lazy and only evaluated when the cached fragment that
+    # renders it is missing, so a warm cache serves this page without queries
+    latest_posts = Post.objects.for_listing().order_by('-published_date')[:5]
+    stats, generation = await asyncio.gather(aget_site_stats(), sync_to_async(cache_generation)())
     
     context = {
         'posts': latest_posts,
-        'total_posts': total_posts,
-        'total_authors': total_authors,
-        'popular_tags': popular_tags,
+        'total_posts': stats['total_posts'],
+        'total_authors': stats['total_authors'],
+        'popular_tags': stats['popular_tags'][:10],
+        'cache_generation': generation,
+        'cache_ttl': cache_ttl(),
     }
-    return render(request, 'blog/home.html', context)
+    # Templates read the session and user lazily, which the ORM only allows
+    # from sync code
+    return await sync_to_async(render)(request, 'blog/home.html', context)
 
 def register(request):
     if request.method == 'POST':
@@ -89,7 +103,7 @@ def profile(request):
     else:
         form = UserUpdateForm(instance=request.user)
     
-    user_posts = Post.objects.filter(author=request.user).order_by('-published_date')
+    user_posts = Post.objects.for_listing().filter(author=request.user).order_by('-published_date')
     
     context = {
         'form': form,
@@ -99,30 +113,102 @@ def profile(request):
     return render(request, 'blog/profile.html', context)
 
 # Class-based views for CRUD operations
-class PostListView(ListView):
+@method_decorator(anonymous_page_cache(POST_LISTS, SITE_STATS), name='dispatch')
+class PostListView(CursorPaginationMixin, ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     ordering = ['-published_date']
     paginate_by = 5
     
+    def get_queryset(self):
+        return super().get_queryset().for_listing()
+    
+    def get_approximate_count(self):
+        return get_site_stats()['total_posts']
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['popular_tags'] = Tag.objects.all()[:15]
+        context['popular_tags'] = get_site_stats()['popular_tags']
+        context['cache_generation'] = cache_generation()
+        context['cache_ttl'] = cache_ttl()
         return context
 
 class PostDetailView(DetailView):
     model = Post
     template_name = 'blog/post_detail.html'
+    comments_per_page = 20
+    recent_posts_limit = 5
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def get_queryset(self):
+        return super().get_queryset().select_related('author')
+    
+    @method_decorator(anonymous_page_cache(lambda request, pk: for_post(pk)))
+    async def get(self, request, *args, **kwargs):
+        try:
+            self.object = await self.get_queryset().aget(pk=self.kwargs['pk'])
+        except Post.DoesNotExist:
+            raise Http404("No post found matching the query")
+        context = await self.aget_context_data(object=self.object)
+        # Rendered by the handler in a worker thread
+        return self.render_to_response(context)
+    
+    async def aget_comments_page(self):
+        """
+        One page of approved comments, newest first, with their authors
+        joined; a range scan of the approved-comments index. One extra row
+        is fetched to tell whether an older page exists, so no COUNT query
+        is needed; the total is the stored comment_count.
+        """
+        try:
+            number = max(int(self.request.GET.get('comments_page', 1)), 1)
+        except ValueError:
+            number = 1
+        start = (number - 1) * self.comments_per_page
+        comments = [
+            comment async for comment in
+            self.object.comments.filter(status=Comment.Status.APPROVED).select_related('author')
+            .order_by('-created_at', '-pk')[start:start + self.comments_per_page + 1]
+        ]
+        return {
+            'number': number,
+            'comments': comments[:self.comments_per_page],
+            'has_previous': number > 1,
+            'has_next': len(comments) > self.comments_per_page,
+            'previous_page_number': number - 1,
+            'next_page_number': number + 1,
+        }
+    
+    async def aget_related_posts(self):
+        # Related posts are precomputed by blog/related.py
+        return [
+            entry.related async for entry in
+            self.object.related_entries.select_related('related__author').defer('related__content', 'related__content_html')
+        ]
+    
+    async def aget_recent_posts(self):
+        """The author's latest posts other than this one"""
+        return [
+            post async for post in
+            Post.objects.filter(author_id=self.object.author_id).exclude(pk=self.object.pk)
+            .defer('content', 'content_html').order_by('-published_date')[:self.recent_posts_limit]
+        ]
+    
+    async def aget_context_data(self, **kwargs):
+        context = self.get_context_data(**kwargs)
         context['comment_form'] = CommentForm()
-        context['comments'] = self.object.comments.all().order_by('-created_at')
-        # Get related posts by tags
-        post_tags_ids = self.object.tags.values_list('id', flat=True)
-        related_posts = Post.objects.filter(tags__in=post_tags_ids).exclude(id=self.object.id)
-        context['related_posts'] = related_posts.distinct()[:5]
+        # None of these depend on each other
+        comments_page, related_posts, recent_posts, author_post_count = await asyncio.gather(
+            self.aget_comments_page(),
+            self.aget_related_posts(),
+            self.aget_recent_posts(),
+            Post.objects.filter(author_id=self.object.author_id).acount(),
+        )
+        context['comments'] = comments_page['comments']
+        context['comments_page'] = comments_page
+        context['related_posts'] = related_posts
+        context['recent_posts'] = recent_posts
+        context['author_post_count'] = author_post_count
         return context
 
 class PostCreateView(LoginRequiredMixin, CreateView):
@@ -170,7 +256,8 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.author = self.request.user
         form.instance.post_id = self.kwargs['pk']
-        messages.success(self.request, 'Your comment has been posted successfully!')
+        # Published once approved (see blog/moderation.py)
+        messages.success(self.request, 'Your comment has been submitted and will appear once it is approved.')
         return super().form_valid(form)
     
     def get_success_url(self):
@@ -182,8 +269,23 @@ class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     template_name = 'blog/comment_form.html'
     
     def form_valid(self, form):
-        messages.success(self.request, 'Your comment has been updated successfully!')
-        return super().form_valid(form)
+        if 'content' not in form.changed_data:
+            messages.success(self.request, 'Your comment has been updated successfully!')
+            return super().form_valid(form)
+        # Edited comments are moderated again, so an approved comment can't
+        # be turned into spam afterwards
+        was_approved = form.instance.status == Comment.Status.APPROVED
+        form.instance.status = Comment.Status.PENDING
+        form.instance.spam_score = None
+        # Earlier decisions were about the old text
+        form.instance.reviewed = False
+        response = super().form_valid(form)
+        if was_approved:
+            Post.adjust_comment_count(self.object.post_id, -1)
+            # The signal handlers ignore the now pending comment
+            purge_comment_pages([self.object.post_id])
+        messages.success(self.request, 'Your comment has been updated and will appear again once it is approved.')
+        return response
     
     def test_func(self):
         comment = self.get_object()
@@ -196,9 +298,11 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Comment
     template_name = 'blog/comment_confirm_delete.html'
     
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, 'Your comment has been deleted successfully!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # The post_delete signal handler updates the post's comment count
+        response = super().form_valid(form)
+        messages.success(self.request, 'Your comment has been deleted successfully!')
+        return response
     
     def test_func(self):
         comment = self.get_object()
@@ -218,45 +322,73 @@ def add_comment(request, post_id):
             comment.author = request.user
             comment.post = post
             comment.save()
-            messages.success(request, 'Your comment has been posted successfully!')
+            messages.success(request, 'Your comment has been submitted and will appear once it is approved.')
             return redirect('post-detail', pk=post_id)
         else:
             messages.error(request, 'Please correct the errors in your comment.')
     return redirect('post-detail', pk=post_id)
 
 # Search and Tag Views
-def search_posts(request):
-    query = request.GET.get('q', '')
-    posts = Post.objects.all()
-    
-    if query:
-        # Search in title, content, and tags using Q objects
-        posts = posts.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct().order_by('-published_date')
+async def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    # Ranked results from the full-text index (see blog/search.py). The
+    # total and the requested page are independent index queries, so they
+    # run together; only a page past the end needs a second fetch.
+    results = search(query) if query else []
+    paginator = Paginator(results, 10)
+    try:
+        number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        number = 1
+    offset = (number - 1) * paginator.per_page
+    count, object_list = await asyncio.gather(
+        sync_to_async(len)(results),
+        sync_to_async(results.__getitem__)(slice(offset, offset + paginator.per_page)),
+    )
+    paginator.count = count
+    if not object_list and number > paginator.num_pages:
+        page_obj = await sync_to_async(paginator.page)(paginator.num_pages)
+    else:
+        page_obj = Page(object_list, number, paginator)
     
     context = {
-        'posts': posts,
+        'posts': page_obj.object_list,
         'query': query,
-        'results_count': posts.count(),
+        'results_count': paginator.count,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
     }
-    return render(request, 'blog/search_results.html', context)
+    return await sync_to_async(render)(request, 'blog/search_results.html', context)
 
+@anonymous_page_cache(lambda request, tag_name: for_tag(tag_name))
 def posts_by_tag(request, tag_name):
     tag = get_object_or_404(Tag, name=tag_name)
-    posts = Post.objects.filter(tags__name__in=[tag_name]).order_by('-published_date')
+    # Page through the tag's posting list (one index range scan), then load
+    # just that page of posts; the total comes from the maintained tag usage
+    # counts, not a COUNT(*)
+    paginator = CursorPaginator(
+        tag_postings(tag), 10,
+        approximate_count=lambda: TagUsage.objects.filter(tag=tag).values_list('post_count', flat=True).first() or 0,
+        pk_field='post_id',
+    )
+    page_obj = paginator.page(request.GET.get('cursor'))
+    posts = Post.objects.for_listing().prefetch_related('tags').in_bulk(
+        [posting.post_id for posting in page_obj]
+    )
+    page_obj.object_list = [posts[posting.post_id] for posting in page_obj if posting.post_id in posts]
     
     context = {
         'tag': tag,
-        'posts': posts,
-        'posts_count': posts.count(),
+        'posts': page_obj.object_list,
+        'posts_count': paginator.approximate_count,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
     }
     return render(request, 'blog/posts_by_tag.html', context)
 
+@anonymous_page_cache(TAG_CLOUD)
 def tag_cloud(request):
-    tags = Tag.objects.all()
+    tags = weighted_tag_cloud()
     context = {
         'tags': tags,
     }
@@ -0,0 +1,49 @@
+"""
+Process pools for the CPU-bound batch commands (related posts ranking,
+Markdown re-rendering).
+
+Pool workers only compute; every query is made by the calling process.
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+
+def process_pool(max_workers=None, initializer=None, initargs=()):
+    """
+    A ProcessPoolExecutor of ``max_workers`` processes (all CPUs by
+    default), forked where the platform allows so workers start with the
+    parent's loaded code.
+    """
+    # Workers never touch the database; don't let them inherit open
+    # connections across fork (unless one is mid-transaction)
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork') if 'fork' in methods else None
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=context, initializer=initializer, initargs=initargs
+    )
+
+
+def bounded_map(pool, function, iterable, max_workers=None):
+    """
+    Like pool.map(), results in order, but only consuming ``iterable`` as
+    far as a couple of tasks per worker ahead, so a lazily read input is
+    never held in memory as a whole. Without a pool, maps in-process.
+    """
+    if pool is None:
+        yield from map(function, iterable)
+        return
+    window = 2 * (max_workers or os.cpu_count() or 1)
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
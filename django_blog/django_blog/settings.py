@@ -26,11 +26,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'taggit',
     'blog',  # Our blog app
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'query_instrumentation.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -120,6 +123,27 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+# Build target of `manage.py collectstatic`, served in-process by WhiteNoise
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic writes content-hashed copies of every asset plus .gz and
+# (with the Brotli package installed) .br variants; WhiteNoise serves the
+# hashed names with a ten-year immutable Cache-Control and picks the
+# precompressed variant the browser accepts. In development files are
+# served unhashed straight from STATICFILES_DIRS.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+# Cache lifetime for static files requested without their content hash
+WHITENOISE_MAX_AGE = 0 if DEBUG else 3600
 
 # Media files
 MEDIA_URL = '/media/'
@@ -128,6 +152,32 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Lifetime of cached page fragments and site stats (see blog/caching.py);
+# they are also invalidated whenever posts, comments or users change
+BLOG_CACHE_TTL = 300
+
+# Lifetime of full pages cached for anonymous readers (see blog/page_cache.py);
+# pages are purged by post, tag and comment changes before then
+BLOG_PAGE_CACHE_TTL = 300
+
+# How long readers and shared caches may reuse a feed before revalidating
+# it against its newest post (see blog/feeds.py)
+BLOG_FEED_MAX_AGE = 900
+
+# Where `manage.py generate_sitemaps` writes the sitemap files served at
+# /sitemap.xml, and the site root their URLs are built on
+BLOG_SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+BLOG_SITEMAP_BASE_URL = os.environ.get('BLOG_SITEMAP_BASE_URL', 'http://localhost:8000')
+
+# Spam scoring of pending comments by `manage.py moderate_comments` (see
+# blog/moderation.py): scores at or above SPAM_THRESHOLD are rejected, at or
+# below HAM_THRESHOLD approved, and the rest wait for a moderator
+BLOG_COMMENT_MODERATION = {
+    'SPAM_THRESHOLD': 0.9,
+    'HAM_THRESHOLD': 0.2,
+    'MAX_LINKS': 2,
+}
+
 # Login/Logout URLs
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from .images import schedule_variants
 from .models import CustomUser
 
 @admin.register(CustomUser)
@@ -9,4 +10,9 @@ class CustomUserAdmin(UserAdmin):
         ('Additional Info', {
             'fields': ('bio', 'profile_picture', 'date_of_birth', 'website', 'location', 'followers')
         }),
-    )
\ No newline at end of file
+    )
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'profile_picture' in form.changed_data:
+            schedule_variants(obj)
@@ -0,0 +1,171 @@
+"""
+Profile picture processing.
+
+Uploaded profile pictures are kept as the original, and resized WebP
+variants are generated after the upload's transaction commits, on a small
+background thread pool, so the request never waits for Pillow. Serializers
+hand out the thumbnail variant and fall back to the original until it
+exists.
+
+Settings (all optional)::
+
+    PROFILE_IMAGES = {
+        'ASYNC': True,            # process on the worker pool after commit
+        'WORKERS': 2,             # size of the worker pool
+        'QUALITY': 80,            # WebP quality for the variants
+        'MAX_UPLOAD_BYTES': 10 * 1024 * 1024,
+        'MAX_PIXELS': 40_000_000, # refuse decompression bombs
+    }
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> (model field, bounding box)
+PROFILE_PICTURE_VARIANTS = {
+    'thumbnail': ('profile_picture_thumbnail', (96, 96)),
+    'medium': ('profile_picture_medium', (320, 320)),
+}
+
+_executor = None
+
+
+def _options():
+    options = {
+        'ASYNC': True,
+        'WORKERS': 2,
+        'QUALITY': 80,
+        'MAX_UPLOAD_BYTES': 10 * 1024 * 1024,
+        'MAX_PIXELS': 40_000_000,
+    }
+    options.update(getattr(settings, 'PROFILE_IMAGES', {}))
+    return options
+
+
+def validate_profile_picture(upload):
+    """Reject oversized or undecodable uploads before they are stored"""
+    options = _options()
+    if upload.size > options['MAX_UPLOAD_BYTES']:
+        raise ValidationError(
+            f"Profile pictures must be at most {options['MAX_UPLOAD_BYTES'] // (1024 * 1024)} MB."
+        )
+    # Reading the header is enough for the dimensions; the pixels are only
+    # decoded later by the worker.
+    position = upload.tell()
+    try:
+        with Image.open(upload) as image:
+            width, height = image.size
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError('Upload a valid image.')
+    finally:
+        upload.seek(position)
+    if width * height > options['MAX_PIXELS']:
+        raise ValidationError('Profile picture dimensions are too large.')
+
+
+def _render_variant(image, size, quality):
+    variant = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def generate_variants(user_id):
+    """
+    Render every variant of ``user_id``'s current profile picture, store
+    them and record their names on the user.
+    """
+    from .models import CustomUser
+
+    user = CustomUser.objects.filter(pk=user_id).first()
+    if user is None or not user.profile_picture:
+        return {}
+
+    source = user.profile_picture
+    storage = source.storage
+    quality = _options()['QUALITY']
+    largest = max(size for _, size in PROFILE_PICTURE_VARIANTS.values())
+    digest = hashlib.sha1(source.name.encode()).hexdigest()[:12]
+    base = os.path.splitext(os.path.basename(source.name))[0]
+
+    with storage.open(source.name, 'rb') as handle, Image.open(handle) as image:
+        # JPEG can decode straight to a reduced scale, which avoids holding the
+        # full-resolution bitmap of a large photo in memory.
+        image.draft('RGB', (largest[0] * 2, largest[1] * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        rendered = {
+            name: _render_variant(image, size, quality)
+            for name, (_, size) in PROFILE_PICTURE_VARIANTS.items()
+        }
+
+    updates = {}
+    for name, content in rendered.items():
+        field, _ = PROFILE_PICTURE_VARIANTS[name]
+        path = f'profile_pictures/variants/{user_id}/{base}-{digest}-{name}.webp'
+        updates[field] = storage.save(path, ContentFile(content))
+
+    # Only apply the variants if the picture has not been replaced meanwhile;
+    # otherwise a newer job owns the variant fields.
+    applied = CustomUser.objects.filter(pk=user_id, profile_picture=source.name).update(**updates)
+    if not applied:
+        for name in updates.values():
+            storage.delete(name)
+        return {}
+    return updates
+
+
+def _run(user_id, stale, worker=False):
+    from .models import CustomUser
+
+    storage = CustomUser._meta.get_field('profile_picture').storage
+    try:
+        for name in stale:
+            storage.delete(name)
+        generate_variants(user_id)
+    except Exception:
+        logger.exception('Profile picture processing failed for user %s', user_id)
+    finally:
+        if worker:
+            # Worker threads get their own connection; don't leak it
+            connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=_options()['WORKERS'], thread_name_prefix='profile-images'
+        )
+    return _executor
+
+
+def schedule_variants(user):
+    """
+    Queue variant generation for ``user`` once the current transaction
+    commits. The stale variants are cleared straight away so nobody is
+    served the previous picture's thumbnail.
+    """
+    from .models import CustomUser
+
+    fields = [field for field, _ in PROFILE_PICTURE_VARIANTS.values()]
+    stale = [getattr(user, field).name for field in fields if getattr(user, field)]
+    CustomUser.objects.filter(pk=user.pk).update(**{field: None for field in fields})
+    for field in fields:
+        setattr(user, field, None)
+
+    if _options()['ASYNC']:
+        transaction.on_commit(lambda: _get_executor().submit(_run, user.pk, stale, True))
+    else:
+        transaction.on_commit(lambda: _run(user.pk, stale))
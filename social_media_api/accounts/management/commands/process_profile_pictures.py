@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from accounts.images import generate_variants
+from accounts.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Generate resized profile picture variants for users that are missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Regenerate variants for every user with a profile picture')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        if not options['all']:
+            users = users.filter(Q(profile_picture_thumbnail__isnull=True) | Q(profile_picture_thumbnail=''))
+
+        processed = failed = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            try:
+                generate_variants(user_id)
+                processed += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'User {user_id}: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} profile pictures ({failed} failed)'))
@@ -1,9 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from .images import validate_profile_picture
 
 class CustomUser(AbstractUser):
     bio = models.TextField(max_length=500, blank=True)
-    profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    profile_picture = models.ImageField(
+        upload_to='profile_pictures/', blank=True, null=True, validators=[validate_profile_picture]
+    )
+    # Resized WebP variants, generated in the background by accounts.images
+    profile_picture_thumbnail = models.ImageField(blank=True, null=True, editable=False)
+    profile_picture_medium = models.ImageField(blank=True, null=True, editable=False)
     followers = models.ManyToManyField('self', symmetrical=False, related_name='following', blank=True)
     date_of_birth = models.DateField(blank=True, null=True)
     website = models.URLField(blank=True)
@@ -3,8 +3,39 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
+from .images import PROFILE_PICTURE_VARIANTS, schedule_variants, validate_profile_picture
 from .models import CustomUser
 
+
+class ProfilePictureField(serializers.ImageField):
+    """
+    Accepts an uploaded image and represents it by one of its resized
+    variants, falling back to the original until the variant is generated.
+    """
+
+    def __init__(self, variant='thumbnail', **kwargs):
+        self.variant = variant
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_null', True)
+        kwargs.setdefault('validators', [validate_profile_picture])
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        field, _ = PROFILE_PICTURE_VARIANTS[self.variant]
+        return getattr(instance, field) or super().get_attribute(instance)
+
+
+class ProfilePictureMixin:
+    """Queue variant generation whenever the profile picture changes"""
+
+    def update(self, instance, validated_data):
+        picture_changed = 'profile_picture' in validated_data
+        instance = super().update(instance, validated_data)
+        if picture_changed:
+            schedule_variants(instance)
+        return instance
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
         write_only=True,
@@ -60,7 +91,9 @@ class UserLoginSerializer(serializers.Serializer):
             
         return attrs
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(ProfilePictureMixin, serializers.ModelSerializer):
+    profile_picture = ProfilePictureField()
+    profile_picture_original = serializers.ImageField(source='profile_picture', read_only=True)
     followers_count = serializers.ReadOnlyField()
     following_count = serializers.ReadOnlyField()
     is_following = serializers.SerializerMethodField()
@@ -69,7 +102,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name', 
-            'bio', 'profile_picture', 'date_of_birth', 'website',
+            'bio', 'profile_picture', 'profile_picture_original', 'date_of_birth', 'website',
             'location', 'followers_count', 'following_count', 'is_following',
             'created_at', 'updated_at'
         ]
@@ -84,10 +117,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
             return request.user.following.filter(id=obj.id).exists()
         return False
 
-class UserUpdateSerializer(serializers.ModelSerializer):
+class UserUpdateSerializer(ProfilePictureMixin, serializers.ModelSerializer):
     """
     Serializer for updating user profile.
     """
+    profile_picture = ProfilePictureField()
+
     class Meta:
         model = CustomUser
         fields = [
@@ -1,3 +1,92 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .images import generate_variants
+from .models import CustomUser
+from .serializers import UserProfileSerializer
+
+
+def make_image(size=(1200, 800), fmt='JPEG', name='avatar.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+@override_settings(PROFILE_IMAGES={'ASYNC': False})
+class ProfilePictureTest(TestCase):
+    """Test profile picture upload and variant generation"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = CustomUser.objects.create_user(username='alice', password='pass12345')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                reverse('profile'), {'profile_picture': image}, format='multipart', secure=True
+            )
+
+    def test_upload_generates_webp_variants(self):
+        response = self.upload(make_image())
+        self.assertEqual(response.status_code, 200, response.data)
+
+        self.user.refresh_from_db()
+        with Image.open(self.user.profile_picture_thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.format, 'WEBP')
+            self.assertEqual(thumbnail.size, (96, 96))
+        with Image.open(self.user.profile_picture_medium.path) as medium:
+            self.assertEqual(medium.size, (320, 320))
+
+        data = UserProfileSerializer(self.user).data
+        self.assertTrue(data['profile_picture'].endswith('-thumbnail.webp'))
+        self.assertTrue(data['profile_picture_original'].endswith('.jpg'))
+
+    def test_original_is_served_until_variants_exist(self):
+        self.user.profile_picture = make_image()
+        self.user.save()
+        data = UserProfileSerializer(self.user).data
+        self.assertEqual(data['profile_picture'], data['profile_picture_original'])
+
+    def test_replacing_picture_removes_old_variants(self):
+        self.upload(make_image())
+        self.user.refresh_from_db()
+        old_thumbnail = self.user.profile_picture_thumbnail
+        self.upload(make_image(fmt='PNG', name='second.png'))
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.profile_picture_thumbnail.name, old_thumbnail.name)
+        self.assertFalse(old_thumbnail.storage.exists(old_thumbnail.name))
+
+    def test_invalid_upload_is_rejected(self):
+        bogus = SimpleUploadedFile('avatar.jpg', b'not an image', content_type='image/jpeg')
+        response = self.upload(bogus)
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(PROFILE_IMAGES={'ASYNC': False, 'MAX_UPLOAD_BYTES': 1024})
+    def test_oversized_upload_is_rejected(self):
+        response = self.upload(make_image())
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('profile_picture', response.data)
+
+    def test_backfill_command(self):
+        self.user.profile_picture = make_image()
+        self.user.save()
+        call_command('process_profile_pictures', stdout=StringIO())
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.profile_picture_thumbnail)
+        self.assertEqual(generate_variants(0), {})
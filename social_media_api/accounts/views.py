@@ -70,6 +70,16 @@ def user_login_view(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def logout_view(request):
+    """
+    View for user logout.
+    Deletes the user's auth token.
+    """
+    Token.objects.filter(user=request.user).delete()
+    return Response({'message': 'Logout successful'}, status=status.HTTP_200_OK)
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     """
     View for retrieving and updating user profile.
@@ -0,0 +1,436 @@
+"""
+Benchmark harness for the social media API.
+
+Seeds a synthetic social graph and drives the hot endpoints through the
+DRF test client, recording latency, query counts and throughput. Also
+measures raw like/comment write throughput under different SQLite pragmas.
+"""
+import os
+import random
+import tempfile
+import time
+from itertools import accumulate
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.db.utils import load_backend
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from notifications.models import Notification
+from social_media_api.db import SQLITE_PRAGMAS
+from .models import Post, Comment, Like
+
+BENCH_USERNAME_PREFIX = 'bench_user_'
+BENCH_PASSWORD = 'bench-password'
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _popularity_weights(count, alpha):
+    """
+    Cumulative Zipf weights: the user at rank r is picked with
+    probability proportional to 1 / (r + 1) ** alpha.
+    """
+    return list(accumulate(1.0 / (rank + 1) ** alpha for rank in range(count)))
+
+
+def clear_social_graph():
+    """Delete every user (and, by cascade, their content) created by the seeder"""
+    return CustomUser.objects.filter(username__startswith=BENCH_USERNAME_PREFIX).delete()
+
+
+def seed_social_graph(users=1000, posts=10000, avg_following=20, max_following=1000,
+                      alpha=1.1, likes=0, notifications=0, batch_size=5000,
+                      seed=42, log=None):
+    """
+    Seed a synthetic social graph with a power-law follower distribution.
+
+    Out-degrees (how many users each user follows) are drawn from a Pareto
+    distribution and targets are picked by Zipf popularity, so a handful of
+    users end up with most of the followers. Post authorship follows the
+    same popularity curve. Everything is written with bulk_create in batches
+    of ``batch_size`` so memory stays flat at large scales.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    password = make_password(BENCH_PASSWORD)
+    now = timezone.now()
+
+    # Users
+    start = CustomUser.objects.filter(username__startswith=BENCH_USERNAME_PREFIX).count()
+    new_users = (
+        CustomUser(
+            username=f'{BENCH_USERNAME_PREFIX}{index}',
+            email=f'{BENCH_USERNAME_PREFIX}{index}@example.com',
+            password=password,
+        )
+        for index in range(start, start + users)
+    )
+    for chunk in _chunks(new_users, batch_size):
+        CustomUser.objects.bulk_create(chunk, batch_size=batch_size)
+    user_ids = list(
+        CustomUser.objects.filter(username__startswith=BENCH_USERNAME_PREFIX)
+        .order_by('id').values_list('id', flat=True)
+    )
+    log(f'Users: {len(user_ids)}')
+
+    # Follow edges. A row (from=A, to=B) means B follows A.
+    cum_weights = _popularity_weights(len(user_ids), alpha)
+    Follow = CustomUser.followers.through
+    # Pareto with shape 2 has mean 2 * scale, i.e. avg_following
+    shape = 2.0
+    scale = avg_following * (shape - 1) / shape
+
+    def follow_edges():
+        for follower_id in user_ids:
+            degree = min(round(scale * rng.paretovariate(shape)), max_following, len(user_ids) - 1)
+            targets = set(rng.choices(user_ids, cum_weights=cum_weights, k=degree))
+            targets.discard(follower_id)
+            for followed_id in targets:
+                yield Follow(from_customuser_id=followed_id, to_customuser_id=follower_id)
+
+    # ignore_conflicts skips edges that already exist, so count the table
+    existing_follows = Follow.objects.count()
+    for chunk in _chunks(follow_edges(), batch_size):
+        Follow.objects.bulk_create(chunk, batch_size=batch_size, ignore_conflicts=True)
+    follow_count = Follow.objects.count() - existing_follows
+    log(f'Follow edges: {follow_count}')
+
+    # Posts
+    new_posts = (
+        Post(
+            author_id=rng.choices(user_ids, cum_weights=cum_weights)[0],
+            title=f'Benchmark post {index}',
+            content=' '.join(rng.choices(['lorem', 'ipsum', 'dolor', 'sit', 'amet'], k=40)),
+        )
+        for index in range(posts)
+    )
+    for chunk in _chunks(new_posts, batch_size):
+        Post.objects.bulk_create(chunk, batch_size=batch_size)
+    post_id_range = Post.objects.filter(
+        author__username__startswith=BENCH_USERNAME_PREFIX
+    ).order_by('id').values_list('id', flat=True)
+    first_post = post_id_range.first()
+    last_post = post_id_range.last()
+    log(f'Posts: {posts}')
+
+    # Likes
+    if likes and first_post is not None:
+        new_likes = (
+            Like(
+                user_id=rng.choice(user_ids),
+                post_id=rng.randint(first_post, last_post),
+            )
+            for _ in range(likes)
+        )
+        existing_likes = Like.objects.count()
+        for chunk in _chunks(new_likes, batch_size):
+            Like.objects.bulk_create(chunk, batch_size=batch_size, ignore_conflicts=True)
+        likes = Like.objects.count() - existing_likes
+        log(f'Likes: {likes}')
+
+    # Notifications
+    if notifications:
+        new_notifications = (
+            Notification(
+                recipient_id=rng.choices(user_ids, cum_weights=cum_weights)[0],
+                actor_id=rng.choice(user_ids),
+                verb=rng.choice([Notification.FOLLOW, Notification.LIKE, Notification.COMMENT]),
+                read=rng.random() < 0.5,
+            )
+            for _ in range(notifications)
+        )
+        for chunk in _chunks(new_notifications, batch_size):
+            Notification.objects.bulk_create(chunk, batch_size=batch_size)
+        log(f'Notifications: {notifications}')
+
+    return {
+        'users': len(user_ids),
+        'follows': follow_count,
+        'posts': posts,
+        'likes': likes,
+        'notifications': notifications,
+        'seconds': round((timezone.now() - now).total_seconds(), 3),
+    }
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+class Scenario:
+    """
+    One benchmarked endpoint.
+    prepare() and cleanup() run outside the timed section so that write
+    endpoints can be exercised repeatedly without drifting state: prepare()
+    returns the request's arguments, or None to skip the iteration, and
+    cleanup() removes only the rows perform() created.
+    """
+    name = None
+
+    def __init__(self, rng, post_ids, user_ids):
+        self.rng = rng
+        self.post_ids = post_ids
+        self.user_ids = user_ids
+
+    def prepare(self, user):
+        return {}
+
+    def perform(self, client, user, **kwargs):
+        raise NotImplementedError
+
+    def cleanup(self, user, **kwargs):
+        pass
+
+
+class UserFeedScenario(Scenario):
+    name = 'user_feed'
+
+    def perform(self, client, user, **kwargs):
+        return client.get(reverse('user-feed'), secure=True)
+
+
+class PostListScenario(Scenario):
+    name = 'post_list'
+
+    def perform(self, client, user, **kwargs):
+        return client.get(reverse('post-list'), secure=True)
+
+
+class LikePostScenario(Scenario):
+    name = 'like_post'
+
+    def prepare(self, user):
+        liked = set(Like.objects.filter(user=user, post_id__in=self.post_ids).values_list('post_id', flat=True))
+        candidates = [post_id for post_id in self.post_ids if post_id not in liked]
+        if not candidates:
+            return None
+        post_id = self.rng.choice(candidates)
+        self.notification_ids = set(self.notifications(user, post_id).values_list('id', flat=True))
+        return {'post_id': post_id}
+
+    def notifications(self, user, post_id):
+        return Notification.objects.filter(actor=user, verb=Notification.LIKE, target_object_id=post_id)
+
+    def perform(self, client, user, post_id):
+        return client.post(reverse('like-post', kwargs={'pk': post_id}), secure=True)
+
+    def cleanup(self, user, post_id):
+        Like.objects.filter(user=user, post_id=post_id).delete()
+        self.notifications(user, post_id).exclude(id__in=self.notification_ids).delete()
+
+
+class FollowUserScenario(Scenario):
+    name = 'follow_user'
+
+    def prepare(self, user):
+        following = set(user.following.values_list('id', flat=True))
+        candidates = [
+            user_id for user_id in self.user_ids if user_id != user.id and user_id not in following
+        ]
+        if not candidates:
+            return None
+        return {'user_id': self.rng.choice(candidates)}
+
+    def perform(self, client, user, user_id):
+        return client.post(reverse('follow-user-by-id', kwargs={'user_id': user_id}), secure=True)
+
+    def cleanup(self, user, user_id):
+        user.following.remove(user_id)
+
+
+class NotificationStatsScenario(Scenario):
+    name = 'notification_stats'
+
+    def perform(self, client, user, **kwargs):
+        return client.get(reverse('notification-stats'), secure=True)
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        UserFeedScenario, PostListScenario, LikePostScenario,
+        FollowUserScenario, NotificationStatsScenario,
+    ]
+}
+
+
+def run_benchmark(endpoints=None, iterations=50, warmup=5, sample_users=20, seed=42):
+    """
+    Drive each endpoint ``iterations`` times as a rotating sample of users
+    and return a JSON-serializable report.
+    """
+    rng = random.Random(seed)
+    endpoints = endpoints or list(SCENARIOS)
+
+    # Sample users that follow somebody so the feed is not trivially empty
+    Follow = CustomUser.followers.through
+    candidate_ids = list(
+        Follow.objects.values_list('to_customuser_id', flat=True).distinct()[:10000]
+    )
+    user_ids = list(CustomUser.objects.values_list('id', flat=True)[:10000])
+    candidate_ids = candidate_ids or user_ids
+    if not candidate_ids:
+        raise ValueError('No users to benchmark with; seed the database first.')
+    users = list(CustomUser.objects.filter(
+        id__in=rng.sample(candidate_ids, min(sample_users, len(candidate_ids)))
+    ))
+    post_ids = list(Post.objects.values_list('id', flat=True)[:10000])
+
+    client = APIClient(SERVER_NAME='localhost')
+    results = []
+    for name in endpoints:
+        scenario = SCENARIOS[name](rng, post_ids, user_ids)
+        if name == LikePostScenario.name and not post_ids:
+            continue
+        latencies, query_counts, errors = [], [], 0
+        for index in range(warmup + iterations):
+            user = users[index % len(users)]
+            kwargs = scenario.prepare(user)
+            if kwargs is None:
+                continue
+            client.force_authenticate(user=user)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = scenario.perform(client, user, **kwargs)
+                elapsed = time.perf_counter() - started
+            scenario.cleanup(user, **kwargs)
+            if index < warmup:
+                continue
+            if response.status_code >= 400:
+                errors += 1
+            latencies.append(elapsed * 1000.0)
+            query_counts.append(len(queries.captured_queries))
+        client.force_authenticate(user=None)
+
+        latencies.sort()
+        # Time spent in the requests themselves; setup and cleanup are excluded
+        request_seconds = sum(latencies) / 1000.0
+        results.append({
+            'endpoint': name,
+            'requests': len(latencies),
+            'errors': errors,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                'max': round(latencies[-1], 3) if latencies else 0.0,
+            },
+            'queries_per_request': {
+                'mean': round(sum(query_counts) / len(query_counts), 2) if query_counts else 0.0,
+                'max': max(query_counts, default=0),
+            },
+            'throughput_rps': round(len(latencies) / request_seconds, 2) if request_seconds else 0.0,
+        })
+
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'django_version': django.get_version(),
+        'database': connection.vendor,
+        'iterations': iterations,
+        'warmup': warmup,
+        'dataset': {
+            'users': CustomUser.objects.count(),
+            'follows': Follow.objects.count(),
+            'posts': Post.objects.count(),
+            'likes': Like.objects.count(),
+            'notifications': Notification.objects.count(),
+        },
+        'results': results,
+    }
+
+
+WRITE_PROFILES = {
+    # SQLite defaults: rollback journal, fsync on every commit
+    'default': {},
+    'tuned': SQLITE_PRAGMAS,
+}
+
+
+def benchmark_sqlite_writes(writes=1000, profiles=None):
+    """
+    Measure autocommit like and comment inserts per second against a fresh
+    SQLite file for each pragma profile.
+
+    Every profile gets its own temporary database connection so the
+    configured database is never touched.
+    """
+    profiles = profiles or WRITE_PROFILES
+    models = [CustomUser, Post, Comment, Like]
+    results = []
+
+    for name, pragmas in profiles.items():
+        with tempfile.TemporaryDirectory() as directory:
+            alias = f'write_benchmark_{name}'
+            settings_dict = connections.configure_settings({
+                'default': connections.settings['default'],
+                alias: {
+                    'ENGINE': 'social_media_api.db.sqlite3',
+                    'NAME': os.path.join(directory, 'benchmark.sqlite3'),
+                    'OPTIONS': {'pragmas': pragmas},
+                },
+            })[alias]
+            # Registered on the handler only, not in settings.DATABASES
+            connections[alias] = load_backend(settings_dict['ENGINE']).DatabaseWrapper(
+                settings_dict, alias
+            )
+            try:
+                with connections[alias].schema_editor() as editor:
+                    for model in models:
+                        editor.create_model(model)
+
+                CustomUser.objects.using(alias).bulk_create(
+                    CustomUser(username=f'{BENCH_USERNAME_PREFIX}{index}') for index in range(writes)
+                )
+                author_ids = list(
+                    CustomUser.objects.using(alias).values_list('id', flat=True)
+                )
+                post = Post.objects.using(alias).create(
+                    author_id=author_ids[0], title='Benchmark post', content='Benchmark'
+                )
+
+                timings = {}
+                started = time.perf_counter()
+                for user_id in author_ids:
+                    Like.objects.using(alias).create(user_id=user_id, post_id=post.id)
+                timings['likes_per_second'] = len(author_ids) / (time.perf_counter() - started)
+
+                started = time.perf_counter()
+                for user_id in author_ids:
+                    Comment.objects.using(alias).create(
+                        post_id=post.id, author_id=user_id, content='Nice post!'
+                    )
+                timings['comments_per_second'] = len(author_ids) / (time.perf_counter() - started)
+            finally:
+                connections[alias].close()
+                del connections[alias]
+
+        results.append({
+            'profile': name,
+            'pragmas': pragmas,
+            'writes': writes,
+            **{key: round(value, 1) for key, value in timings.items()},
+        })
+    return results
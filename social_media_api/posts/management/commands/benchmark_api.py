@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from posts.benchmarks import SCENARIOS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the hot API endpoints and report latency percentiles, queries and throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', nargs='+', choices=sorted(SCENARIOS),
+                            help='Endpoints to benchmark (default: all)')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint')
+        parser.add_argument('--sample-users', type=int, default=20,
+                            help='Number of users to rotate requests through')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        try:
+            report = run_benchmark(
+                endpoints=options['endpoints'],
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                sample_users=options['sample_users'],
+                seed=options['seed'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        dataset = report['dataset']
+        self.stdout.write(
+            f"Dataset: {dataset['users']} users, {dataset['follows']} follows, "
+            f"{dataset['posts']} posts ({report['database']})"
+        )
+        self.stdout.write(
+            f"{'endpoint':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+            f"{'queries':>10}{'req/s':>10}{'errors':>8}"
+        )
+        for row in report['results']:
+            latency = row['latency_ms']
+            self.stdout.write(
+                f"{row['endpoint']:<20}{latency['p50']:>10.2f}{latency['p95']:>10.2f}"
+                f"{latency['p99']:>10.2f}{row['queries_per_request']['mean']:>10.1f}"
+                f"{row['throughput_rps']:>10.1f}{row['errors']:>8}"
+            )
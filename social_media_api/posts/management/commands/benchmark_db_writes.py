@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand
+from posts.benchmarks import benchmark_sqlite_writes
+
+
+class Command(BaseCommand):
+    help = 'Compare like/comment write throughput with default and tuned SQLite pragmas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writes', type=int, default=1000, help='Inserts per model and profile')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        results = benchmark_sqlite_writes(writes=options['writes'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'profile':<12}{'likes/s':>12}{'comments/s':>12}")
+        for row in results:
+            self.stdout.write(
+                f"{row['profile']:<12}{row['likes_per_second']:>12.1f}{row['comments_per_second']:>12.1f}"
+            )
+        baseline, tuned = results[0], results[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f"Likes {tuned['likes_per_second'] / baseline['likes_per_second']:.1f}x, "
+            f"comments {tuned['comments_per_second'] / baseline['comments_per_second']:.1f}x "
+            f"faster with {tuned['profile']} pragmas"
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from posts.benchmarks import seed_social_graph, clear_social_graph
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic social graph (users, power-law follows, posts, likes) for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+        parser.add_argument('--posts', type=int, default=10000, help='Number of posts to create')
+        parser.add_argument('--avg-following', type=int, default=20,
+                            help='Mean number of users each user follows')
+        parser.add_argument('--max-following', type=int, default=1000,
+                            help='Upper bound on how many users a single user follows')
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Zipf exponent for follower/author popularity')
+        parser.add_argument('--likes', type=int, default=0, help='Number of likes to create')
+        parser.add_argument('--notifications', type=int, default=0,
+                            help='Number of notifications to create')
+        parser.add_argument('--batch-size', type=int, default=5000, help='bulk_create batch size')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete previously seeded benchmark users first')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = clear_social_graph()
+            self.stdout.write(f'Deleted {deleted} seeded objects')
+
+        summary = seed_social_graph(
+            users=options['users'],
+            posts=options['posts'],
+            avg_following=options['avg_following'],
+            max_following=options['max_following'],
+            alpha=options['alpha'],
+            likes=options['likes'],
+            notifications=options['notifications'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {summary['users']} users, {summary['follows']} follows and "
+            f"{summary['posts']} posts in {summary['seconds']}s"
+        ))
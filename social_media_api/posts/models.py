@@ -26,7 +26,6 @@ class Post(models.Model):
         """Return the number of likes for this post"""
         return self.likes.count()
 
-    @property
     def is_liked_by_user(self, user=None):
         """Check if a specific user has liked this post"""
         if user and user.is_authenticated:
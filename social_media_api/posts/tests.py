@@ -1,3 +1,131 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from accounts.models import CustomUser
+from notifications.models import Notification
+from query_instrumentation import QueryBudgetMixin
+from .benchmarks import (
+    BENCH_USERNAME_PREFIX, SCENARIOS, benchmark_sqlite_writes, clear_social_graph,
+    percentile, run_benchmark, seed_social_graph,
+)
+from .models import Post, Like
+
+
+class SeedSocialGraphTest(TestCase):
+    """Test the synthetic social graph seeder"""
+
+    def test_seed_creates_requested_scale(self):
+        summary = seed_social_graph(users=50, posts=200, avg_following=5, likes=100, batch_size=30)
+        self.assertEqual(summary['users'], 50)
+        self.assertEqual(
+            CustomUser.objects.filter(username__startswith=BENCH_USERNAME_PREFIX).count(), 50
+        )
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertGreater(CustomUser.followers.through.objects.count(), 0)
+        self.assertGreater(Like.objects.count(), 0)
+        # Duplicate edges and likes are dropped, and the summary says so
+        self.assertEqual(summary['follows'], CustomUser.followers.through.objects.count())
+        self.assertEqual(summary['likes'], Like.objects.count())
+
+    def test_follower_distribution_is_skewed(self):
+        seed_social_graph(users=200, posts=0, avg_following=10)
+        counts = sorted(
+            (user.followers.count() for user in CustomUser.objects.all()), reverse=True
+        )
+        # The most popular user should have far more followers than the median one
+        self.assertGreater(counts[0], 5 * max(counts[len(counts) // 2], 1))
+
+    def test_clear_removes_seeded_users(self):
+        seed_social_graph(users=10, posts=20)
+        clear_social_graph()
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(Post.objects.exists())
+
+
+class BenchmarkHarnessTest(TestCase):
+    """Test the endpoint benchmark runner"""
+
+    def setUp(self):
+        seed_social_graph(users=20, posts=60, avg_following=5, notifications=20)
+
+    def test_percentile(self):
+        values = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.assertEqual(percentile(values, 50), 3.0)
+        self.assertEqual(percentile(values, 100), 5.0)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_run_benchmark_reports_every_endpoint(self):
+        report = run_benchmark(iterations=3, warmup=1, sample_users=3)
+        self.assertEqual([row['endpoint'] for row in report['results']], list(SCENARIOS))
+        for row in report['results']:
+            self.assertEqual(row['requests'], 3)
+            self.assertEqual(row['errors'], 0, row['endpoint'])
+            self.assertGreater(row['queries_per_request']['mean'], 0)
+            self.assertLessEqual(row['latency_ms']['p50'], row['latency_ms']['p99'])
+            # Throughput counts only the time spent in the requests
+            self.assertAlmostEqual(
+                row['throughput_rps'], 1000.0 / row['latency_ms']['mean'], delta=row['throughput_rps'] * 0.01
+            )
+
+    def test_write_scenarios_do_not_leave_state_behind(self):
+        def counts():
+            return (
+                Like.objects.count(),
+                CustomUser.followers.through.objects.count(),
+                Notification.objects.count(),
+            )
+
+        before = counts()
+        report = run_benchmark(endpoints=['like_post', 'follow_user'], iterations=3, warmup=0)
+        self.assertEqual(counts(), before)
+        self.assertEqual([row['requests'] for row in report['results']], [3, 3])
+        self.assertEqual([row['errors'] for row in report['results']], [0, 0])
+
+    def test_sqlite_write_benchmark_uses_scratch_databases(self):
+        posts = Post.objects.count()
+        results = benchmark_sqlite_writes(writes=20)
+        self.assertEqual([row['profile'] for row in results], ['default', 'tuned'])
+        for row in results:
+            self.assertGreater(row['likes_per_second'], 0)
+            self.assertGreater(row['comments_per_second'], 0)
+        self.assertEqual(Post.objects.count(), posts)
+
+
+@override_settings(QUERY_INSTRUMENTATION={'SAMPLE_RATE': 1.0, 'HEADERS': True})
+class QueryInstrumentationTest(QueryBudgetMixin, APITestCase):
+    """Test the X-DB-* headers and per-endpoint query budgets"""
+
+    def setUp(self):
+        seed_social_graph(users=10, posts=30, avg_following=3, notifications=10)
+        self.user = CustomUser.objects.first()
+        self.client.force_authenticate(user=self.user)
+
+    def test_headers_report_database_cost(self):
+        response = self.client.get(reverse('post-list'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-DB-Query-Count']), 0)
+        self.assertIn('X-DB-Query-Time-Ms', response)
+        self.assertIn('X-DB-Similar-Queries', response)
+        self.assertGreater(float(response['X-Serializer-Time-Ms']), 0)
+
+    @override_settings(QUERY_INSTRUMENTATION={'SAMPLE_RATE': 0})
+    def test_unsampled_requests_are_untouched(self):
+        response = self.client.get(reverse('post-list'), secure=True)
+        self.assertNotIn('X-DB-Query-Count', response)
+
+    @override_settings(QUERY_INSTRUMENTATION={'SAMPLE_RATE': 1.0}, DEBUG=False)
+    def test_no_headers_by_default_without_debug(self):
+        response = self.client.get(reverse('post-list'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-DB-Query-Count', response)
+
+    def test_notification_stats_budget(self):
+        with self.assertQueryBudget(2):
+            self.client.get(reverse('notification-stats'), secure=True)
+
+    def test_budget_failure_reports_repeated_queries(self):
+        with self.assertRaisesMessage(AssertionError, 'budget is 1'):
+            with self.assertQueryBudget(1):
+                list(Post.objects.all()[:1])
+                list(Post.objects.all()[:1])
@@ -0,0 +1,122 @@
+"""
+Database tuning layer.
+
+database_config() builds settings.DATABASES['default'] from the environment:
+
+    DATABASE_URL           any dj-database-url URL (default: local sqlite file)
+    DATABASE_REPLICA_URLS  comma-separated read replica URLs (see db.replicas)
+    DB_CONN_MAX_AGE        seconds to keep persistent connections open
+    DB_CONN_HEALTH_CHECKS  ping persistent connections before reusing them
+    DB_POOL                use psycopg 3 connection pooling (PostgreSQL only;
+                           needs Django 5.1+ and psycopg[pool])
+    DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE
+    SQLITE_PRAGMAS         "name=value;..." overrides for the SQLite pragmas
+                           (names from ALLOWED_PRAGMAS only)
+
+SQLite databases use the social_media_api.db.sqlite3 backend, which applies
+SQLITE_PRAGMAS (WAL journal, synchronous=NORMAL, mmap) on every new connection.
+"""
+import importlib.util
+import re
+
+import dj_database_url
+import django
+from decouple import config
+from django.core.exceptions import ImproperlyConfigured
+
+# Applied to every new SQLite connection. WAL lets readers run concurrently
+# with a writer and, with synchronous=NORMAL, commits no longer fsync the
+# main database file, which is what dominates like/comment write latency.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 134217728,
+    'temp_store': 'MEMORY',
+}
+
+
+# Pragmas SQLITE_PRAGMAS may set; values are interpolated into the PRAGMA
+# statement, so they are restricted to plain words and numbers
+ALLOWED_PRAGMAS = set(SQLITE_PRAGMAS) | {
+    'foreign_keys', 'journal_size_limit', 'locking_mode', 'wal_autocheckpoint',
+}
+PRAGMA_VALUE_RE = re.compile(r'^[\w.-]+$')
+
+
+def parse_pragmas(value):
+    """Parse "journal_mode=WAL;synchronous=NORMAL" into a dict"""
+    pragmas = {}
+    for item in value.split(';'):
+        if '=' in item:
+            name, setting = (part.strip() for part in item.split('=', 1))
+            if name not in ALLOWED_PRAGMAS:
+                raise ImproperlyConfigured(f'SQLITE_PRAGMAS: unsupported pragma {name!r}')
+            if not PRAGMA_VALUE_RE.match(setting):
+                raise ImproperlyConfigured(f'SQLITE_PRAGMAS: invalid value {setting!r} for {name}')
+            pragmas[name] = setting
+    return pragmas
+
+
+def pool_unsupported_reason():
+    """Why DB_POOL can't work in this environment, or None if it can"""
+    if django.VERSION < (5, 1):
+        return f'Django 5.1 or later is required, not {django.get_version()}'
+    if importlib.util.find_spec('psycopg_pool') is None:
+        return 'psycopg 3 with its pool extra (psycopg[binary,pool]) is not installed'
+    return None
+
+
+def database_config(default_url, debug=False):
+    """Return the DATABASES['default'] dict for the current environment"""
+    return database_from_url(config('DATABASE_URL', default=default_url), debug=debug)
+
+
+def replica_databases(debug=False):
+    """
+    Return {'replica_1': {...}, ...} for each URL in DATABASE_REPLICA_URLS.
+    Test runs mirror the primary instead of creating separate databases.
+    """
+    urls = [url.strip() for url in config('DATABASE_REPLICA_URLS', default='').split(',') if url.strip()]
+    replicas = {}
+    for index, url in enumerate(urls, start=1):
+        database = database_from_url(url, debug=debug)
+        database['TEST'] = {'MIRROR': 'default'}
+        replicas[f'replica_{index}'] = database
+    return replicas
+
+
+def database_from_url(url, debug=False):
+    """Build a DATABASES entry for ``url`` with the tuning options applied"""
+    is_sqlite = url.startswith('sqlite')
+    pool = config('DB_POOL', default=False, cast=bool) and not is_sqlite
+
+    database = dj_database_url.parse(
+        url,
+        # Pooled connections are handed back to the pool instead of being
+        # kept per thread, so Django requires CONN_MAX_AGE = 0 with a pool.
+        conn_max_age=0 if pool else config('DB_CONN_MAX_AGE', default=0 if debug else 600, cast=int),
+        conn_health_checks=config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        # sqlite3.connect() rejects the sslmode option
+        ssl_require=not (debug or is_sqlite),
+    )
+
+    if is_sqlite:
+        database['ENGINE'] = 'social_media_api.db.sqlite3'
+        database['OPTIONS'] = {
+            'pragmas': {
+                **SQLITE_PRAGMAS,
+                **parse_pragmas(config('SQLITE_PRAGMAS', default='')),
+            },
+        }
+    elif pool:
+        reason = pool_unsupported_reason()
+        if reason:
+            raise ImproperlyConfigured(f'DB_POOL is enabled but connection pooling is unavailable: {reason}')
+        database['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': 10,
+        }
+    return database
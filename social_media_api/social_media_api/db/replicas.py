@@ -0,0 +1,87 @@
+"""
+Read-replica routing.
+
+ReplicaRoutingMiddleware marks GET/HEAD/OPTIONS requests as safe to serve
+from a replica, and ReplicaRouter sends their reads to one of the aliases in
+settings.DATABASE_REPLICAS. Everything else (writes, reads during unsafe
+requests or inside transactions, management commands) uses the primary.
+
+After a successful unsafe request the client is pinned to the primary for
+REPLICA_PIN_SECONDS, so users always read their own writes while replicas
+catch up. Clients are identified by their Authorization header or session
+cookie; the pin lives in the default cache, which must be shared between
+processes (e.g. Redis or database cache) in multi-process deployments.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Authentication lookups must never see a lagging replica
+PRIMARY_ONLY_MODELS = {'authtoken.token', 'sessions.session'}
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+class ReplicaRouter:
+    """Route reads to a replica when the current request allows it"""
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower in PRIMARY_ONLY_MODELS:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see that transaction's writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+
+def _pin_key(identity):
+    if not identity:
+        return None
+    return 'replica-pin:' + hashlib.sha256(identity.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enable replica reads for safe requests from clients that have not
+    written recently, and pin writers to the primary afterwards.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pin_key = _pin_key(
+            request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        safe = request.method in SAFE_METHODS
+        pinned = bool(pin_key) and cache.get(pin_key, False)
+
+        token = _use_replica.set(safe and not pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+        if not safe and response.status_code < 400:
+            # The session cookie may only have been issued by this response (login)
+            cookie = response.cookies.get(settings.SESSION_COOKIE_NAME)
+            pin_key = pin_key or _pin_key(cookie.value if cookie else None)
+            if pin_key:
+                cache.set(pin_key, True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+        return response
@@ -6,7 +6,7 @@ from pathlib import Path
 import os
 from datetime import timedelta
 from decouple import config
-import dj_database_url
+from .db import database_config, replica_databases
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -56,6 +56,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'query_instrumentation.QueryInstrumentationMiddleware',
+    'social_media_api.db.replicas.ReplicaRoutingMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -86,20 +88,18 @@ TEMPLATES = [
 WSGI_APPLICATION = 'social_media_api.wsgi.application'
 
 # Database configuration
+# Connection persistence, health checks, optional pooling and the SQLite
+# pragmas are all driven by environment variables; see social_media_api/db.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(f"sqlite:///{BASE_DIR / 'db.sqlite3'}", debug=DEBUG),
+    **replica_databases(debug=DEBUG),
 }
 
-# Production database configuration
-if not DEBUG:
-    DATABASES['default'] = dj_database_url.config(
-        default=config('DATABASE_URL', default='sqlite:///db.sqlite3'),
-        conn_max_age=600,
-        ssl_require=True
-    )
+# Safe requests read from these aliases; writers are pinned to the primary
+# for REPLICA_PIN_SECONDS so they always see their own writes.
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['social_media_api.db.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -128,6 +128,18 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Stream uploads to a temporary file in chunks instead of buffering them in
+# memory; the file system storage then moves the file into place.
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# Resized WebP profile picture variants (see accounts/images.py)
+PROFILE_IMAGES = {
+    'ASYNC': config('PROFILE_IMAGES_ASYNC', default=True, cast=bool),
+    'WORKERS': config('PROFILE_IMAGES_WORKERS', default=2, cast=int),
+    'QUALITY': 80,
+    'MAX_UPLOAD_BYTES': 10 * 1024 * 1024,
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -154,6 +166,26 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# Per-request query count / SQL time reporting; the other options keep the
+# defaults of query_instrumentation (X-DB-* headers only with DEBUG)
+QUERY_INSTRUMENTATION = {
+    'SAMPLE_RATE': config('QUERY_SAMPLE_RATE', default=1.0 if DEBUG else 0.01, cast=float),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO' if DEBUG else 'WARNING',
+        },
+    },
+}
+
 # Security settings for production
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
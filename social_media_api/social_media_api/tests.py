@@ -0,0 +1,154 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections
+from django.db.utils import load_backend
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from posts.models import Post, Comment, Like
+from .db import SQLITE_PRAGMAS, database_config, parse_pragmas, replica_databases
+from .db.replicas import ReplicaRouter
+
+
+class DatabaseConfigTest(SimpleTestCase):
+    """Test the environment-driven database settings"""
+
+    def config(self, debug=False, **env):
+        with mock.patch.dict(os.environ, env, clear=False):
+            return database_config('sqlite:////tmp/default.sqlite3', debug=debug)
+
+    def test_sqlite_uses_tuned_backend(self):
+        database = self.config(DATABASE_URL='sqlite:////tmp/app.sqlite3')
+        self.assertEqual(database['ENGINE'], 'social_media_api.db.sqlite3')
+        self.assertEqual(database['OPTIONS']['pragmas']['journal_mode'], 'WAL')
+        self.assertNotIn('sslmode', database['OPTIONS'])
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(database['CONN_MAX_AGE'], 600)
+
+    def test_pragma_overrides(self):
+        database = self.config(
+            DATABASE_URL='sqlite:////tmp/app.sqlite3', SQLITE_PRAGMAS='synchronous=FULL; cache_size=-1000'
+        )
+        pragmas = database['OPTIONS']['pragmas']
+        self.assertEqual(pragmas['synchronous'], 'FULL')
+        self.assertEqual(pragmas['cache_size'], '-1000')
+        self.assertEqual(pragmas['mmap_size'], SQLITE_PRAGMAS['mmap_size'])
+
+    def test_debug_does_not_keep_connections(self):
+        database = self.config(debug=True, DATABASE_URL='sqlite:////tmp/app.sqlite3')
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+
+    @mock.patch('social_media_api.db.pool_unsupported_reason', return_value=None)
+    def test_postgres_pool(self, supported):
+        database = self.config(DATABASE_URL='postgres://user:pw@db:5432/app', DB_POOL='True')
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], 10)
+        self.assertEqual(database['OPTIONS']['sslmode'], 'require')
+
+    @mock.patch('social_media_api.db.pool_unsupported_reason', return_value='psycopg is not installed')
+    def test_pool_without_support_fails_clearly(self, supported):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'psycopg is not installed'):
+            self.config(DATABASE_URL='postgres://user:pw@db:5432/app', DB_POOL='True')
+
+    def test_replica_urls(self):
+        with mock.patch.dict(os.environ, {'DATABASE_REPLICA_URLS': 'sqlite:////tmp/r1.sqlite3, sqlite:////tmp/r2.sqlite3'}):
+            replicas = replica_databases()
+        self.assertEqual(list(replicas), ['replica_1', 'replica_2'])
+        self.assertEqual(replicas['replica_2']['NAME'], '/tmp/r2.sqlite3')
+        self.assertEqual(replicas['replica_1']['TEST'], {'MIRROR': 'default'})
+
+    def test_parse_pragmas(self):
+        self.assertEqual(
+            parse_pragmas('cache_size=-1;journal_mode = wal;;junk'), {'cache_size': '-1', 'journal_mode': 'wal'}
+        )
+
+    def test_parse_pragmas_rejects_unsafe_input(self):
+        for value in ('writable_schema=1', 'mmap_size=0 --', "temp_store=MEMORY'"):
+            with self.assertRaises(ImproperlyConfigured, msg=value):
+                parse_pragmas(value)
+
+
+class SQLitePragmaTest(TestCase):
+    """Test that the pragmas are applied to live connections"""
+
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], SQLITE_PRAGMAS['busy_timeout'])
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    End-to-end replica routing with two SQLite files: the test database
+    is the primary and an empty scratch file plays a lagging replica.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        settings_dict = connections.configure_settings({
+            'default': connections.settings['default'],
+            'replica': {
+                'ENGINE': 'social_media_api.db.sqlite3',
+                'NAME': os.path.join(self.directory.name, 'replica.sqlite3'),
+            },
+        })['replica']
+        connections['replica'] = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'replica')
+        with connections['replica'].schema_editor() as editor:
+            for model in [CustomUser, Post, Comment, Like]:
+                editor.create_model(model)
+
+        self.writer = CustomUser.objects.create_user(username='writer', password='pass12345')
+        self.reader = CustomUser.objects.create_user(username='reader', password='pass12345')
+        self.writer_client = APIClient(SERVER_NAME='localhost')
+        self.writer_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.writer).key)
+        self.reader_client = APIClient(SERVER_NAME='localhost')
+        self.reader_client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.reader).key)
+
+    def tearDown(self):
+        connections['replica'].close()
+        del connections['replica']
+        self.directory.cleanup()
+
+    def post_count(self, client):
+        response = client.get(reverse('post-list'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.data['count']
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_reads_go_to_replica_and_writers_read_their_writes(self):
+        response = self.writer_client.post(
+            reverse('post-list'), {'title': 'Hello', 'content': 'World'}, secure=True
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.using('default').count(), 1)
+
+        # The writer is pinned to the primary and sees the new post
+        self.assertEqual(self.post_count(self.writer_client), 1)
+        # Other clients read from the (lagging) replica
+        self.assertEqual(self.post_count(self.reader_client), 0)
+
+    @override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self):
+        self.writer_client.post(reverse('post-list'), {'title': 'Hello', 'content': 'World'}, secure=True)
+        cache.clear()
+        self.assertEqual(self.post_count(self.writer_client), 0)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_everything_uses_primary(self):
+        self.writer_client.post(reverse('post-list'), {'title': 'Hello', 'content': 'World'}, secure=True)
+        self.assertEqual(self.post_count(self.reader_client), 1)
+
+    def test_router_outside_requests(self):
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            self.assertEqual(ReplicaRouter().db_for_read(Post), 'default')
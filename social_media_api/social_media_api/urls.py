@@ -7,6 +7,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/', include('posts.urls')),  # Add this line
+    path('api/notifications/', include('notifications.urls')),
 ]
 
 if settings.DEBUG: